@@ -9,6 +9,18 @@ const { verifyToken } = require('../middleware/auth');
 const lastLogTime = new Map();
 const LOG_INTERVAL = 3000; // Save logs every 3 seconds
 
+// Last frame per direction for binary-transport sessions (unchanged frames are not resent)
+const lastFrames = new Map();
+
+// Annotated frames per second the CV service should render while a dashboard is open;
+// with no viewers it renders none and only sends counts and detections
+const RENDER_FPS = Number(process.env.RENDER_FPS || 10);
+
+function requestedRenderFps() {
+  const viewers = global.io ? global.io.engine.clientsCount : 0;
+  return viewers > 0 ? RENDER_FPS : 0;
+}
+
 // Get simulation status
 router.get('/status', async (req, res) => {
   try {
@@ -65,11 +77,9 @@ router.get('/:sessionId/alerts', async (req, res) => {
   }
 });
 
-// Update simulation state (called by CV service)
-router.post('/update', async (req, res) => {
+// Apply an update from the CV service (shared by the JSON and binary routes)
+async function applyUpdate(res, { session_id, counts, signal_state, frames, vehicle_breakdown, unique_counts, detections }) {
   try {
-    const { session_id, counts, signal_state, frames, vehicle_breakdown } = req.body;
-
     const simulation = await Simulation.findOne({ sessionId: session_id });
 
     if (!simulation) {
@@ -145,14 +155,50 @@ router.post('/update', async (req, res) => {
         signalState: simulation.currentState.signalState,
         frames: frames || {},
         vehicle_breakdown: vehicle_breakdown || null,
+        unique_counts: unique_counts || null,
+        detections: detections || null,
       });
     }
 
-    res.json({ success: true });
+    res.json({ success: true, render_fps: requestedRenderFps() });
   } catch (error) {
     console.error('Update error:', error);
     res.status(500).json({ error: 'Failed to update simulation' });
   }
+}
+
+// Update simulation state (called by CV service, JSON with base64 frames)
+router.post('/update', async (req, res) => {
+  await applyUpdate(res, req.body);
+});
+
+// Update simulation state (called by CV service, TRANSPORT_MODE=binary)
+// Body: [uint32 BE header length][JSON header][raw JPEG frames listed in header.frames]
+// Only changed frames are sent; the last frame of each direction is cached per session.
+router.post('/update-binary', express.raw({ type: 'application/octet-stream', limit: '50mb' }), async (req, res) => {
+  let update;
+  try {
+    const body = req.body;
+    const headerLength = body.readUInt32BE(0);
+    update = JSON.parse(body.subarray(4, 4 + headerLength).toString('utf8'));
+
+    const cachedFrames = lastFrames.get(update.session_id) || {};
+    let offset = 4 + headerLength;
+    for (const { direction, length } of update.frames) {
+      cachedFrames[direction] = body.subarray(offset, offset + length).toString('base64');
+      offset += length;
+    }
+    if (offset !== body.length) {
+      throw new Error(`length mismatch: parsed ${offset} of ${body.length} bytes`);
+    }
+    lastFrames.set(update.session_id, cachedFrames);
+    update.frames = cachedFrames;
+  } catch (error) {
+    console.error('Binary update parse error:', error);
+    return res.status(400).json({ error: 'Malformed binary update' });
+  }
+
+  await applyUpdate(res, update);
 });
 
 // Create alert (called by CV service)
@@ -202,8 +248,9 @@ router.post('/complete', async (req, res) => {
     simulation.completedAt = new Date();
     await simulation.save();
 
-    // Clean up throttle map
+    // Clean up throttle map and frame cache
     lastLogTime.delete(session_id);
+    lastFrames.delete(session_id);
 
     res.json({ success: true, message: 'Simulation completed' });
   } catch (error) {
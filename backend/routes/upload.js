@@ -87,6 +87,9 @@ router.post('/upload-videos', verifyToken, upload.fields([
     try {
       const formData = new FormData();
       
+      // session_id goes first so the CV service can start before all videos arrive
+      formData.append('session_id', sessionId);
+      
       for (const direction of directions) {
         const filePath = videoPaths[direction];
         formData.append(direction, fs.createReadStream(filePath), {
@@ -94,8 +97,6 @@ router.post('/upload-videos', verifyToken, upload.fields([
           contentType: 'video/mp4',
         });
       }
-      
-      formData.append('session_id', sessionId);
 
       console.log('🔄 Sending videos to CV service...');
 
@@ -107,7 +108,8 @@ router.post('/upload-videos', verifyToken, upload.fields([
       }).then(response => {
         console.log('✅ CV service started processing');
       }).catch(error => {
-        console.error('❌ CV service error:', error.message);
+        // 429: CV service at capacity (running and queued sessions full)
+        console.error('❌ CV service error:', (error.response && error.response.data && error.response.data.error) || error.message);
         simulation.status = 'failed';
         simulation.save();
       });
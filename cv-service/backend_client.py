@@ -0,0 +1,282 @@
+import asyncio
+import base64
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import log_config
+import metrics
+from frame_transport import encode_frame_update
+
+logger = log_config.get_logger("backend_client")
+
+
+class BackendClient:
+    """
+    Keep-alive client for the Node backend with an outbound queue
+    - Updates are coalesced: only the newest pending update per session is kept,
+      older ones are dropped when the backend falls behind
+    - Alerts and completions are delivered in order and retried with backoff for up to
+      max_delivery_time seconds, then dropped, so a backend outage cannot hold every
+      other session's updates behind one message forever
+    - The frame loop never waits on the network: publish_* only enqueue
+    Frames are handed over as (seq, jpeg_bytes) per direction and serialised in the
+    sender thread, either as base64 inside JSON (transport="json", the original
+    format) or as a length-prefixed binary body that skips frames the backend
+    already has (transport="binary", see frame_transport.py)
+    The backend answers updates with the annotated frames per second it wants for
+    the session (render_fps, 0 with no dashboard open); the latest is kept in
+    render_fps per session, absent until the backend has said.
+    """
+
+    def __init__(self, backend_url: str, timeout: float = 5, max_retry_delay: float = 10, transport: str = "json",
+                 max_delivery_time: float = 60):
+        if transport not in ("json", "binary"):
+            raise ValueError(f"Unknown transport '{transport}' (expected 'json' or 'binary')")
+        self.backend_url = backend_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retry_delay = max_retry_delay
+        self.max_delivery_time = max_delivery_time
+        self.transport = transport
+
+        # One pooled keep-alive session, used only from the single sender thread
+        self.http = requests.Session()
+        self.http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backend-sender")
+
+        self._pending_updates: "OrderedDict[str, Dict]" = OrderedDict()
+        self._control = deque()  # (path, payload) for alerts and completions, in order
+        self._sent_seq: Dict[str, Dict[str, int]] = {}  # session -> direction -> last delivered frame seq
+        self.render_fps: Dict[str, float] = {}  # session -> frames/s the backend asked for
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.updates_published = 0
+        self.updates_sent = 0
+        self.updates_dropped = 0
+        self.alerts_sent = 0
+        self.control_dropped = 0
+        self.send_failures = 0
+        self.retries = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+        self._latencies = deque(maxlen=512)
+        self._latency_max = 0.0
+
+    # ------------------------------------------------------------------
+    # Publishing (called from the frame loop)
+    # ------------------------------------------------------------------
+    def publish_update(self, session_id: str, payload: Dict, frames: Dict[str, Tuple[int, bytes]] = None):
+        """
+        Queue an update, replacing any not-yet-sent update of the same session
+        frames maps direction -> (seq, jpeg_bytes); seq only changes when the frame does
+        """
+        self._ensure_started()
+        self.updates_published += 1
+        if session_id in self._pending_updates:
+            self.updates_dropped += 1
+            metrics.UPDATES_DROPPED.labels(session_id).inc()
+            del self._pending_updates[session_id]
+        self._pending_updates[session_id] = (payload, frames or {})
+        self._wake()
+
+    def publish_alert(self, payload: Dict):
+        """Queue an alert for ordered, guaranteed delivery"""
+        self._ensure_started()
+        self._control.append(("/api/simulation/alert", payload))
+        self._wake()
+
+    def publish_complete(self, session_id: str):
+        """Queue the completion of a session; its last pending update is sent first"""
+        self._ensure_started()
+        self._control.append(("/api/simulation/complete", {"session_id": session_id}))
+        self._wake()
+
+    def queue_depth(self) -> int:
+        return len(self._pending_updates) + len(self._control)
+
+    def metrics(self) -> Dict:
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self.queue_depth(),
+            "pending_updates": len(self._pending_updates),
+            "pending_control": len(self._control),
+            "updates_published": self.updates_published,
+            "updates_sent": self.updates_sent,
+            "updates_dropped": self.updates_dropped,
+            "alerts_sent": self.alerts_sent,
+            "control_dropped": self.control_dropped,
+            "send_failures": self.send_failures,
+            "retries": self.retries,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "bytes_sent": self.bytes_sent,
+            "send_latency_ms": {
+                "p50": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+                "p95": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+                "max": self._latency_max * 1000,
+            },
+        }
+
+    async def flush(self, timeout: float = None):
+        """Wait until everything queued so far has been handled"""
+        if self._worker is None or self._worker.done():
+            return
+        # _idle is set by the sender only once the queue is empty and nothing is in flight
+        await asyncio.wait_for(self._idle.wait(), timeout)
+
+    async def close(self, timeout: float = 2):
+        """Try to deliver what is queued, then stop the sender"""
+        try:
+            await self.flush(timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Backend client closed with %d undelivered messages", self.queue_depth())
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self._sender.shutdown(wait=False)
+        self.http.close()
+
+    # ------------------------------------------------------------------
+    # Sender
+    # ------------------------------------------------------------------
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def _wake(self):
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self.queue_depth():
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if self._control:
+                path, payload = self._control[0]
+                if path.endswith("/complete"):
+                    # Deliver the session's final state before marking it complete
+                    update = self._pending_updates.pop(payload["session_id"], None)
+                    if update is not None:
+                        await self._send_update(update)
+                await self._send_guaranteed(path, payload)
+                self._control.popleft()
+            else:
+                _, update = self._pending_updates.popitem(last=False)
+                await self._send_update(update)
+
+    def _build_update(self, payload: Dict, frames: Dict[str, Tuple[int, bytes]]) -> Tuple[str, Dict]:
+        """Serialise an update for the configured transport (runs in the sender thread)"""
+        if self.transport == "json":
+            body = dict(payload)
+            body["frames"] = {direction: base64.b64encode(jpeg).decode("utf-8") for direction, (_, jpeg) in frames.items()}
+            return "/api/simulation/update", {"json": body}
+
+        return "/api/simulation/update-binary", {
+            "data": encode_frame_update(payload, [(direction, seq, jpeg) for direction, (seq, jpeg) in frames.items()]),
+            "headers": {"Content-Type": "application/octet-stream"},
+        }
+
+    async def _send_update(self, update: Tuple[Dict, Dict[str, Tuple[int, bytes]]]):
+        payload, frames = update
+        if self.transport == "binary":
+            # Skip frames the backend already has
+            sent = self._sent_seq.get(payload["session_id"], {})
+            changed = {direction: frame for direction, frame in frames.items() if sent.get(direction) != frame[0]}
+            self.frames_skipped += len(frames) - len(changed)
+            frames = changed
+
+        response = await self._post(None, lambda: self._build_update(payload, frames), payload["session_id"])
+        if response is not None and response.status_code == 200:
+            self.updates_sent += 1
+            self.frames_sent += len(frames)
+            self._read_render_fps(payload["session_id"], response)
+            if self.transport == "binary":
+                self._sent_seq.setdefault(payload["session_id"], {}).update(
+                    {direction: seq for direction, (seq, _) in frames.items()}
+                )
+        else:
+            self.send_failures += 1
+            if response is not None:
+                logger.warning("⚠️ Backend update failed: %s", response.status_code)
+
+    def _read_render_fps(self, session_id: str, response: requests.Response):
+        try:
+            body = response.json()
+        except ValueError:
+            return
+        requested = body.get("render_fps") if isinstance(body, dict) else None
+        if requested is not None:
+            self.render_fps[session_id] = max(0.0, float(requested))
+        else:
+            self.render_fps.pop(session_id, None)
+
+    async def _send_guaranteed(self, path: str, payload: Dict):
+        """
+        Retry with backoff until delivered or max_delivery_time has passed, then drop
+        the message; client errors (4xx) are not retried
+        """
+        delay = 0.25
+        deadline = time.monotonic() + self.max_delivery_time
+        while True:
+            response = await self._post(path, payload, payload.get("session_id", ""))
+            if response is not None and response.status_code < 500:
+                if response.status_code == 200:
+                    if path.endswith("/alert"):
+                        self.alerts_sent += 1
+                    else:
+                        self._sent_seq.pop(payload["session_id"], None)
+                        self.render_fps.pop(payload["session_id"], None)
+                        logger.info("✅ Simulation %s marked as complete", payload["session_id"])
+                else:
+                    self.send_failures += 1
+                    logger.warning("⚠️ Backend rejected %s: %s", path, response.status_code)
+                return
+            if time.monotonic() + delay > deadline:
+                self.send_failures += 1
+                self.control_dropped += 1
+                logger.error("❌ Dropping %s for session %s: backend unreachable for %.0fs",
+                             path, payload.get("session_id", "-"), self.max_delivery_time)
+                return
+            self.retries += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    async def _post(self, path: str, payload=None, session_id: str = "") -> Optional[requests.Response]:
+        """
+        POST in the sender thread. payload is either a JSON-able dict for path, or
+        a callable returning (path, requests kwargs) so serialisation also stays off the loop
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        def send():
+            url_path, kwargs = payload() if callable(payload) else (path, {"json": payload})
+            response = self.http.post(f"{self.backend_url}{url_path}", timeout=self.timeout, **kwargs)
+            self.bytes_sent += len(response.request.body or b"")
+            return response
+
+        try:
+            return await loop.run_in_executor(self._sender, send)
+        except Exception as e:
+            logger.warning("⚠️ Failed to send %s: %s", path or "update", e)
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            self._latencies.append(elapsed)
+            self._latency_max = max(self._latency_max, elapsed)
+            metrics.STAGE_SECONDS.labels(session_id, "all", "backend_post").observe(elapsed)
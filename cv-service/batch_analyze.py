@@ -0,0 +1,294 @@
+"""
+Offline batch analysis: vehicle counts for a directory of recorded clips,
+without the backend, the overlays, JPEG encoding or the real-time loop
+
+Each clip is counted like a live approach (detector + tracker + ROI) and
+written as two Parquet files:
+    <output>/frames/<clip>.parquet     one row per inferred frame
+    <output>/intervals/<clip>.parquet  one row per --interval seconds of video
+Clips are spread over a process pool, one model per worker. A clip whose
+interval file exists is skipped, so an interrupted run continues where it
+stopped when started again (--force redoes everything). Read the results
+back as one table with pandas.read_parquet("<output>/frames").
+
+Usage (from cv-service/, needs pyarrow: pip install -r requirements-batch.txt):
+    python batch_analyze.py recordings/ --output counts/ --workers 4 --stride 3
+The camera direction (and so the ROI) comes from the file or folder name when
+it is north/south/east/west, otherwise from --direction.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from tracker import VehicleTracker
+
+DIRECTIONS = ("north", "south", "east", "west")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".ts")
+
+# Per-process VideoProcessor used by pool workers
+_worker_processor = None
+
+
+def _init_worker(threads_per_worker: int):
+    """Process-pool initializer: load a private model copy in each worker"""
+    global _worker_processor
+    os.environ["DETECTOR_THREADS"] = str(threads_per_worker)
+
+    from video_processor import VideoProcessor
+    _worker_processor = VideoProcessor()
+
+
+def _process_clip_in_worker(path: str, key: str, direction: str, options: Dict) -> Dict:
+    return process_clip(_worker_processor, path, key, direction, options)
+
+
+def find_clips(input_dir: str) -> List[str]:
+    """All video files below input_dir, in a stable order"""
+    clips = []
+    for root, _, files in os.walk(input_dir):
+        clips.extend(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+    return sorted(clips)
+
+
+def clip_key(input_dir: str, path: str) -> str:
+    """Output file stem: the clip's path relative to input_dir, flattened"""
+    relative = os.path.splitext(os.path.relpath(path, input_dir))[0]
+    return relative.replace(os.sep, "__")
+
+
+def clip_direction(path: str, default: str) -> str:
+    """Direction named by the file or its folder, else default"""
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    folder = os.path.basename(os.path.dirname(path)).lower()
+    for name in (stem, folder):
+        if name in DIRECTIONS:
+            return name
+    return default
+
+
+def output_paths(output_dir: str, key: str) -> Dict[str, str]:
+    return {table: os.path.join(output_dir, table, f"{key}.parquet") for table in ("frames", "intervals")}
+
+
+def write_table(columns: Dict[str, list], path: str, metadata: Dict[str, str]):
+    """Write columns to Parquet atomically, so a killed run never leaves a half-written file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.table(columns).replace_schema_metadata(metadata)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_batches(cap: cv2.VideoCapture, stride: int, batch_size: int):
+    """
+    Yield (frame_indices, frames) batches of every stride-th frame
+    Frames in between are only grabbed, never decoded
+    """
+    indices, frames = [], []
+    frame_index = 0
+    while True:
+        if frame_index % stride:
+            if not cap.grab():
+                break
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            indices.append(frame_index)
+            frames.append(frame)
+            if len(frames) == batch_size:
+                yield indices, frames
+                indices, frames = [], []
+        frame_index += 1
+    if frames:
+        yield indices, frames
+
+
+def interval_rows(frames: Dict[str, list], interval_seconds: float, vehicle_types: List[str]) -> Dict[str, list]:
+    """Aggregate the per-frame rows into fixed windows of video time"""
+    timestamps = np.asarray(frames["timestamp"], np.float64)
+    if not len(timestamps):
+        return {"interval": [], "start_s": [], "end_s": [], "frames": [], "vehicle_count_mean": [],
+                "vehicle_count_max": [], "pedestrian_count_mean": [], "new_unique_vehicles": [],
+                **{f"{v_type}_mean": [] for v_type in vehicle_types}}
+
+    windows = (timestamps // interval_seconds).astype(np.int64)
+    interval_ids, starts, sizes = np.unique(windows, return_index=True, return_counts=True)
+    vehicles = np.asarray(frames["vehicle_count"], np.float64)
+    unique_total = np.asarray(frames["unique_vehicles"], np.int64)
+    # Unique vehicles first counted inside each window
+    unique_end = unique_total[starts + sizes - 1]
+    new_unique = np.diff(unique_end, prepend=0)
+
+    def window_mean(values: np.ndarray) -> list:
+        return np.round(np.add.reduceat(values, starts) / sizes, 3).tolist()
+
+    return {
+        "interval": interval_ids.tolist(),
+        "start_s": (interval_ids * interval_seconds).tolist(),
+        "end_s": ((interval_ids + 1) * interval_seconds).tolist(),
+        "frames": sizes.tolist(),
+        "vehicle_count_mean": window_mean(vehicles),
+        "vehicle_count_max": np.maximum.reduceat(vehicles, starts).astype(np.int64).tolist(),
+        "pedestrian_count_mean": window_mean(np.asarray(frames["pedestrian_count"], np.float64)),
+        "new_unique_vehicles": new_unique.tolist(),
+        **{f"{v_type}_mean": window_mean(np.asarray(frames[v_type], np.float64)) for v_type in vehicle_types},
+    }
+
+
+def analyze_clip(processor, path: str, direction: str, stride: int = 1, batch_size: int = 4) -> Dict:
+    """
+    Count one clip frame by frame (every stride-th frame)
+    Returns the per-frame columns plus read/inferred frame counts and the clip fps
+    """
+    vehicle_types = [v_type.lower() for v_type in processor.vehicle_types]
+    frames = {"frame_index": [], "timestamp": [], "vehicle_count": [], "pedestrian_count": [],
+              "unique_vehicles": [], **{v_type: [] for v_type in vehicle_types}}
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    fps = fps if fps and 0 < fps < 240 else 30.0
+
+    tracker = VehicleTracker()
+    frames_read = 0
+    try:
+        for indices, batch in read_batches(cap, stride, batch_size):
+            for frame_index, frame, detections in zip(indices, batch,
+                                                      processor.detect([(direction, frame) for frame in batch])):
+                detections = detections.select(np.isin(detections.classes, processor.target_class_ids))
+                tracker.update(frame_index, detections)
+                vehicle_count, pedestrian_count, vehicle_breakdown = processor.count_tracked(
+                    tracker, frame_index, direction, frame.shape[:2]
+                )
+                frames["frame_index"].append(frame_index)
+                frames["timestamp"].append(round(frame_index / fps, 3))
+                frames["vehicle_count"].append(vehicle_count)
+                frames["pedestrian_count"].append(pedestrian_count)
+                frames["unique_vehicles"].append(tracker.unique_vehicles)
+                for v_type, count in vehicle_breakdown.items():
+                    frames[v_type.lower()].append(count)
+            frames_read = indices[-1] + 1
+        # Includes the grabbed frames after the last inferred one
+        frames_read = max(frames_read, int(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+    finally:
+        cap.release()
+
+    return {"frames": frames, "frames_read": frames_read, "frames_inferred": len(frames["frame_index"]), "fps": fps}
+
+
+def process_clip(processor, path: str, key: str, direction: str, options: Dict) -> Dict:
+    """Analyze a clip and write its frame and interval tables; returns a summary for the report"""
+    started = time.perf_counter()
+    result = analyze_clip(processor, path, direction, options["stride"], options["batch_size"])
+    vehicle_types = [v_type.lower() for v_type in processor.vehicle_types]
+    intervals = interval_rows(result["frames"], options["interval"], vehicle_types)
+
+    for table in (result["frames"], intervals):
+        # Repeated per row (dictionary-encoded, so nearly free) to keep clips apart in a merged read
+        rows = len(table["frames" if table is intervals else "frame_index"])
+        table["clip"] = [key] * rows
+        table["direction"] = [direction] * rows
+
+    metadata = {"source": path, "direction": direction, "fps": str(result["fps"]), "stride": str(options["stride"]),
+                "detector": processor.detector.name, "confidence": str(processor.confidence_threshold),
+                "inference_region": processor.inference_regions.key}
+    paths = output_paths(options["output"], key)
+    write_table(result["frames"], paths["frames"], metadata)
+    # Written last: its presence marks the clip as done
+    write_table(intervals, paths["intervals"], metadata)
+
+    return {
+        "clip": key,
+        "frames_read": result["frames_read"],
+        "frames_inferred": result["frames_inferred"],
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="directory of recorded clips (searched recursively)")
+    parser.add_argument("--output", required=True, help="directory for the Parquet tables")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes, one model each")
+    parser.add_argument("--stride", type=int, default=1, help="infer every Nth frame (others are not decoded)")
+    parser.add_argument("--batch-size", type=int, default=4, help="frames per detector call")
+    parser.add_argument("--interval", type=float, default=60.0, help="seconds of video per interval row")
+    parser.add_argument("--direction", default="north", choices=DIRECTIONS,
+                        help="ROI for clips whose name is not a direction")
+    parser.add_argument("--force", action="store_true", help="reprocess clips that already have results")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        parser.error("pyarrow is required for the Parquet output (pip install -r requirements-batch.txt)")
+
+    clips = find_clips(args.input)
+    todo = []
+    for path in clips:
+        key = clip_key(args.input, path)
+        if args.force or not os.path.exists(output_paths(args.output, key)["intervals"]):
+            todo.append((path, key, clip_direction(path, args.direction)))
+    print(f"🎞️ {len(clips)} clips found, {len(clips) - len(todo)} already done, {len(todo)} to process")
+    if not todo:
+        return
+
+    options = {"output": args.output, "stride": max(1, args.stride), "batch_size": max(1, args.batch_size),
+               "interval": args.interval}
+    workers = max(1, min(args.workers, len(todo)))
+    started = time.perf_counter()
+    frames_read = frames_inferred = failed = 0
+
+    def report(summary: Dict):
+        nonlocal frames_read, frames_inferred
+        frames_read += summary["frames_read"]
+        frames_inferred += summary["frames_inferred"]
+        print(f"✅ {summary['clip']}: {summary['frames_read']} frames in {summary['seconds']:.1f}s "
+              f"({summary['frames_read'] / max(summary['seconds'], 1e-9):.1f} fps)")
+
+    if workers == 1:
+        from video_processor import VideoProcessor
+        processor = VideoProcessor()
+        for path, key, direction in todo:
+            try:
+                report(process_clip(processor, path, key, direction, options))
+            except Exception as e:
+                failed += 1
+                print(f"❌ {key}: {str(e)}")
+    else:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        # spawn, not fork: forking a process with torch's thread pools running can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+            futures = {pool.submit(_process_clip_in_worker, path, key, direction, options): key
+                       for path, key, direction in todo}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        report(future.result())
+                    except Exception as e:
+                        failed += 1
+                        print(f"❌ {futures[future]}: {str(e)}")
+            except KeyboardInterrupt:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    elapsed = time.perf_counter() - started
+    print(f"📊 {len(todo) - failed}/{len(todo)} clips, {frames_read} frames ({frames_inferred} inferred) "
+          f"in {elapsed:.1f}s with {workers} workers: {frames_read / elapsed:.1f} fps read, "
+          f"{frames_inferred / elapsed:.1f} fps inferred")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Detector backends compared on the same counting code: throughput of one
+4-direction inference tick, and how far each backend's detections and
+ROI counts drift from the reference (the first backend listed)
+
+Export the models first, e.g.:
+    python detector_backends.py export --format onnx
+    python detector_backends.py export --format openvino --int8 --calibration uploads/<session>/*.mp4
+
+Usage (from cv-service/):
+    python benchmarks/bench_backends.py --videos uploads/<session>/*.mp4 \\
+        --backend torch:yolov8n.pt --backend onnx:yolov8n-480.onnx \\
+        --backend openvino:yolov8n-480.xml --backend openvino:yolov8n-480-int8.xml
+"""
+import argparse
+import os
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from common import DIRECTIONS, make_direction_frames, print_table, time_call
+from detector_backends import create_backend
+from tracker import iou_matrix
+
+
+def sample_ticks(video_paths: List[str], ticks: int, width: int, height: int) -> List[Dict[str, np.ndarray]]:
+    """Frames for `ticks` inference ticks: one clip per direction, sampled evenly over its length"""
+    if not video_paths:
+        return [make_direction_frames(width, height, seed) for seed in range(ticks)]
+
+    by_direction = {}
+    for i, path in enumerate(sorted(video_paths)):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        by_direction[stem if stem in DIRECTIONS else DIRECTIONS[i % len(DIRECTIONS)]] = path
+
+    samples = [{} for _ in range(ticks)]
+    for direction, path in by_direction.items():
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or ticks
+        for tick, index in enumerate(np.linspace(0, total - 1, ticks).astype(int)):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                samples[tick][direction] = frame
+        cap.release()
+    return [tick for tick in samples if tick]
+
+
+def box_f1(reference, candidate, iou_threshold: float = 0.5) -> float:
+    """F1 of candidate boxes against reference boxes (same class, greedy IoU matching)"""
+    if len(reference) == 0 and len(candidate) == 0:
+        return 1.0
+    iou = iou_matrix(reference.boxes, candidate.boxes)
+    if iou.size:
+        iou[reference.classes[:, None] != candidate.classes[None, :]] = 0
+    matched = 0
+    used = set()
+    for r in range(iou.shape[0]):
+        order = np.argsort(-iou[r]) if iou.shape[1] else []
+        for c in order:
+            if iou[r, c] < iou_threshold:
+                break
+            if c not in used:
+                used.add(c)
+                matched += 1
+                break
+    return 2 * matched / (len(reference) + len(candidate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", action="append", required=True,
+                        help="kind:model_path (repeat; the first one is the reference)")
+    parser.add_argument("--videos", nargs="*", default=[], help="clips to sample (default: synthetic frames)")
+    parser.add_argument("--ticks", type=int, default=50, help="4-direction ticks compared for accuracy")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--imgsz", type=int, default=480)
+    parser.add_argument("--conf", type=float, default=float(os.getenv("CONFIDENCE_THRESHOLD", 0.4)))
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    ticks = sample_ticks(args.videos, args.ticks, args.width, args.height)
+    kind, path = args.backend[0].split(":", 1)
+    os.environ.update({"DETECTOR_BACKEND": kind, "MODEL_PATH": path, "DETECTOR_IMGSZ": str(args.imgsz)})
+
+    from video_processor import VideoProcessor
+
+    # The processor carries the reference backend and the counting code every backend is scored with
+    processor = VideoProcessor()
+    processor.confidence_threshold = args.conf
+
+    def counts_of(tick_detections):
+        return [processor.analyze_frame(frame.copy(), direction, tick_detections[i][direction], False)
+                for i, tick in enumerate(ticks) for direction, frame in tick.items()]
+
+    def run(backend):
+        results = []
+        for tick in ticks:
+            directions = list(tick)
+            results.append(dict(zip(directions, backend.predict([tick[d] for d in directions], args.conf))))
+        return results
+
+    reference = run(processor.detector)
+    reference_counts = counts_of(reference)
+
+    rows = {}
+    print(f"\nAccuracy against {args.backend[0]} over {sum(len(t) for t in ticks)} direction-frames "
+          f"(conf {args.conf}, imgsz {args.imgsz})")
+    print(f"{'backend':<40}{'box F1':>8}{'count MAE':>11}{'counts equal':>14}{'dirs/s':>9}")
+    for spec in args.backend:
+        kind, path = spec.split(":", 1)
+        backend = processor.detector if spec == args.backend[0] else create_backend(kind, path, args.imgsz)
+        detections = run(backend)
+        counts = counts_of(detections)
+
+        f1 = np.mean([box_f1(ref.select(np.isin(ref.classes, processor.target_class_ids)),
+                             det.select(np.isin(det.classes, processor.target_class_ids)))
+                      for ref_tick, det_tick in zip(reference, detections)
+                      for ref, det in ((ref_tick[d], det_tick[d]) for d in ref_tick)])
+        errors = np.array([abs(a["vehicle_count"] - b["vehicle_count"]) + abs(a["pedestrian_count"] - b["pedestrian_count"])
+                           for a, b in zip(reference_counts, counts)])
+
+        tick = ticks[0]
+        frames = [tick[d] for d in tick]
+        rows[spec] = time_call(lambda: backend.predict(frames, args.conf), args.repeat)
+        directions_per_second = 1000 / rows[spec]["mean_ms"] * len(frames)
+        print(f"{spec:<40}{f1:>8.3f}{errors.mean():>11.2f}{(errors == 0).mean():>14.0%}{directions_per_second:>9.1f}")
+
+    print_table(f"Inference tick latency ({len(frames)} directions in one batch)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Throughput of one inference tick (all four directions):
+per-direction YOLO calls vs a single batched call
+
+Usage (from cv-service/):
+    MODEL_PATH=yolov8n.pt python benchmarks/bench_batched_inference.py --repeat 20
+"""
+import argparse
+
+from common import make_direction_frames, print_table, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    from video_processor import VideoProcessor
+
+    processor = VideoProcessor()
+    frames = make_direction_frames(args.width, args.height)
+
+    def per_direction_model():
+        for frame in frames.values():
+            processor.detector.predict([frame], processor.confidence_threshold)
+
+    def batched_model():
+        processor.infer_batch(frames)
+
+    def per_direction_tick():
+        for direction, frame in frames.items():
+            processor.detect_and_count(frame.copy(), direction)
+
+    def batched_tick():
+        results = processor.infer_batch(frames)
+        for direction, frame in frames.items():
+            processor.detect_and_count(frame.copy(), direction, results[direction])
+
+    rows = {
+        "model only, 4 x single frame": time_call(per_direction_model, args.repeat),
+        "model only, 1 x batch of 4": time_call(batched_model, args.repeat),
+        "detect_and_count, per-direction": time_call(per_direction_tick, args.repeat),
+        "detect_and_count, batched": time_call(batched_tick, args.repeat),
+    }
+    print_table(f"Inference tick, 4 directions at {args.width}x{args.height}", rows)
+
+    for name, stats in rows.items():
+        ticks_per_second = 1000 / stats["mean_ms"]
+        print(f"{name:<34}{ticks_per_second:>8.2f} ticks/s  ({ticks_per_second * 4:.1f} direction-frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Per-frame latency of VideoProcessor.detect_and_count
+
+Usage (from cv-service/):
+    MODEL_PATH=yolov8n.pt python benchmarks/bench_detect_and_count.py --repeat 20
+"""
+import argparse
+
+from common import DIRECTIONS, make_frame, print_table, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    from video_processor import VideoProcessor
+
+    processor = VideoProcessor()
+    frame = make_frame(args.width, args.height)
+
+    rows = {}
+    for direction in DIRECTIONS:
+        rows[f"detect_and_count {direction}"] = time_call(
+            lambda: processor.detect_and_count(frame.copy(), direction), args.repeat
+        )
+    print_table(f"detect_and_count per frame at {args.width}x{args.height}", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Emergency-light detection: the original full-frame HSV check on every frame
+vs the temporal EmergencyLightDetector (ROI crop, downsampled, flash-rate
+confirmation). Reports the per-frame cost and how often each one fires on
+synthetic scenes with and without a flashing light bar
+
+Usage (from cv-service/):
+    python benchmarks/bench_emergency_lights.py --repeat 200
+"""
+import argparse
+
+import numpy as np
+
+from common import make_frame, print_table, time_call
+from emergency_lights import EmergencyLightDetector, detect_lights_full_frame
+from roi import quadrant_polygon
+
+RED = (0, 0, 255)
+BLUE = (255, 0, 0)
+
+
+def scene(width: int, height: int, name: str, t: float, flash_hz: float) -> np.ndarray:
+    """One frame of a synthetic scene at time t (seconds); everything happens in the north ROI"""
+    frame = make_frame(width, height, seed=1)
+    if name == "red sign":
+        # Static red billboard, about 2.5% of the frame
+        frame[int(height * 0.6):int(height * 0.6) + height // 7, width // 5:width // 5 + width // 6] = RED
+    elif name == "red car passing":
+        # Red car driving across the ROI over 3 seconds
+        x = int(width * (0.1 + 0.8 * (t % 3.0) / 3.0))
+        frame[int(height * 0.7):int(height * 0.8), x:x + width // 8] = RED
+    elif name == "flashing light bar":
+        # Light bar alternating red and blue at flash_hz
+        bar_w, bar_h = width // 24, height // 36
+        x, y = width // 2, int(height * 0.7)
+        red_on = (t * flash_hz) % 1.0 < 0.5
+        frame[y:y + bar_h, x:x + bar_w] = RED if red_on else (60, 60, 60)
+        frame[y:y + bar_h, x + bar_w:x + 2 * bar_w] = (60, 60, 60) if red_on else BLUE
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--sample-fps", type=float, default=8.0, help="light samples per second of video")
+    parser.add_argument("--seconds", type=float, default=6.0, help="length of each scene")
+    parser.add_argument("--flash-hz", type=float, default=2.0)
+    args = parser.parse_args()
+
+    roi = quadrant_polygon(args.width, args.height, "north")
+
+    # Per-frame cost
+    frame = scene(args.width, args.height, "flashing light bar", 0.0, args.flash_hz)
+    detector = EmergencyLightDetector(roi)
+    clock = iter(range(10 ** 9))
+    rows = {
+        "full-frame HSV (original)": time_call(lambda: detect_lights_full_frame(frame), args.repeat),
+        "temporal ROI detector": time_call(lambda: detector.update(frame, next(clock) / args.sample_fps), args.repeat),
+    }
+    print_table(f"Light check per frame at {args.width}x{args.height}", rows)
+
+    # Detection behaviour over time
+    times = np.arange(0, args.seconds, 1 / args.sample_fps)
+    print(f"\nFrames flagged ({len(times)} samples at {args.sample_fps:g} fps, flash at {args.flash_hz:g} Hz)")
+    print(f"{'scene':<24}{'full-frame':>12}{'temporal':>12}{'first confirm s':>18}")
+    for name in ("plain road", "red sign", "red car passing", "flashing light bar"):
+        detector = EmergencyLightDetector(roi)
+        old_hits = new_hits = 0
+        first_confirm = None
+        for t in times:
+            frame = scene(args.width, args.height, name, t, args.flash_hz)
+            old_hits += detect_lights_full_frame(frame)
+            if detector.update(frame, t):
+                new_hits += 1
+                if first_confirm is None:
+                    first_confirm = t
+        confirm = f"{first_confirm:.2f}" if first_confirm is not None else "-"
+        print(f"{name:<24}{old_hits / len(times):>12.0%}{new_hits / len(times):>12.0%}{confirm:>18}")
+
+
+if __name__ == "__main__":
+    main()
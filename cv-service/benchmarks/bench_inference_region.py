@@ -0,0 +1,81 @@
+"""
+One inference tick (all four directions) on the whole frame vs ROI crops vs ROI tiles:
+time, detector input pixels, and the scale each direction's ROI is seen at
+
+Usage (from cv-service/):
+    MODEL_PATH=yolov8n.pt python benchmarks/bench_inference_region.py --repeat 20 --tile-size 640
+    python benchmarks/bench_inference_region.py --videos uploads/<session>/{north,south,east,west}.mp4
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from common import make_direction_frames, print_table, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--tile-size", type=int, default=640)
+    parser.add_argument("--margin", type=float, default=0.1)
+    parser.add_argument("--videos", nargs=4, metavar="VIDEO",
+                        help="north, south, east and west clips to take a real frame from (default: synthetic)")
+    args = parser.parse_args()
+
+    from detector_backends import input_shape
+    from tiling import InferenceRegions
+    from video_processor import VideoProcessor
+
+    processor = VideoProcessor()
+    if args.videos:
+        frames = {}
+        for direction, path in zip(("north", "south", "east", "west"), args.videos):
+            cap = cv2.VideoCapture(path)
+            ret, frame = cap.read()
+            cap.release()
+            if not ret:
+                parser.error(f"could not read {path}")
+            frames[direction] = frame
+    else:
+        frames = make_direction_frames(args.width, args.height)
+
+    cases = {
+        "whole frame": InferenceRegions("frame"),
+        "roi crop": InferenceRegions("roi", args.margin),
+        f"roi tiles ({args.tile_size}px)": InferenceRegions("roi", args.margin, args.tile_size),
+    }
+    rows = {}
+    for name, regions in cases.items():
+        processor.inference_regions = regions
+        rows[name] = time_call(lambda: processor.infer_batch(frames), args.repeat)
+    print_table(f"Inference tick, 4 directions at {args.width}x{args.height}", rows)
+
+    imgsz = processor.detector.imgsz
+    print(f"\n{'case':<34}{'input px':>10}{'counted':>9}   scale per direction (input px per source px)")
+    for name, regions in cases.items():
+        processor.inference_regions = regions
+        pixels = 0
+        scales = []
+        for direction, frame in frames.items():
+            height, width = frame.shape[:2]
+            rects = regions.rects(processor.get_roi_polygon(width, height, direction), width, height)
+            for x0, y0, x1, y1 in rects:
+                shape = input_shape([frame[y0:y1, x0:x1]], imgsz)
+                pixels += shape[0] * shape[1]
+            x0, y0, x1, y1 = rects[0]
+            scales.append(f"{direction} {imgsz / max(x1 - x0, y1 - y0):.2f}")
+        results = processor.infer_batch(frames)
+        counted = sum(
+            processor.count_in_roi(results[direction].select(np.isin(results[direction].classes,
+                                                                     processor.target_class_ids)),
+                                   direction, frame.shape[1], frame.shape[0])[0]
+            for direction, frame in frames.items()
+        )
+        print(f"{name:<34}{pixels // 1000:>9}k{counted:>9}   {', '.join(scales)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+ROI filtering cost per frame: the original per-box path (rebuild the polygon,
+then cv2.pointPolygonTest box by box) vs RoiRegistry's cached mask lookup
+
+Usage (from cv-service/):
+    python benchmarks/bench_roi.py --repeat 200
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from common import print_table, time_call
+from roi import RoiRegistry, quadrant_polygon
+
+
+def random_centers(count: int, width: int, height: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.stack([rng.uniform(0, width, count), rng.uniform(0, height, count)], axis=1).astype(np.float32)
+
+
+def per_box(centers: np.ndarray, width: int, height: int, direction: str) -> np.ndarray:
+    roi = quadrant_polygon(width, height, direction)
+    return np.array([cv2.pointPolygonTest(roi, (int(x), int(y)), False) >= 0 for x, y in centers], bool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    registry = RoiRegistry()
+    rows = {}
+    for count in (10, 100, 500):
+        centers = random_centers(count, args.width, args.height, count)
+        for direction in ("north", "east"):
+            expected = per_box(centers, args.width, args.height, direction)
+            got = registry.contains(direction, args.width, args.height, centers)
+            assert (expected == got).all(), f"ROI mismatch for {direction} with {count} boxes"
+
+        rows[f"per-box pointPolygonTest, {count}"] = time_call(
+            lambda: per_box(centers, args.width, args.height, "north"), args.repeat
+        )
+        rows[f"cached mask lookup, {count}"] = time_call(
+            lambda: registry.contains("north", args.width, args.height, centers), args.repeat
+        )
+    print_table(f"ROI filtering per frame at {args.width}x{args.height} (results verified identical)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+SignalArray vs one SignalLogic per intersection: intersections updated per
+second on randomised traces (ambulances, pedestrian surges, heavy traffic,
+empty approaches, uneven tick spacing). That both produce the same signal
+state is checked by tests/test_signal_array.py
+
+Usage (from cv-service/):
+    python benchmarks/bench_signal_array.py --sizes 1,16,100,1000,10000
+"""
+import argparse
+import time
+import numpy as np
+
+import common  # noqa: F401  (puts cv-service on sys.path)
+from signal_array import DIRECTIONS, NO_DIRECTION, SignalArray
+from signal_logic import SignalLogic
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def random_inputs(n: int, ticks: int, seed: int = 0):
+    """
+    Per-tick counts for n intersections that hit every rule: quiet and heavy
+    periods, empty approaches, pedestrian surges and ambulances that come, go
+    and switch direction
+    """
+    rng = np.random.default_rng(seed)
+    level = rng.choice([0.0, 2.0, 8.0, 30.0], size=(n, 4))
+    vehicles = np.empty((ticks, n, 4), np.int32)
+    pedestrians = np.empty((ticks, n, 4), np.int32)
+    ambulance = np.full((ticks, n), NO_DIRECTION, np.int8)
+    amb_direction = np.full(n, NO_DIRECTION, np.int8)
+    for t in range(ticks):
+        change = rng.random((n, 4)) < 0.01
+        level[change] = rng.choice([0.0, 2.0, 8.0, 30.0], size=int(change.sum()))
+        vehicles[t] = rng.poisson(level)
+        pedestrians[t] = rng.poisson(0.8, size=(n, 4))
+        arrive = (amb_direction == NO_DIRECTION) & (rng.random(n) < 0.003)
+        amb_direction[arrive] = rng.integers(0, 4, size=int(arrive.sum()))
+        leave = rng.random(n) < 0.02
+        amb_direction[leave] = NO_DIRECTION
+        switch = (amb_direction != NO_DIRECTION) & (rng.random(n) < 0.005)
+        amb_direction[switch] = rng.integers(0, 4, size=int(switch.sum()))
+        ambulance[t] = amb_direction
+    # Uneven tick spacing, sometimes long enough to expire several timers at once
+    steps = rng.choice([0.05, 0.1, 0.3, 1.0, 4.0], size=ticks, p=[0.3, 0.4, 0.2, 0.08, 0.02])
+    return vehicles, pedestrians, ambulance, steps
+
+
+def scalar_update(logic: SignalLogic, vehicles: np.ndarray, pedestrians: np.ndarray, ambulance: int):
+    return logic.update(dict(zip(DIRECTIONS, vehicles.tolist())), dict(zip(DIRECTIONS, pedestrians.tolist())),
+                        DIRECTIONS[ambulance] if ambulance != NO_DIRECTION else None)
+
+
+def throughput(n: int, ticks: int, array: bool) -> float:
+    """Intersection updates per second"""
+    vehicles, pedestrians, ambulance, steps = random_inputs(n, ticks, seed=n)
+    clock = SimulatedClock()
+    if array:
+        signals = SignalArray(n, clock=clock)
+        started = time.perf_counter()
+        for t in range(ticks):
+            clock.now += steps[t]
+            signals.update(vehicles[t], pedestrians[t], ambulance[t])
+    else:
+        scalars = [SignalLogic(clock=clock, verbose=False) for _ in range(n)]
+        started = time.perf_counter()
+        for t in range(ticks):
+            clock.now += steps[t]
+            for i, logic in enumerate(scalars):
+                scalar_update(logic, vehicles[t, i], pedestrians[t, i], ambulance[t, i])
+    return n * ticks / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,16,100,1000,10000", help="intersection counts to time")
+    parser.add_argument("--updates", type=int, default=200000, help="intersection updates per timing run")
+    args = parser.parse_args()
+
+    print(f"{'intersections':>14}{'SignalLogic upd/s':>20}{'SignalArray upd/s':>20}{'speedup':>10}")
+    for n in (int(size) for size in args.sizes.split(",")):
+        ticks = max(5, args.updates // n)
+        scalar = throughput(n, ticks, array=False)
+        vectorized = throughput(n, ticks, array=True)
+        print(f"{n:>14}{scalar:>20,.0f}{vectorized:>20,.0f}{vectorized / scalar:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Shared helpers for the cv-service benchmarks
+Run any benchmark from the cv-service directory, e.g.:
+    python benchmarks/bench_batched_inference.py
+"""
+import os
+import sys
+import time
+import statistics
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Make the cv-service modules importable when run as a script
+CV_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CV_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, CV_SERVICE_DIR)
+
+DIRECTIONS = ["north", "south", "east", "west"]
+
+
+def make_frame(width: int = 1280, height: int = 720, seed: int = 0, vehicles: int = 12) -> np.ndarray:
+    """
+    Build a synthetic road-like BGR frame: grey background, noise and
+    a few coloured rectangles standing in for vehicles
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), 90, np.uint8)
+    frame += rng.integers(0, 40, size=frame.shape, dtype=np.uint8)
+    for _ in range(vehicles):
+        w = int(rng.integers(width // 20, width // 8))
+        h = int(rng.integers(height // 20, height // 8))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        frame[y:y + h, x:x + w] = rng.integers(0, 255, size=3, dtype=np.uint8)
+    return frame
+
+
+def make_direction_frames(width: int = 1280, height: int = 720, seed: int = 0) -> Dict[str, np.ndarray]:
+    """One synthetic frame per direction"""
+    return {direction: make_frame(width, height, seed + i) for i, direction in enumerate(DIRECTIONS)}
+
+
+def write_synthetic_video(path: str, seconds: float = 4.0, fps: float = 30.0, width: int = 1280,
+                          height: int = 720, seed: int = 0, vehicles: int = 10) -> str:
+    """
+    Write a clip of coloured rectangles driving across a noisy road-like
+    background (same seed, same video)
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    background = make_frame(width, height, seed, vehicles=0)
+    sizes = rng.integers([width // 16, height // 16], [width // 8, height // 8], size=(vehicles, 2))
+    starts = rng.uniform([0, 0], [width, height], size=(vehicles, 2))
+    speeds = rng.uniform(-8, 8, size=(vehicles, 2)) * (30.0 / fps)
+    colors = rng.integers(0, 255, size=(vehicles, 3))
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for index in range(int(seconds * fps)):
+        frame = background.copy()
+        positions = (starts + speeds * index) % [width, height]
+        for (x, y), (w, h), color in zip(positions.astype(int), sizes, colors):
+            cv2.rectangle(frame, (int(x), int(y)), (int(x + w), int(y + h)), color.tolist(), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def time_call(fn: Callable[[], object], repeat: int = 20, warmup: int = 3) -> Dict[str, float]:
+    """
+    Time fn() and return latency statistics in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+        "repeat": repeat,
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]):
+    """Print benchmark rows as an aligned table"""
+    print(f"\n{title}")
+    print(f"{'case':<34}{'mean ms':>10}{'median ms':>12}{'p95 ms':>10}")
+    for name, stats in rows.items():
+        print(f"{name:<34}{stats['mean_ms']:>10.2f}{stats['median_ms']:>12.2f}{stats['p95_ms']:>10.2f}")
@@ -0,0 +1,324 @@
+"""
+Benchmark suite for the cv-service hot paths, with machine-readable results
+that can be compared across commits
+
+Times each stage on its own (detect_and_count, detect_ambulance_lights,
+get_roi_polygon, is_point_in_roi, frame_to_base64, SignalLogic.update), then
+the end-to-end tick rate of process_videos on generated videos against a stub
+backend. Inputs are seeded, so two runs on the same machine see the same data,
+and each stage keeps its best of --rounds rounds so a noisy neighbour does not
+read as a regression.
+
+Usage (from cv-service/):
+    python benchmarks/run_suite.py run --output bench-main.json
+    python benchmarks/run_suite.py run --output bench-pr.json --baseline bench-main.json --threshold 0.15
+    python benchmarks/run_suite.py compare bench-main.json bench-pr.json
+`run --baseline` and `compare` exit with status 1 when a result regressed by more
+than the threshold, or when the end-to-end rate is below --budget-fps.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+import numpy as np
+
+from common import CV_SERVICE_DIR, DIRECTIONS, make_frame, time_call, write_synthetic_video
+
+# Environment that changes what the numbers mean; recorded with every run
+RECORDED_ENV = ("MODEL_PATH", "DETECTOR_BACKEND", "DETECTOR_IMGSZ", "DETECTOR_THREADS", "CV_EXECUTOR",
+                "CV_WORKERS", "TRANSPORT_MODE", "INFERENCE_FPS_BUDGET", "BATCH_INFERENCE", "CONFIDENCE_THRESHOLD")
+
+
+class StubBackend(BaseHTTPRequestHandler):
+    """Accepts every update/alert/complete POST, like the Node backend would"""
+    posts = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubBackend.posts += 1
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_backend() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def per_call(stats: Dict[str, float], calls: int) -> Dict[str, float]:
+    """Scale time_call statistics of a batch of `calls` calls down to one call"""
+    return {key: (value / calls if key.endswith("_ms") else value) for key, value in stats.items()}
+
+
+def latency_result(stats: Dict[str, float]) -> Dict:
+    return {"value": round(stats["median_ms"], 6), "unit": "ms", "higher_is_better": False,
+            "stats": {key: round(value, 6) for key, value in stats.items()}}
+
+
+def calibration_workload(frame: np.ndarray):
+    """Fixed mix of interpreter, NumPy and OpenCV work that none of our changes touch"""
+    import cv2
+
+    total = 0
+    for i in range(20000):
+        total += i % 7
+    cv2.GaussianBlur(frame, (9, 9), 0)
+    np.sort(frame.ravel())
+    return total
+
+
+def time_stages(processor, args) -> Dict[str, Dict[str, float]]:
+    """One round of per-stage latency statistics, each stage timed on its own"""
+    from signal_logic import SignalLogic
+
+    frame = make_frame(args.width, args.height)
+    results = {"calibration": time_call(lambda: calibration_workload(frame), args.repeat)}
+
+    results["detect_and_count"] = time_call(lambda: processor.detect_and_count(frame.copy(), "north"), args.repeat)
+    results["detect_ambulance_lights"] = time_call(lambda: processor.detect_ambulance_lights(frame), args.repeat * 5)
+    results["frame_to_base64"] = time_call(lambda: processor.frame_to_base64(frame), args.repeat * 5)
+
+    # Sub-microsecond to microsecond calls: time batches and report per call
+    calls = 1000
+    results["get_roi_polygon"] = per_call(time_call(
+        lambda: [processor.get_roi_polygon(args.width, args.height, DIRECTIONS[i % 4]) for i in range(calls)],
+        args.repeat), calls)
+    roi = processor.get_roi_polygon(args.width, args.height, "north")
+    rng = np.random.default_rng(0)
+    points = [(int(x), int(y)) for x, y in zip(rng.integers(0, args.width, calls), rng.integers(0, args.height, calls))]
+    results["is_point_in_roi"] = per_call(time_call(
+        lambda: [processor.is_point_in_roi(point, roi) for point in points], args.repeat), calls)
+
+    now = [0.0]
+    logic = SignalLogic(clock=lambda: now[0], verbose=False)
+    vehicles = [dict(zip(DIRECTIONS, counts)) for counts in rng.poisson(6, size=(calls, 4)).tolist()]
+    pedestrians = [dict(zip(DIRECTIONS, counts)) for counts in rng.poisson(0.8, size=(calls, 4)).tolist()]
+
+    def signal_updates():
+        for i in range(calls):
+            now[0] += 0.1
+            logic.update(vehicles[i], pedestrians[i], "east" if i % 500 < 20 else None)
+
+    results["signal_logic_update"] = per_call(time_call(signal_updates, args.repeat), calls)
+    return results
+
+
+def run_stages(processor, args) -> Dict[str, Dict]:
+    """
+    Per-stage latency over --rounds rounds, keeping each stage's best round
+    (interference from other processes only ever makes a round slower)
+    """
+    rounds = [time_stages(processor, args) for _ in range(max(1, args.rounds))]
+    results = {}
+    for name in rounds[0]:
+        medians = [stats[name]["median_ms"] for stats in rounds]
+        best = min(rounds, key=lambda stats: stats[name]["median_ms"])[name]
+        results[name] = latency_result({**best, "rounds": len(rounds), "round_spread": max(medians) / min(medians)})
+    return results
+
+
+async def run_session(processor, video_paths: Dict[str, str], seconds: float) -> Dict:
+    stats = {}
+    task = asyncio.create_task(processor.process_videos("benchmark", video_paths, stats=stats))
+    # Let the readers open and the first ticks settle before measuring
+    while stats.get("ticks", 0) < 3 and not task.done():
+        await asyncio.sleep(0.05)
+    start_ticks, start_inferred = stats.get("ticks", 0), stats.get("frames_inferred", 0)
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - started
+    ticks, inferred = stats.get("ticks", 0) - start_ticks, stats.get("frames_inferred", 0) - start_inferred
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    if stats.get("error"):
+        raise RuntimeError(f"process_videos failed: {stats['error']}")
+    return {"ticks": ticks, "frames_inferred": inferred, "seconds": elapsed}
+
+
+def run_end_to_end(processor, args) -> Dict[str, Dict]:
+    """process_videos over four generated clips for --e2e-seconds"""
+    with tempfile.TemporaryDirectory(prefix="cv-bench-") as tmp:
+        video_paths = {
+            direction: write_synthetic_video(os.path.join(tmp, f"{direction}.mp4"), args.video_seconds, 30.0,
+                                             args.width, args.height, seed=i)
+            for i, direction in enumerate(DIRECTIONS)
+        }
+        run = asyncio.run(run_session(processor, video_paths, args.e2e_seconds))
+
+    ticks_per_s = run["ticks"] / run["seconds"]
+    return {
+        # One tick advances every direction by one frame, so ticks/s is the video frame rate kept up with
+        "process_videos_fps": {"value": round(ticks_per_s, 2), "unit": "fps", "higher_is_better": True,
+                               "stats": {"ticks": run["ticks"], "seconds": round(run["seconds"], 2),
+                                         "realtime_factor": round(ticks_per_s / 30.0, 3)}},
+        "process_videos_inferred_fps": {"value": round(run["frames_inferred"] / run["seconds"], 2), "unit": "fps",
+                                        "higher_is_better": True, "stats": {"frames_inferred": run["frames_inferred"]}},
+    }
+
+
+def git_revision() -> Dict:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=CV_SERVICE_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def run_suite(args) -> Dict:
+    import cv2
+
+    server = start_stub_backend()
+    os.environ["BACKEND_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    # Measure the detector every run, not detections cached by an earlier one
+    os.environ["DETECTION_CACHE_DIR"] = ""
+    # Keep benchmark decisions out of the production journal
+    os.environ["JOURNAL_PATH"] = ""
+    from video_processor import VideoProcessor
+
+    processor = VideoProcessor()
+    processor.warmup()
+    started = time.time()
+    results = run_stages(processor, args)
+    if args.e2e_seconds > 0:
+        results.update(run_end_to_end(processor, args))
+    processor.shutdown()
+    server.shutdown()
+
+    return {
+        "meta": {
+            **git_revision(),
+            "timestamp": started,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "detector": processor.detector.name,
+            "resolution": f"{args.width}x{args.height}",
+            "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, budget_fps: float = 0, normalize: bool = False) -> bool:
+    """
+    Print baseline vs current; returns True if nothing regressed past the threshold or budget
+    normalize divides out the machine-speed drift measured by the calibration workload
+    """
+    for key in ("cpu_count", "detector", "resolution", "env"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"⚠️ {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)}); "
+                  f"results may not be comparable")
+
+    drift = 1.0
+    if "calibration" in baseline["results"] and "calibration" in current["results"]:
+        drift = current["results"]["calibration"]["value"] / baseline["results"]["calibration"]["value"]
+        if abs(drift - 1) > threshold:
+            print(f"⚠️ This machine ran the calibration workload {drift:.2f}x as long as the baseline's; "
+                  + ("results are normalised by it" if normalize else "rerun, or pass --normalize"))
+    if not normalize:
+        drift = 1.0
+
+    ok = True
+    print(f"\n{'result':<30}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<30}{'-':>12}{result['value']:>12.4g} {result['unit']}")
+            continue
+        value = result["value"]
+        if name != "calibration":
+            value = value * drift if result["higher_is_better"] else value / drift
+        change = (value - base["value"]) / base["value"] if base["value"] else 0.0
+        worse = -change if result["higher_is_better"] else change
+        flag = ""
+        if worse > threshold and name != "calibration":
+            flag = "  ❌ regression"
+            ok = False
+        print(f"{name:<30}{base['value']:>12.4g}{value:>12.4g}{change:>+8.1%} {result['unit']}{flag}")
+
+    fps = current["results"].get("process_videos_fps")
+    if budget_fps and fps is not None and fps["value"] < budget_fps:
+        print(f"❌ process_videos runs at {fps['value']} fps, below the {budget_fps} fps real-time budget")
+        ok = False
+    return ok
+
+
+def print_results(report: Dict):
+    print(f"\n{'result':<30}{'value':>12}")
+    for name, result in report["results"].items():
+        print(f"{name:<30}{result['value']:>12.4g} {result['unit']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite")
+    run.add_argument("--output", help="write the results JSON here")
+    run.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    run.add_argument("--repeat", type=int, default=20)
+    run.add_argument("--rounds", type=int, default=3, help="stage rounds; each stage keeps its best")
+    run.add_argument("--width", type=int, default=1280)
+    run.add_argument("--height", type=int, default=720)
+    run.add_argument("--e2e-seconds", type=float, default=10.0, help="0 skips the process_videos run")
+    run.add_argument("--video-seconds", type=float, default=4.0, help="length of each generated clip (looped)")
+
+    diff = commands.add_parser("compare", help="compare two results files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+
+    for command in (run, diff):
+        command.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+        command.add_argument("--budget-fps", type=float, default=0, help="minimum process_videos fps (0: off)")
+        command.add_argument("--normalize", action="store_true",
+                             help="scale results by the calibration workload's drift from the baseline")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        sys.exit(0 if compare(baseline, current, args.threshold, args.budget_fps, args.normalize) else 1)
+
+    report = run_suite(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.exit(0 if compare(baseline, report, args.threshold, args.budget_fps, args.normalize) else 1)
+    print_results(report)
+    fps = report["results"].get("process_videos_fps")
+    if args.budget_fps and fps is not None and fps["value"] < args.budget_fps:
+        print(f"❌ process_videos runs at {fps['value']} fps, below the {args.budget_fps} fps real-time budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
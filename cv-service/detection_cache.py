@@ -0,0 +1,270 @@
+"""
+Persistent detection cache for re-processed videos
+
+Detections depend only on the video content, the frame, the model and its
+settings, so a clip uploaded again (demos, regression runs, parameter tuning)
+does not need YOLO again. Entries are keyed by the video's content hash, the
+model identity (backend and weights hash), imgsz, the confidence threshold and
+the inference region (whole frame or ROI crops/tiles);
+within an entry, by frame position in the file.
+
+Each entry is a series of segments, one per flush, each two .npy files
+memory-mapped on read:
+    <key>.<n>.rows.npy   (M, 6) float32: x1, y1, x2, y2, confidence, class
+    <key>.<n>.index.npy  (K, 3) int64: frame position, first row, end row (sorted)
+A flush only writes its own new frames as the next segment, so its cost does
+not grow with the entry. Writers are serialised per entry with a lock file and
+write a segment's rows before its index, each atomically; a segment exists
+for readers once its index does, so a reader never sees a torn one.
+The directory is kept under DETECTION_CACHE_MAX_MB by evicting the least
+recently used entries (whole entries, after each session).
+"""
+import contextlib
+import glob
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within a process
+    fcntl = None
+
+import numpy as np
+
+from detections import Detections
+
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """blake2b of a file's content"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_identity(detector) -> str:
+    """Backend name plus the hash of its weights (and an OpenVINO model's .bin)"""
+    parts = [detector.name]
+    path = detector.model_path
+    for weights in (path, os.path.splitext(path)[0] + ".bin" if path.endswith(".xml") else None):
+        if weights and os.path.isfile(weights):
+            parts.append(file_digest(weights))
+        elif weights:
+            parts.append(weights)  # e.g. a name ultralytics resolves itself
+    return ":".join(parts)
+
+
+class CacheEntry:
+    """
+    The cached detections of one video for one model configuration
+    get() reads the memory-mapped segments; put() collects new frames, which
+    flush() (blocking: run it off the event loop) appends as a new segment
+    """
+
+    def __init__(self, cache: "DetectionCache", key: str):
+        self.cache = cache
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        self._pending: Dict[int, Detections] = {}
+        self._flushing: Dict[int, Detections] = {}  # taken by a running flush(), not on disk yet
+        # positions (sorted), their (segment, first row, end row), and each segment's rows;
+        # replaced as one tuple so get() never pairs one load's positions with another's rows
+        self._state: Tuple[np.ndarray, np.ndarray, List[np.ndarray]] = (
+            np.zeros(0, np.int64), np.zeros((0, 3), np.int64), []
+        )
+        self._next_segment = 0
+        self._load()
+
+    def _load(self):
+        """Map the segments written since the last load (by this or any other writer)"""
+        positions, where, segment_rows = self._state
+        new_positions, new_where, segment_rows = [positions], [where], list(segment_rows)
+        while True:
+            index_path, rows_path = self.cache.paths(self.key, self._next_segment)
+            try:
+                index = np.load(index_path, mmap_mode="r")
+                rows = np.load(rows_path, mmap_mode="r")
+            except (OSError, ValueError):
+                break  # No such segment (yet), or evicted
+            segment = np.full((len(index), 1), len(segment_rows), np.int64)
+            new_positions.append(np.asarray(index[:, 0]))
+            new_where.append(np.hstack([segment, np.asarray(index[:, 1:])]))
+            segment_rows.append(rows)
+            self._next_segment += 1
+        if len(segment_rows) == len(self._state[2]):
+            return
+        positions, where = np.concatenate(new_positions), np.concatenate(new_where)
+        if np.any(positions[1:] < positions[:-1]):
+            order = np.argsort(positions, kind="stable")
+            positions, where = positions[order], where[order]
+        self._state = (positions, where, segment_rows)
+        try:
+            os.utime(self.cache.paths(self.key, self._next_segment - 1)[0])  # Recently used, for eviction
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._state[0]) + len(self._flushing) + len(self._pending)
+
+    def get(self, position: int) -> Optional[Detections]:
+        """Detections at a frame position, or None if it was never stored"""
+        positions, where, segment_rows = self._state
+        i = int(np.searchsorted(positions, position))
+        if i < len(positions) and positions[i] == position:
+            segment, start, end = where[i]
+            rows = np.asarray(segment_rows[segment][start:end])
+            self.hits += 1
+            return Detections(rows[:, :4].copy(), rows[:, 5].astype(np.int32), rows[:, 4].copy())
+        pending = self._pending.get(position)
+        if pending is None:
+            pending = self._flushing.get(position)
+        if pending is not None:
+            self.hits += 1
+            return pending
+        self.misses += 1
+        return None
+
+    def put(self, position: int, detections: Detections) -> bool:
+        """Remember a frame's detections; True once flush_frames are waiting for flush()"""
+        self._pending[position] = detections
+        return len(self._pending) >= self.cache.flush_frames
+
+    def flush(self):
+        """
+        Write the pending frames as a new segment: only their rows are written,
+        earlier segments are never rewritten
+        """
+        if not self._pending:
+            return
+        self._flushing, self._pending = self._pending, {}
+        try:
+            with self.cache.locked(self.key):
+                # Re-read: another session may have extended the entry meanwhile
+                self._load()
+                known = self._state[0]
+                new_positions = sorted(self._flushing)
+                new_positions = [p for p, seen in zip(new_positions, np.isin(new_positions, known)) if not seen]
+                if not new_positions:
+                    return
+                index = np.empty((len(new_positions), 3), np.int64)
+                rows = []
+                start = 0
+                for i, position in enumerate(new_positions):
+                    detections = self._flushing[position]
+                    frame_rows = np.empty((len(detections), 6), np.float32)
+                    frame_rows[:, :4] = detections.boxes
+                    frame_rows[:, 4] = detections.confidences
+                    frame_rows[:, 5] = detections.classes
+                    index[i] = (position, start, start + len(frame_rows))
+                    rows.append(frame_rows)
+                    start += len(frame_rows)
+                index_path, rows_path = self.cache.paths(self.key, self._next_segment)
+                # Rows first: a segment exists for readers once its index does
+                self.cache.write_atomic(rows_path, np.concatenate(rows))
+                self.cache.write_atomic(index_path, index)
+                self._load()
+        finally:
+            self._flushing = {}
+
+
+class DetectionCache:
+    """
+    Content-addressed, size-bounded store of per-frame detections
+    (DETECTION_CACHE_DIR, empty to disable; DETECTION_CACHE_MAX_MB)
+    """
+
+    def __init__(self, directory: str, max_bytes: int, flush_frames: int = 500):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_frames = flush_frames
+        self.lock = threading.Lock()
+        self._digests: Dict[Tuple[str, int, int], str] = {}  # (path, size, mtime) -> content hash
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["DetectionCache"]:
+        directory = os.getenv("DETECTION_CACHE_DIR", "detection_cache")
+        if not directory:
+            return None
+        return cls(directory, int(float(os.getenv("DETECTION_CACHE_MAX_MB", 1024)) * 1024 * 1024))
+
+    def video_digest(self, path: str) -> str:
+        """Content hash of a video file, remembered while the file is unchanged"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = file_digest(path)
+        return digest
+
+    def open(self, video_path: str, model_id: str, imgsz: int, conf: float, region: str = "frame") -> CacheEntry:
+        """The entry for a video under this model configuration (hashes the file; run off the event loop)"""
+        config = f"{self.video_digest(video_path)}|{model_id}|{imgsz}|{conf!r}"
+        if region != "frame":
+            config += f"|{region}"  # Whole-frame entries keep the keys they were written under
+        return CacheEntry(self, hashlib.blake2b(config.encode(), digest_size=16).hexdigest())
+
+    @contextlib.contextmanager
+    def locked(self, key: str):
+        """Exclusive access to an entry, across threads and (where flock exists) processes"""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, f"{key}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def paths(self, key: str, segment: int) -> Tuple[str, str]:
+        """Index and rows file of one segment of an entry"""
+        base = os.path.join(self.directory, f"{key}.{segment}")
+        return f"{base}.index.npy", f"{base}.rows.npy"
+
+    def write_atomic(self, path: str, array: np.ndarray):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(self.directory, "*.npy")))
+
+    def evict(self):
+        """
+        Delete least recently used entries until the directory fits in max_bytes
+        Stats the whole directory: run it off the event loop, once per session rather than per flush
+        """
+        entries: Dict[str, list] = {}  # key -> [last used, bytes, files]
+        total = 0
+        for path in glob.glob(os.path.join(self.directory, "*.npy")):
+            key = os.path.basename(path).split(".", 1)[0]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = entries.setdefault(key, [0.0, 0, []])
+            if path.endswith(".index.npy"):
+                entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+            total += stat.st_size
+        for key, (_, size, files) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            # Index files first, so a reader never finds an index without its rows
+            files = sorted(files, key=lambda path: not path.endswith(".index.npy"))
+            for path in files + [os.path.join(self.directory, f"{key}.lock")]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
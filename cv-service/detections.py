@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class Detections:
+    """
+    Result of one detection pass over a frame, as plain arrays
+    boxes: (N, 4) float32 xyxy in frame pixels
+    classes: (N,) int32 COCO class ids
+    confidences: (N,) float32
+    """
+    boxes: np.ndarray
+    classes: np.ndarray
+    confidences: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(
+            np.zeros((0, 4), np.float32),
+            np.zeros(0, np.int32),
+            np.zeros(0, np.float32),
+        )
+
+    @classmethod
+    def from_result(cls, result) -> "Detections":
+        """Build from an ultralytics Results object with a single device sync"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+
+        # data columns: x1, y1, x2, y2, [track_id], conf, cls
+        data = boxes.data.cpu().numpy()
+        return cls(
+            data[:, :4].astype(np.float32),
+            data[:, -1].astype(np.int32),
+            data[:, -2].astype(np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def select(self, mask: np.ndarray) -> "Detections":
+        """Subset by boolean mask or index array"""
+        return Detections(self.boxes[mask], self.classes[mask], self.confidences[mask])
+
+    def centers(self) -> np.ndarray:
+        """(N, 2) box centers"""
+        return np.stack([
+            (self.boxes[:, 0] + self.boxes[:, 2]) / 2,
+            (self.boxes[:, 1] + self.boxes[:, 3]) / 2,
+        ], axis=1)
@@ -0,0 +1,383 @@
+"""
+Pluggable YOLOv8 detector backends for CPU inference
+DETECTOR_BACKEND=torch     - ultralytics PyTorch model (MODEL_PATH, default yolov8n.pt)
+DETECTOR_BACKEND=onnx      - ONNX Runtime on an exported .onnx model (MODEL_PATH)
+DETECTOR_BACKEND=openvino  - OpenVINO on an exported IR .xml model (MODEL_PATH)
+Every backend returns Detections in frame pixels, so the counting code downstream
+is the same whichever one runs.
+
+Export (and optionally INT8-quantize, calibrated on our own clips) with:
+    python detector_backends.py export --format onnx --imgsz 480
+    python detector_backends.py export --format openvino --int8 --calibration uploads/<session>/*.mp4
+"""
+import argparse
+import contextlib
+import glob
+import os
+import threading
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from detections import Detections
+
+DEFAULT_IMGSZ = 480
+NMS_IOU = 0.7  # ultralytics default
+MAX_DETECTIONS = 300
+STRIDE = 32  # YOLOv8 input sides must be multiples of the largest stride
+
+
+@contextlib.contextmanager
+def trusted_torch_load():
+    """
+    Let torch.load read full YOLOv8 checkpoints (PyTorch 2.6+ defaults to weights_only=True)
+    Only patched while our own model file is loaded, not for the whole process
+    """
+    import torch
+
+    original = torch.load
+
+    def patched(f, map_location=None, pickle_module=None, *, weights_only=None, **kwargs):
+        if weights_only is None:
+            weights_only = False
+        return original(f, map_location=map_location, pickle_module=pickle_module, weights_only=weights_only, **kwargs)
+
+    torch.load = patched
+    try:
+        yield
+    finally:
+        torch.load = original
+
+
+class DetectorBackend:
+    """
+    Runs the detector on a batch of BGR frames
+    predict() is safe to call from several stage threads at once
+    """
+
+    name = "base"
+
+    def __init__(self, model_path: str, imgsz: int = DEFAULT_IMGSZ, threads: int = None):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.threads = threads
+
+    def predict(self, frames: List[np.ndarray], conf: float) -> List[Detections]:
+        raise NotImplementedError
+
+
+class TorchBackend(DetectorBackend):
+    """ultralytics YOLO on PyTorch (the original path)"""
+
+    name = "torch"
+
+    def __init__(self, model_path: str, imgsz: int = DEFAULT_IMGSZ, threads: int = None):
+        super().__init__(model_path, imgsz, threads)
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            torch.set_num_threads(threads)
+        with trusted_torch_load():
+            self.model = YOLO(model_path)
+        # The ultralytics predictor is not thread-safe; stage threads take turns on it
+        self._lock = threading.Lock()
+
+    def predict(self, frames: List[np.ndarray], conf: float) -> List[Detections]:
+        with self._lock:
+            results = self.model(frames, conf=conf, verbose=False, imgsz=self.imgsz, half=False)
+        return [Detections.from_result(result) for result in results]
+
+
+def letterbox(frame: np.ndarray, shape: Tuple[int, int], out: np.ndarray = None):
+    """
+    Resize keeping the aspect ratio to fit shape (height, width) and pad the rest (grey 114, centered)
+    out, if given, is a (height, width, 3) uint8 canvas to draw into instead of new arrays
+    Returns: (padded BGR image, scale, (pad_x, pad_y))
+    """
+    height, width = frame.shape[:2]
+    scale = min(shape[0] / height, shape[1] / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    pad_x, pad_y = (shape[1] - new_w) / 2, (shape[0] - new_h) / 2
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    if out is not None:
+        out[:top] = 114
+        out[top + new_h:] = 114
+        out[top:top + new_h, :left] = 114
+        out[top:top + new_h, left + new_w:] = 114
+        cv2.resize(frame, (new_w, new_h), dst=out[top:top + new_h, left:left + new_w], interpolation=cv2.INTER_LINEAR)
+        return out, scale, (left, top)
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    padded = cv2.copyMakeBorder(resized, top, shape[0] - new_h - top, left, shape[1] - new_w - left,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, scale, (left, top)
+
+
+def input_shape(frames: List[np.ndarray], imgsz: int) -> Tuple[int, int]:
+    """
+    Network input (height, width) for a batch: the long side scaled to imgsz and
+    the short side padded only up to a multiple of the stride, like ultralytics'
+    rectangular inference (a 16:9 frame at 480 runs at 480x288, not 480x480)
+    """
+    height, width = 0, 0
+    for frame in frames:
+        h, w = frame.shape[:2]
+        scale = min(imgsz / h, imgsz / w)
+        height = max(height, int(round(h * scale)))
+        width = max(width, int(round(w * scale)))
+    return -(-height // STRIDE) * STRIDE, -(-width // STRIDE) * STRIDE
+
+
+class InputBuffers(threading.local):
+    """
+    Letterbox canvas and network input batch of one stage thread, reused by
+    preprocess() while the input shape stays the same (and grown, never shrunk,
+    with the batch size), so a tick allocates no per-frame intermediates
+    """
+
+    def __init__(self):
+        self.canvas = None
+        self.batch = None
+
+    def get(self, count: int, shape: Tuple[int, int]):
+        if self.canvas is None or self.canvas.shape[:2] != tuple(shape):
+            self.canvas = np.empty((shape[0], shape[1], 3), np.uint8)
+            self.batch = None
+        if self.batch is None or len(self.batch) < count:
+            self.batch = np.empty((count, 3, shape[0], shape[1]), np.float32)
+        return self.canvas, self.batch[:count]
+
+
+def preprocess(frames: List[np.ndarray], imgsz: int, shape: Tuple[int, int] = None, buffers: InputBuffers = None):
+    """
+    Letterboxed, RGB, CHW, 0-1 float32 batch plus the per-frame (scale, pad) to undo it
+    With buffers the batch is a view of the calling thread's reused input buffer,
+    valid until its next preprocess() call; without, it is a new array
+    """
+    shape = shape or input_shape(frames, imgsz)
+    images, transforms = [], []
+    if buffers is not None:
+        canvas, batch = buffers.get(len(frames), shape)
+        for i, frame in enumerate(frames):
+            padded, scale, pad = letterbox(frame, shape, canvas)
+            np.copyto(batch[i], padded[..., ::-1].transpose(2, 0, 1), casting="unsafe")
+            transforms.append((scale, pad))
+        np.divide(batch, np.float32(255.0), out=batch)
+        return batch, transforms
+    for frame in frames:
+        padded, scale, pad = letterbox(frame, shape)
+        images.append(padded)
+        transforms.append((scale, pad))
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0, transforms
+
+
+def postprocess(output: np.ndarray, frame: np.ndarray, scale: float, pad, conf: float) -> Detections:
+    """
+    Decode one image of raw YOLOv8 output (84, N: cx, cy, w, h, 80 class scores)
+    with class-aware NMS, then map the boxes back to frame pixels
+    """
+    predictions = output.T
+    scores_all = predictions[:, 4:]
+    classes = scores_all.argmax(axis=1)
+    scores = scores_all[np.arange(len(classes)), classes]
+    keep = scores > conf
+    if not keep.any():
+        return Detections.empty()
+    predictions, classes, scores = predictions[keep], classes[keep], scores[keep]
+
+    cxcywh = predictions[:, :4]
+    xywh = np.concatenate([cxcywh[:, :2] - cxcywh[:, 2:] / 2, cxcywh[:, 2:]], axis=1)
+    kept = cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores.tolist(), classes.tolist(), conf, NMS_IOU)
+    kept = np.asarray(kept, np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+    boxes = np.concatenate([xywh[kept, :2], xywh[kept, :2] + xywh[kept, 2:]], axis=1)
+    boxes = (boxes - [pad[0], pad[1], pad[0], pad[1]]) / scale
+    height, width = frame.shape[:2]
+    boxes = np.clip(boxes, 0, [width, height, width, height])
+    return Detections(boxes.astype(np.float32), classes[kept].astype(np.int32), scores[kept].astype(np.float32))
+
+
+class OnnxBackend(DetectorBackend):
+    """ONNX Runtime CPU session on an exported (optionally INT8) model"""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, imgsz: int = DEFAULT_IMGSZ, threads: int = None):
+        super().__init__(model_path, imgsz, threads)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self._inputs = InputBuffers()
+
+    def predict(self, frames: List[np.ndarray], conf: float) -> List[Detections]:
+        if not frames:
+            return []
+        batch, transforms = preprocess(frames, self.imgsz, buffers=self._inputs)
+        output = self.session.run(None, {self.input_name: batch})[0]
+        return [postprocess(output[i], frame, scale, pad, conf)
+                for i, (frame, (scale, pad)) in enumerate(zip(frames, transforms))]
+
+
+class OpenVinoBackend(DetectorBackend):
+    """OpenVINO CPU plugin on an exported (optionally INT8) IR model"""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, imgsz: int = DEFAULT_IMGSZ, threads: int = None):
+        super().__init__(model_path, imgsz, threads)
+        import openvino as ov
+
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.model = ov.Core().compile_model(model_path, "CPU", config)
+        self._local = threading.local()  # one infer request per stage thread
+        self._inputs = InputBuffers()
+
+    def predict(self, frames: List[np.ndarray], conf: float) -> List[Detections]:
+        if not frames:
+            return []
+        request = getattr(self._local, "request", None)
+        if request is None:
+            request = self._local.request = self.model.create_infer_request()
+        batch, transforms = preprocess(frames, self.imgsz, buffers=self._inputs)
+        output = request.infer({0: batch})[self.model.output(0)]
+        return [postprocess(output[i], frame, scale, pad, conf)
+                for i, (frame, (scale, pad)) in enumerate(zip(frames, transforms))]
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+}
+
+
+def create_backend(kind: str = None, model_path: str = None, imgsz: int = None, threads: int = None) -> DetectorBackend:
+    """Build the configured backend (DETECTOR_BACKEND, MODEL_PATH, DETECTOR_IMGSZ, DETECTOR_THREADS)"""
+    kind = (kind or os.getenv("DETECTOR_BACKEND", "torch")).lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown DETECTOR_BACKEND '{kind}' (expected one of {', '.join(BACKENDS)})")
+    model_path = model_path or os.getenv("MODEL_PATH", "yolov8n.pt")
+    imgsz = imgsz or int(os.getenv("DETECTOR_IMGSZ", DEFAULT_IMGSZ))
+    threads = threads or int(os.getenv("DETECTOR_THREADS", 0)) or None
+    return BACKENDS[kind](model_path, imgsz, threads)
+
+
+def calibration_frames(video_paths: List[str], count: int = 300) -> Iterator[np.ndarray]:
+    """Frames spread evenly over our own clips, for INT8 calibration"""
+    per_video = max(1, count // max(len(video_paths), 1))
+    for path in video_paths:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        for index in np.linspace(0, total - 1, min(per_video, total)).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                yield frame
+        cap.release()
+
+
+def quantize_int8(model, kind: str, video_paths: List[str], imgsz: int, count: int = 300):
+    """
+    Post-training INT8 quantization with NNCF, calibrated on frames from video_paths
+    The box-decoding tail of the YOLOv8 head stays in float: quantizing it costs
+    a lot of box accuracy for almost no speed
+    """
+    import nncf
+
+    frames = list(calibration_frames(video_paths, count))
+    if not frames:
+        raise ValueError("No calibration frames could be read from the given videos")
+
+    input_name = model.graph.input[0].name if kind == "onnx" else None
+
+    def transform(frame):
+        batch, _ = preprocess([frame], imgsz)
+        return {input_name: batch} if input_name else batch
+
+    tail_types = ["Mul", "Sub", "Add", "Sigmoid", "Div"] if kind == "onnx" \
+        else ["Multiply", "Subtract", "Add", "Sigmoid", "Divide"]
+    return nncf.quantize(
+        model,
+        nncf.Dataset(frames, transform),
+        preset=nncf.QuantizationPreset.MIXED,
+        subset_size=len(frames),
+        ignored_scope=nncf.IgnoredScope(patterns=[r".*model\.22/dfl.*"], types=tail_types, validate=False),
+    )
+
+
+def export(model_path: str, kind: str, imgsz: int = DEFAULT_IMGSZ, int8: bool = False,
+           calibration: List[str] = None, output_dir: str = None, calibration_count: int = 300) -> str:
+    """
+    Export the PyTorch model to ONNX (dynamic batch) or OpenVINO IR, optionally INT8
+    Returns the path of the exported model
+    """
+    import shutil
+    import tempfile
+
+    from ultralytics import YOLO
+
+    output_dir = output_dir or os.path.dirname(os.path.abspath(model_path))
+    os.makedirs(output_dir, exist_ok=True)
+    stem = f"{os.path.splitext(os.path.basename(model_path))[0]}-{imgsz}" + ("-int8" if int8 else "")
+
+    with trusted_torch_load():
+        model = YOLO(model_path)
+    exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=False, verbose=False)
+
+    if kind == "onnx":
+        onnx_path = os.path.join(output_dir, f"{stem}.onnx")
+        shutil.move(exported, onnx_path)
+        if int8:
+            import onnx
+
+            onnx.save(quantize_int8(onnx.load(onnx_path), kind, calibration or [], imgsz, calibration_count), onnx_path)
+        return onnx_path
+
+    import openvino as ov
+
+    # The ONNX file is only an intermediate step here
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        onnx_path = os.path.join(tmp_dir, "model.onnx")
+        shutil.move(exported, onnx_path)
+        ov_model = ov.convert_model(onnx_path)
+    if int8:
+        ov_model = quantize_int8(ov_model, kind, calibration or [], imgsz, calibration_count)
+    xml_path = os.path.join(output_dir, f"{stem}.xml")
+    ov.save_model(ov_model, xml_path, compress_to_fp16=False)
+    return xml_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLOv8 detector for the CPU backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="export to ONNX or OpenVINO IR")
+    export_parser.add_argument("--model", default=os.getenv("MODEL_PATH", "yolov8n.pt"))
+    export_parser.add_argument("--format", choices=["onnx", "openvino"], required=True)
+    export_parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    export_parser.add_argument("--int8", action="store_true", help="post-training INT8 quantization")
+    export_parser.add_argument("--calibration", nargs="*", default=[],
+                               help="videos (or globs) to calibrate INT8 on, e.g. uploads/<session>/*.mp4")
+    export_parser.add_argument("--calibration-frames", type=int, default=300)
+    export_parser.add_argument("--output-dir")
+    args = parser.parse_args()
+
+    calibration = [path for pattern in args.calibration for path in sorted(glob.glob(pattern))]
+    if args.int8 and not calibration:
+        parser.error("--int8 needs --calibration videos")
+    path = export(args.model, args.format, args.imgsz, args.int8, calibration, args.output_dir,
+                  args.calibration_frames)
+    print(f"✅ Exported {args.format}{' INT8' if args.int8 else ''} model to {path}")
+    print(f"   Use it with DETECTOR_BACKEND={args.format} MODEL_PATH={path} DETECTOR_IMGSZ={args.imgsz}")
+
+
+if __name__ == "__main__":
+    main()
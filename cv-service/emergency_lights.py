@@ -0,0 +1,106 @@
+from collections import deque
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+# HSV ranges for bright emergency lights (high saturation and value)
+LOWER_RED1 = np.array([0, 120, 120])
+UPPER_RED1 = np.array([10, 255, 255])
+LOWER_RED2 = np.array([170, 120, 120])
+UPPER_RED2 = np.array([180, 255, 255])
+LOWER_BLUE = np.array([100, 120, 120])
+UPPER_BLUE = np.array([130, 255, 255])
+
+
+def light_ratios(hsv: np.ndarray, mask: np.ndarray = None) -> Tuple[int, int]:
+    """Number of bright red and bright blue pixels in an HSV image (optionally within mask)"""
+    mask_red = cv2.bitwise_or(cv2.inRange(hsv, LOWER_RED1, UPPER_RED1), cv2.inRange(hsv, LOWER_RED2, UPPER_RED2))
+    mask_blue = cv2.inRange(hsv, LOWER_BLUE, UPPER_BLUE)
+    if mask is not None:
+        mask_red = cv2.bitwise_and(mask_red, mask)
+        mask_blue = cv2.bitwise_and(mask_blue, mask)
+    return cv2.countNonZero(mask_red), cv2.countNonZero(mask_blue)
+
+
+def detect_lights_full_frame(frame: np.ndarray) -> bool:
+    """
+    Original single-frame check: bright red or blue covering more than 2% of
+    the full-resolution frame. Kept for standalone detect_and_count calls and
+    as the benchmark baseline
+    """
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    red_pixels, blue_pixels = light_ratios(hsv)
+    total_pixels = frame.shape[0] * frame.shape[1]
+    return red_pixels / total_pixels > 0.02 or blue_pixels / total_pixels > 0.02
+
+
+class EmergencyLightDetector:
+    """
+    Temporal red/blue flashing-light detector for one camera
+    - works on the ROI's bounding rectangle, point-sampled down to target_width
+      pixels wide (nearest neighbour: no averaging, so a saturated light keeps
+      its colour), counting only pixels inside the ROI
+    - keeps a short history of red/blue coverage and confirms only when one of
+      the colours switches on and off repeatedly at a plausible flash rate;
+      static red signage or a red car never flashes, so it never confirms
+    - each colour is measured against its own minimum over the window, so a
+      constant background of red or blue does not mask the flashing
+    """
+
+    def __init__(self, roi: np.ndarray, target_width: int = 240, window_seconds: float = 2.0,
+                 on_threshold: float = 0.002, min_flash_hz: float = 1.0, max_flash_hz: float = 4.0,
+                 min_flashes: int = 2, hold_seconds: float = 1.0):
+        self.window_seconds = window_seconds
+        self.on_threshold = on_threshold
+        self.min_flash_hz = min_flash_hz
+        self.max_flash_hz = max_flash_hz
+        self.min_flashes = min_flashes
+        self.hold_seconds = hold_seconds
+
+        x, y, w, h = cv2.boundingRect(roi)
+        self.rect = (x, y, w, h)
+        scale = min(1.0, target_width / max(w, 1))
+        self.small_size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        self.mask = np.zeros((self.small_size[1], self.small_size[0]), np.uint8)
+        small_roi = np.round((roi - [x, y]) * scale).astype(np.int32)
+        cv2.fillPoly(self.mask, [small_roi], 255)
+        self.mask_pixels = max(1, cv2.countNonZero(self.mask))
+        # Reused every sample instead of two new images per frame
+        self._small = np.empty((self.small_size[1], self.small_size[0], 3), np.uint8)
+        self._hsv = np.empty_like(self._small)
+
+        self.history = deque()  # (timestamp, red_ratio, blue_ratio)
+        self.confirmed_until = float("-inf")
+        self.flash_hz = 0.0
+
+    def update(self, frame: np.ndarray, timestamp: float) -> bool:
+        """Add one frame (timestamp in seconds) and return whether flashing lights are confirmed"""
+        x, y, w, h = self.rect
+        small = cv2.resize(frame[y:y + h, x:x + w], self.small_size, dst=self._small, interpolation=cv2.INTER_NEAREST)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        red_pixels, blue_pixels = light_ratios(hsv, self.mask)
+
+        self.history.append((timestamp, red_pixels / self.mask_pixels, blue_pixels / self.mask_pixels))
+        while self.history and self.history[0][0] < timestamp - self.window_seconds:
+            self.history.popleft()
+
+        if self._flashing():
+            self.confirmed_until = timestamp + self.hold_seconds
+        return timestamp <= self.confirmed_until
+
+    def _flashing(self) -> bool:
+        span = self.history[-1][0] - self.history[0][0]
+        if len(self.history) < 4 or span < self.window_seconds / 2:
+            return False
+
+        samples = np.array([(red, blue) for _, red, blue in self.history], np.float32)
+        on = samples - samples.min(axis=0) > self.on_threshold
+        rising_edges = np.count_nonzero(on[1:] & ~on[:-1], axis=0)
+
+        self.flash_hz = float(rising_edges.max()) / span
+        return bool(np.any(
+            (rising_edges >= self.min_flashes)
+            & (rising_edges / span >= self.min_flash_hz)
+            & (rising_edges / span <= self.max_flash_hz)
+        ))
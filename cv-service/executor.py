@@ -0,0 +1,90 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Set
+
+import numpy as np
+
+from detections import Detections
+
+# Per-process VideoProcessor used by process-pool workers
+_worker_processor = None
+
+
+def _init_worker(threads_per_worker: int):
+    """Process-pool initializer: load a private model copy in each worker"""
+    global _worker_processor
+    # Split the cores between workers instead of every worker using all of them
+    os.environ["DETECTOR_THREADS"] = str(threads_per_worker)
+
+    from video_processor import VideoProcessor
+    _worker_processor = VideoProcessor()
+    _worker_processor.warmup()
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _analyze_tick_in_worker(frames: Dict[str, np.ndarray], lights: Dict[str, bool] = None,
+                            render: Set[str] = None, detections: Dict[str, Detections] = None) -> Dict[str, tuple]:
+    return _worker_processor.analyze_tick(frames, lights, render, detections)
+
+
+class StageExecutor:
+    """
+    Runs the CPU-heavy stages of the frame pipeline off the asyncio event loop
+    CV_EXECUTOR=thread  - inference/encoding in a thread pool sharing the loaded model
+    CV_EXECUTOR=process - inference/encoding in a process pool, one model per worker
+    CV_WORKERS sets the pool size (default: number of CPU cores)
+    Decoding always runs in the thread pool since captures cannot leave the process
+    """
+
+    def __init__(self, processor, kind: str = None, workers: int = None):
+        self.processor = processor
+        self.kind = (kind or os.getenv("CV_EXECUTOR", "thread")).lower()
+        self.workers = workers or int(os.getenv("CV_WORKERS", os.cpu_count() or 1))
+
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cv-stage")
+        self.process_pool = None
+        if self.kind == "process":
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn, not fork: forking a process with torch's thread pools running can deadlock
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads_per_worker,),
+            )
+        elif self.kind != "thread":
+            raise ValueError(f"Unknown CV_EXECUTOR '{self.kind}' (expected 'thread' or 'process')")
+
+    async def run(self, fn: Callable, *args):
+        """Run a blocking callable in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, fn, *args)
+
+    async def analyze_tick(self, frames: Dict[str, np.ndarray], lights: Dict[str, bool] = None,
+                           render: Set[str] = None, detections: Dict[str, Detections] = None) -> Dict[str, tuple]:
+        """
+        Detect and count all directions of a tick (YOLO only where detections are not given),
+        annotating and encoding those in render, in the configured pool
+        """
+        loop = asyncio.get_running_loop()
+        if self.process_pool is not None:
+            return await loop.run_in_executor(self.process_pool, _analyze_tick_in_worker, frames, lights, render,
+                                              detections)
+        return await loop.run_in_executor(self.thread_pool, self.processor.analyze_tick, frames, lights, render,
+                                          detections)
+
+    def warmup(self):
+        """Start the process-pool workers (each loads and warms its own model) before the first tick"""
+        if self.process_pool is not None:
+            for future in [self.process_pool.submit(_worker_pid) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        self.thread_pool.shutdown(wait=False)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,195 @@
+"""
+Reusable frame buffers with a per-session memory ceiling
+
+At four 1080p feeds a fresh array per decoded frame is ~25 MB of allocations
+per tick, freed again a moment later; the allocator churn shows up as RSS
+spikes and page-fault time. Instead each reader decodes into a small pool of
+pre-allocated buffers (cv2.VideoCapture.read(image=buffer) fills it in place)
+and the frame loop hands every buffer back once the tick is done with it.
+
+A session's pools draw on one MemoryBudget (SESSION_MEMORY_LIMIT_MB), split
+evenly over its directions, and the budget itself refuses any allocation past
+its total. A pool never allocates past its share: when all
+its buffers are in use the reader waits for one to come back (files) or
+reuses the oldest queued frame (live), so the ceiling also bounds how far a
+reader can prefetch. A share too small for even one frame fails the session.
+"""
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import numpy as np
+
+MB = 1024 * 1024
+
+
+def process_peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of the whole process so far (shared by every session), if the OS reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (MB if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KiB elsewhere
+
+
+class MemoryLimitExceeded(MemoryError):
+    """A session's frame buffers would not fit under its memory ceiling"""
+
+
+class MemoryBudget:
+    """
+    Bytes held by a session's frame buffers: current, peak and the hard limit
+    (0 for no limit); optional metrics gauge series follow current and peak
+    """
+
+    def __init__(self, limit_bytes: int = 0, current_gauge=None, peak_gauge=None):
+        self.limit_bytes = limit_bytes
+        self.current_bytes = 0
+        self.peak_bytes = 0
+        self.current_gauge = current_gauge
+        self.peak_gauge = peak_gauge
+        self._lock = threading.Lock()
+
+    def share(self, parts: int) -> int:
+        """Bytes one of `parts` equal shares may hold (0: unlimited)"""
+        return self.limit_bytes // max(parts, 1) if self.limit_bytes else 0
+
+    def add(self, nbytes: int) -> bool:
+        """
+        Count nbytes more (negative: freed). An addition that would take the total
+        past the limit is refused: nothing is counted and False is returned
+        """
+        with self._lock:
+            if nbytes > 0 and self.limit_bytes and self.current_bytes + nbytes > self.limit_bytes:
+                return False
+            self.current_bytes += nbytes
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+            current, peak = self.current_bytes, self.peak_bytes
+        if self.current_gauge is not None:
+            self.current_gauge.set(current)
+        if self.peak_gauge is not None:
+            self.peak_gauge.set(peak)
+        return True
+
+    def report(self) -> dict:
+        """Current, peak and limit in MB, for session stats"""
+        return {
+            "frame_buffers_mb": round(self.current_bytes / MB, 1),
+            "frame_buffers_peak_mb": round(self.peak_bytes / MB, 1),
+            "limit_mb": round(self.limit_bytes / MB, 1) if self.limit_bytes else None,
+        }
+
+
+class FramePool:
+    """
+    Frame buffers of one reader, all of the current frame shape
+    At most `capacity` buffers (and never more bytes than max_bytes) exist at
+    once; acquire() hands out a free one, allocating only below that bound.
+    A new frame shape (a stream changing resolution) retires the old buffers.
+    """
+
+    def __init__(self, capacity: int, budget: MemoryBudget = None, max_bytes: int = 0):
+        self.requested_capacity = capacity
+        self.capacity = capacity
+        self.budget = budget or MemoryBudget()
+        self.max_bytes = max_bytes
+        self.shape: Optional[Tuple[int, ...]] = None
+        self._free: List[np.ndarray] = []
+        self._issued: Dict[int, np.ndarray] = {}  # handed out and not yet released, by id
+        self._owned = 0  # buffers of the current shape, free or handed out
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def capacity_for(self, shape: Tuple[int, ...]) -> int:
+        """Buffers of this shape that fit the pool's byte share (at most the requested capacity)"""
+        if not self.max_bytes:
+            return self.requested_capacity
+        return min(self.requested_capacity, self.max_bytes // int(np.prod(shape)))
+
+    def prepare(self, shape: Tuple[int, ...]):
+        """Size the pool for a frame shape up front (raises MemoryLimitExceeded)"""
+        with self._cond:
+            if tuple(shape) != self.shape:
+                self._reshape(tuple(shape))
+
+    def acquire(self, shape: Tuple[int, ...], timeout: float = None) -> Optional[np.ndarray]:
+        """
+        A uint8 buffer of shape for the next decode; waits up to timeout for one to
+        be released when all are in use. None on timeout or once closed
+        Raises MemoryLimitExceeded if not even one frame of this shape fits
+        """
+        shape = tuple(shape)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            if shape != self.shape:
+                self._reshape(shape)
+            while True:
+                wait = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+                if not self._cond.wait_for(lambda: self._free or self._owned < self.capacity or self._closed, wait):
+                    return None
+                if self._closed:
+                    return None
+                if self._free:
+                    buffer = self._free.pop()
+                    break
+                nbytes = int(np.prod(shape))
+                if self.budget.add(nbytes):
+                    buffer = np.empty(shape, np.uint8)
+                    self._owned += 1
+                    break
+                # The session's budget is spent (buffers of another shape not yet released):
+                # make do with the buffers this pool already has
+                if not self._issued:
+                    raise MemoryLimitExceeded(
+                        f"A {shape[1]}x{shape[0]} frame needs {nbytes / MB:.1f} MB, over what is left of "
+                        f"SESSION_MEMORY_LIMIT_MB ({self.budget.limit_bytes / MB:.1f} MB)"
+                    )
+                self.capacity = self._owned
+            self._issued[id(buffer)] = buffer
+            return buffer
+
+    def release(self, frame: Optional[np.ndarray]):
+        """Give a buffer back once nothing reads it any more (arrays the pool did not issue are ignored)"""
+        if frame is None:
+            return
+        with self._cond:
+            if self._issued.get(id(frame)) is not frame:
+                return
+            del self._issued[id(frame)]
+            if frame.shape != self.shape:
+                # Retired by a resolution change: let it be freed
+                self.budget.add(-frame.nbytes)
+                self.capacity = self.capacity_for(self.shape)  # Its bytes may be used again
+                self._cond.notify()
+                return
+            self._free.append(frame)
+            self._cond.notify()
+
+    def close(self):
+        """Drop every buffer, free or handed out (the reader is done), and wake a waiting acquire()"""
+        with self._cond:
+            self._closed = True
+            freed = sum(buffer.nbytes for buffer in self._free + list(self._issued.values()))
+            self._free.clear()
+            self._issued.clear()
+            self._cond.notify_all()
+        self.budget.add(-freed)
+
+    def _reshape(self, shape: Tuple[int, ...]):
+        capacity = self.capacity_for(shape)
+        if capacity < 1:
+            raise MemoryLimitExceeded(
+                f"A {shape[1]}x{shape[0]} frame needs {int(np.prod(shape)) / MB:.1f} MB, over this direction's "
+                f"{self.max_bytes / MB:.1f} MB share of SESSION_MEMORY_LIMIT_MB"
+            )
+        freed = sum(buffer.nbytes for buffer in self._free)
+        self._free.clear()
+        self.budget.add(-freed)
+        self.shape = shape
+        self.capacity = capacity
+        self._owned = 0  # handed-out buffers of the old shape are freed on release
@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+import log_config
+from frame_pool import FramePool
+
+logger = log_config.get_logger("frame_reader")
+
+
+class FrameItem(NamedTuple):
+    """One frame slot from a reader"""
+    index: int  # frame number since the reader started
+    frame: Optional[np.ndarray]  # None where the decode policy skipped decoding
+    timestamp: float  # media time in seconds (file position, or capture time for live sources)
+    captured_at: float  # time.monotonic() when the frame came out of the decoder
+    position: int = -1  # frame number within the file (restarts when a file loops)
+
+
+class FrameReader:
+    """
+    Prefetching decoder for one direction
+    A background thread walks the capture and pushes FrameItems into a bounded
+    ring buffer. Only frames the decode policy asks for are fully decoded; the
+    others are advanced with grab() and pushed with frame=None, so every frame
+    index still arrives in order.
+    Decoding runs in parallel with inference instead of in series with it.
+
+    Files: the thread waits for buffer space (no frame is lost) and loops the
+    video; with pace=True it releases frames at the source frame rate, like a camera.
+    Live sources (live=True: RTSP, HTTP-MJPEG, a pipe): the thread never waits;
+    when the consumer falls behind the oldest buffered frame is dropped, so the
+    pipeline never builds latency. A lost stream is reopened from `source`.
+
+    Frames are decoded into buffers from `pool` (a FramePool, unbounded if not
+    given); the consumer hands each one back with release() once done with it.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, direction: str, decode_policy: Callable[[int], bool],
+                 buffer_size: int = 8, loop_video: bool = True, live: bool = False, pace: bool = False,
+                 source: str = None, reconnect_attempts: int = 5, decode_metric=None, pool: FramePool = None):
+        self.cap = cap
+        self.direction = direction
+        self.decode_policy = decode_policy
+        self.buffer_size = buffer_size
+        self.loop_video = loop_video and not live
+        self.live = live
+        self.pace = pace and not live
+        self.source = source
+        self.reconnect_attempts = reconnect_attempts
+        self.decode_metric = decode_metric  # metrics histogram series, observes seconds per read
+        self.pool = pool or FramePool(buffer_size + 2)
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.source_fps = fps if fps and 0 < fps < 240 else 30.0
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Until the first decode, from the container; None if the source does not say (some streams)
+        self.frame_shape = (height, width, 3) if width > 0 and height > 0 else None
+
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._ended = False
+        self._stopped = False
+        self.error: Optional[Exception] = None  # What stopped the decoder thread, if it failed
+        self._thread = threading.Thread(target=self._run, name=f"reader-{direction}", daemon=True)
+
+    def start(self) -> "FrameReader":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the decoder thread and release the capture"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.pool.close()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=2)
+        self.cap.release()
+        with self._cond:
+            for item in self._buffer:
+                self.pool.release(item.frame)
+            self._buffer.clear()
+
+    @property
+    def ended(self) -> bool:
+        """True once the source has ended and every buffered frame was taken"""
+        with self._cond:
+            return self._ended and not self._buffer
+
+    def get(self, timeout: float = None) -> Optional[FrameItem]:
+        """
+        Next FrameItem; its frame is None for skipped frames
+        Returns None once the video has ended (or on timeout)
+        Raises the decoder thread's error (e.g. MemoryLimitExceeded) once the frames
+        it queued before failing have been taken
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._buffer or self._ended, timeout):
+                return None
+            if not self._buffer:
+                if self.error is not None:
+                    raise self.error
+                return None
+            item = self._buffer.popleft()
+            self._cond.notify_all()
+            return item
+
+    def release(self, item: FrameItem):
+        """Return an item's frame buffer for reuse; the frame must not be read afterwards"""
+        self.pool.release(item.frame)
+
+    def _acquire(self) -> Optional[np.ndarray]:
+        """
+        A pool buffer to decode into (None once stopped, or while the frame shape is unknown)
+        Files wait for the consumer to release one. Live sources never wait on a
+        queued frame: the oldest one is dropped and its buffer reused
+        """
+        while self.frame_shape is not None and not self._stopped:
+            buffer = self.pool.acquire(self.frame_shape, timeout=0 if self.live else 0.1)
+            if buffer is None and self.live:
+                with self._cond:
+                    while buffer is None and self._buffer:
+                        dropped = self._buffer.popleft()
+                        self.frames_dropped += 1
+                        buffer = dropped.frame
+                if buffer is None:
+                    # Every buffer is with the consumer
+                    buffer = self.pool.acquire(self.frame_shape, timeout=0.1)
+            if buffer is not None:
+                return buffer
+        return None
+
+    def _read(self, decode: bool, buffer: np.ndarray = None):
+        started = time.perf_counter()
+        if not decode:
+            result = self.cap.grab(), None
+        elif buffer is not None:
+            result = self.cap.read(buffer)  # Decodes in place unless the frame size changed
+        else:
+            result = self.cap.read()
+        if self.decode_metric is not None:
+            self.decode_metric.observe(time.perf_counter() - started)
+        return result
+
+    def _reconnect(self) -> bool:
+        """Reopen a live source after it dropped, with backoff"""
+        for attempt in range(self.reconnect_attempts):
+            with self._cond:
+                if self._cond.wait_for(lambda: self._stopped, timeout=min(2 ** attempt, 10)):
+                    return False
+            logger.warning("🔌 Reconnecting %s stream (attempt %d/%d)", self.direction, attempt + 1,
+                           self.reconnect_attempts)
+            self.cap.release()
+            self.cap = cv2.VideoCapture(self.source)
+            if self.cap.isOpened():
+                return True
+        return False
+
+    def _run(self):
+        frame_index = 0
+        position = 0
+        started = time.monotonic()
+        try:
+            while True:
+                with self._cond:
+                    if not self.live:
+                        self._cond.wait_for(lambda: len(self._buffer) < self.buffer_size or self._stopped)
+                    if self._stopped:
+                        return
+
+                if self.pace:
+                    # Release frames no faster than the source plays them
+                    delay = started + frame_index / self.source_fps - time.monotonic()
+                    if delay > 0:
+                        with self._cond:
+                            if self._cond.wait_for(lambda: self._stopped, timeout=delay):
+                                return
+
+                decode = self.decode_policy(frame_index)
+                buffer = self._acquire() if decode else None
+                if self._stopped:
+                    self.pool.release(buffer)
+                    return
+                ret, frame = self._read(decode, buffer)
+                if not ret and self.loop_video:
+                    # Video ended, restart from beginning
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    position = 0
+                    ret, frame = self._read(decode, buffer)
+                if not ret and self.live and self.source and self._reconnect():
+                    ret, frame = self._read(decode, buffer)
+                if not ret:
+                    self.pool.release(buffer)
+                    logger.error("❌ Failed to read %s video even after restart", self.direction)
+                    return
+                if decode and frame is not buffer:
+                    # New frame size (or the first frame of a source that did not say): that
+                    # frame stays unpooled, the pool switches to the new size from the next decode
+                    self.pool.release(buffer)
+                    self.frame_shape = frame.shape
+
+                captured_at = time.monotonic()
+                timestamp = captured_at - started if self.live else frame_index / self.source_fps
+                if decode:
+                    self.frames_decoded += 1
+                else:
+                    self.frames_skipped += 1
+
+                with self._cond:
+                    if self.live and len(self._buffer) >= self.buffer_size:
+                        # Consumer is behind: drop the oldest frame rather than queue latency
+                        self.pool.release(self._buffer.popleft().frame)
+                        self.frames_dropped += 1
+                    self._buffer.append(FrameItem(frame_index, frame, timestamp, captured_at, position))
+                    self._cond.notify_all()
+                frame_index += 1
+                position += 1
+        except Exception as e:
+            self.error = e
+            logger.error("❌ %s reader failed: %s", self.direction, e)
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
@@ -0,0 +1,44 @@
+"""
+Binary framing for backend updates (TRANSPORT_MODE=binary)
+
+Layout of a framed update body (Content-Type: application/octet-stream):
+    [4 bytes] big-endian length N of the header
+    [N bytes] UTF-8 JSON header: the usual update fields (session_id, counts,
+              signal_state, vehicle_breakdown, ...) plus
+              "frames": [{"direction": str, "seq": int, "length": int}, ...]
+    [...]     raw JPEG bytes of each listed frame, in header order
+
+Only frames whose sequence number changed since the last delivered update are
+listed; the backend keeps showing its cached copy of the others.
+"""
+import json
+import struct
+from typing import Dict, List, Tuple
+
+HEADER_LENGTH = struct.Struct(">I")
+
+
+def encode_frame_update(header: Dict, frames: List[Tuple[str, int, bytes]]) -> bytes:
+    """Pack an update header and (direction, seq, jpeg_bytes) frames into one body"""
+    header = dict(header)
+    header["frames"] = [
+        {"direction": direction, "seq": seq, "length": len(jpeg)} for direction, seq, jpeg in frames
+    ]
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return b"".join([HEADER_LENGTH.pack(len(header_bytes)), header_bytes] + [jpeg for _, _, jpeg in frames])
+
+
+def decode_frame_update(body: bytes) -> Tuple[Dict, Dict[str, Tuple[int, bytes]]]:
+    """Inverse of encode_frame_update: returns (header, {direction: (seq, jpeg_bytes)})"""
+    (header_length,) = HEADER_LENGTH.unpack_from(body, 0)
+    offset = HEADER_LENGTH.size
+    header = json.loads(body[offset:offset + header_length].decode("utf-8"))
+    offset += header_length
+
+    frames = {}
+    for entry in header.pop("frames"):
+        frames[entry["direction"]] = (entry["seq"], body[offset:offset + entry["length"]])
+        offset += entry["length"]
+    if offset != len(body):
+        raise ValueError(f"Framed update length mismatch: parsed {offset} of {len(body)} bytes")
+    return header, frames
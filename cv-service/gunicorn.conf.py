@@ -0,0 +1,27 @@
+"""
+Pre-forked CV service: the master loads the model once and the workers share it copy-on-write
+    gunicorn -c gunicorn.conf.py main:app
+WEB_CONCURRENCY sets the number of worker processes (default 2)
+"""
+import gc
+import os
+
+# Load the weights in the master (main.py checks PRELOAD_MODEL at import)
+os.environ.setdefault("PRELOAD_MODEL", "true")
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8001)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Warmup runs in the background after the fork; /ready tells the load balancer when a worker is warm
+timeout = 120
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach, so collections in the
+    # workers never touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
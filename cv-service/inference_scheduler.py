@@ -0,0 +1,143 @@
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+from signal_logic import SignalLogic
+
+
+class InferenceScheduler:
+    """
+    Shares a total inference budget (inferred frames per second of video,
+    summed over all directions) between directions by priority:
+    - a direction with a suspected ambulance gets the most (fast emergency response)
+    - the current green approach (early-close rule needs fresh counts)
+      and the approach about to turn green
+    - the next approach in the rotation sequence
+    - idle approaches keep a minimum rate so an arriving ambulance is still seen;
+      the floor is taken out of the budget, never added on top of it
+    Readers ask claim() whether to decode a frame, so skipped frames are only grab()bed.
+    With light_sample_fps set, extra frames are decoded at that rate for the
+    (much cheaper) flashing-light check; is_inference_frame() tells them apart
+    """
+
+    AMBULANCE_WEIGHT = 4.0
+    GREEN_WEIGHT = 2.0
+    NEXT_WEIGHT = 1.5
+    IDLE_WEIGHT = 1.0
+
+    def __init__(self, budget_fps: float, min_fps: float = 2.0, default_source_fps: float = 30.0,
+                 light_sample_fps: float = 0.0):
+        self.budget_fps = budget_fps
+        self.min_fps = min_fps
+        self.default_source_fps = default_source_fps
+        self.light_sample_fps = light_sample_fps
+
+        self.source_fps: Dict[str, float] = {}
+        self.weights: Dict[str, float] = {}
+        self.strides: Dict[str, int] = {}
+        self._next_due: Dict[str, int] = {}
+        self._last_claimed: Dict[str, int] = {}
+        self._light_strides: Dict[str, int] = {}
+        self._light_due: Dict[str, int] = {}
+        self._inference_frames: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def add_direction(self, direction: str, source_fps: float = None):
+        """Register a direction; it is decoded from its first frame on"""
+        with self._lock:
+            self.source_fps[direction] = source_fps if source_fps and source_fps > 0 else self.default_source_fps
+            self.weights[direction] = self.IDLE_WEIGHT
+            self._next_due[direction] = 0
+            self._last_claimed[direction] = -1
+            self._light_due[direction] = 0
+            self._inference_frames[direction] = deque()
+            if self.light_sample_fps > 0:
+                self._light_strides[direction] = max(1, round(self.source_fps[direction] / self.light_sample_fps))
+            self._rebalance()
+
+    def policy(self, direction: str) -> Callable[[int], bool]:
+        """Decode policy for a FrameReader"""
+        return lambda frame_index: self.claim(direction, frame_index)
+
+    def claim(self, direction: str, frame_index: int) -> bool:
+        """True if this frame should be decoded, for inference or a light sample (called from reader threads)"""
+        with self._lock:
+            infer = frame_index >= self._next_due[direction]
+            light_stride = self._light_strides.get(direction)
+            sample = light_stride is not None and frame_index >= self._light_due[direction]
+            if not (infer or sample):
+                return False
+            if infer:
+                self._last_claimed[direction] = frame_index
+                self._next_due[direction] = frame_index + self.strides[direction]
+                self._inference_frames[direction].append(frame_index)
+            if light_stride is not None:
+                self._light_due[direction] = frame_index + light_stride
+            return True
+
+    def is_inference_frame(self, direction: str, frame_index: int) -> bool:
+        """True if a decoded frame was claimed for inference, False if only for a light sample"""
+        with self._lock:
+            claimed = self._inference_frames[direction]
+            while claimed and claimed[0] < frame_index:
+                claimed.popleft()
+            if claimed and claimed[0] == frame_index:
+                claimed.popleft()
+                return True
+            return False
+
+    def update(self, signal_logic: SignalLogic, ambulance_directions: Iterable[str] = ()):
+        """Re-prioritise directions from the current signal state and detections"""
+        ambulance_directions = set(ambulance_directions)
+        green = signal_logic.current_green_direction
+        upcoming = signal_logic.next_green_direction if signal_logic.in_yellow_phase else None
+        next_in_rotation = signal_logic.rotation_sequence[signal_logic.rotation_index]
+
+        weights = {}
+        for direction in self.source_fps:
+            if direction in ambulance_directions:
+                weights[direction] = self.AMBULANCE_WEIGHT
+            elif direction in (green, upcoming):
+                weights[direction] = self.GREEN_WEIGHT
+            elif direction == next_in_rotation:
+                weights[direction] = self.NEXT_WEIGHT
+            else:
+                weights[direction] = self.IDLE_WEIGHT
+
+        if weights != self.weights:
+            with self._lock:
+                self.weights = weights
+                self._rebalance()
+
+    def allocation(self) -> Dict[str, float]:
+        """Inferred frames per second of video currently given to each direction"""
+        return {direction: self.source_fps[direction] / stride for direction, stride in self.strides.items()}
+
+    def _shares(self) -> Dict[str, float]:
+        """
+        Budget split by weight, with directions below the floor raised to it and the
+        rest re-split among the others, so the rates always sum to the budget.
+        The floor itself shrinks to an even split when the budget cannot give every
+        direction min_fps
+        """
+        floor = min(self.min_fps, self.budget_fps / max(len(self.weights), 1))
+        shares: Dict[str, float] = {}
+        remaining = dict(self.weights)
+        while remaining:
+            budget = self.budget_fps - floor * len(shares)
+            total_weight = sum(remaining.values())
+            below = [direction for direction, weight in remaining.items() if budget * weight / total_weight < floor]
+            if not below:
+                shares.update({direction: budget * weight / total_weight for direction, weight in remaining.items()})
+                break
+            for direction in below:
+                shares[direction] = floor
+                del remaining[direction]
+        return shares
+
+    def _rebalance(self):
+        for direction, fps in self._shares().items():
+            stride = max(1, round(self.source_fps[direction] / fps))
+            self.strides[direction] = stride
+            # A direction that just became urgent should not wait out its old, longer stride
+            self._next_due[direction] = min(self._next_due[direction], self._last_claimed[direction] + stride)
@@ -0,0 +1,215 @@
+"""
+Append-only journal of signal decisions, for audits
+
+SignalLogic reports each decision (mode change, yellow/green transition, early
+close, ambulance override and clearance) as an event; DecisionJournal.record
+stamps it and hands it to a background thread, which appends one compact JSON
+line per event to JOURNAL_PATH. The frame loop never waits on the disk: when
+the writer falls behind, events are counted in `dropped` instead.
+
+Each line: {"seq": 17, "ts": <unix time>, "session": "...", "event": "green",
+"clock": <signal clock seconds>, ...event fields}. seq counts each session's
+events from 0, so a gap shows dropped events.
+
+Audit a journal (from cv-service/):
+    python journal.py journal/decisions.jsonl                 # timeline
+    python journal.py journal/decisions.jsonl --session abc --summary
+"""
+import argparse
+import atexit
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional
+
+EVENTS = ("mode_change", "yellow", "green", "early_close", "ambulance_override", "ambulance_clearing",
+          "ambulance_cleared")
+
+
+class DecisionJournal:
+    """Background JSON-lines writer; record() only stamps the event and enqueues it"""
+
+    def __init__(self, path: str, max_pending: int = 10000, flush_seconds: float = 1.0):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, name="decision-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, session_id: str, event: Dict, seq: int = None):
+        try:
+            self._queue.put_nowait({"seq": seq, "ts": time.time(), "session": session_id, **event})
+        except queue.Full:
+            self.dropped += 1
+
+    def for_session(self, session_id: str) -> Callable[[Dict], None]:
+        """The event sink for one session's SignalLogic (numbers its events)"""
+        seq = itertools.count()
+        return lambda event: self.record(session_id, event, next(seq))
+
+    def close(self, timeout: float = 5.0):
+        """Write what is queued and stop the writer"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                event = self._queue.get()
+                # Write everything already queued in one go, flushing at most every flush_seconds
+                batch = [event]
+                while event is not None:
+                    try:
+                        event = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(event)
+                lines = []
+                for event in batch:
+                    if event is None:
+                        break
+                    lines.append(json.dumps(event, separators=(",", ":"), default=str))
+                    self.written += 1
+                f.write("".join(line + "\n" for line in lines))
+                if batch[-1] is None:
+                    return
+                f.flush()
+                time.sleep(self.flush_seconds)
+
+
+_journal: Optional[DecisionJournal] = None
+_lock = threading.Lock()
+
+
+def _forget_in_child():
+    # A forked worker does not inherit the writer thread; it starts its own on first use
+    global _journal, _lock
+    _journal = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_in_child)
+
+
+def get_journal() -> Optional[DecisionJournal]:
+    """This process's journal at JOURNAL_PATH (journal/decisions.jsonl), or None if set empty"""
+    global _journal
+    with _lock:
+        if _journal is None:
+            path = os.getenv("JOURNAL_PATH", os.path.join("journal", "decisions.jsonl"))
+            if not path:
+                return None
+            _journal = DecisionJournal(path)
+            atexit.register(_journal.close)
+        return _journal
+
+
+def close_journal():
+    """Flush and stop this process's journal, if one was started"""
+    with _lock:
+        if _journal is not None:
+            _journal.close()
+
+
+def journal_sink(session_id: str) -> Optional[Callable[[Dict], None]]:
+    """SignalLogic's journal argument for a session (None when journaling is off)"""
+    journal = get_journal()
+    return journal.for_session(session_id) if journal is not None else None
+
+
+def read_journal(path: str, session_id: str = None) -> Iterator[Dict]:
+    """Events in file order; a line cut short by a crash is skipped"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if session_id is None or event.get("session") == session_id:
+                yield event
+
+
+def summarize(events: List[Dict]) -> Dict[str, Dict]:
+    """
+    Per session: event counts, green time per direction, ambulance overrides
+    with how long each held the signal, and gaps in seq (dropped events)
+    Durations use the signal clock, so they hold for replayed traces too.
+    """
+    sessions: Dict[str, Dict] = {}
+    open_green: Dict[str, tuple] = {}
+    open_override: Dict[str, Dict] = {}
+    last_seq: Dict[str, int] = {}
+    for event in events:
+        session = sessions.setdefault(event.get("session"), {
+            "events": defaultdict(int), "green_seconds": defaultdict(float), "ambulance_overrides": [],
+            "first_ts": event.get("ts"), "last_ts": event.get("ts"),
+        })
+        name = event.get("event")
+        session["events"][name] += 1
+        session["last_ts"] = event.get("ts")
+        key, clock, seq = event.get("session"), event.get("clock", 0.0), event.get("seq")
+        if key in last_seq and seq is not None and seq > last_seq[key] + 1:
+            session["events"]["missing"] += seq - last_seq[key] - 1
+        if seq is not None:
+            last_seq[key] = seq
+
+        # A green (normal or ambulance) lasts until the next yellow or override
+        if name in ("yellow", "ambulance_override") and key in open_green:
+            direction, since = open_green.pop(key)
+            session["green_seconds"][direction] += clock - since
+        if name == "green":
+            open_green[key] = (event["direction"], clock)
+        elif name == "ambulance_override":
+            open_green[key] = (event["direction"], clock)
+            open_override[key] = {"direction": event["direction"], "ts": event.get("ts"), "clock": clock}
+        elif name == "ambulance_cleared" and key in open_override:
+            override = open_override.pop(key)
+            override["held_seconds"] = round(clock - override.pop("clock"), 3)
+            session["ambulance_overrides"].append(override)
+    for key, override in open_override.items():
+        override.pop("clock")
+        override["held_seconds"] = None  # still active when the journal ends
+        sessions[key]["ambulance_overrides"].append(override)
+    for session in sessions.values():
+        session["events"] = dict(session["events"])
+        session["green_seconds"] = {d: round(s, 3) for d, s in session["green_seconds"].items()}
+    return sessions
+
+
+def describe(event: Dict) -> str:
+    """One timeline line"""
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.get("ts", 0)))
+    fields = " ".join(f"{k}={v}" for k, v in event.items() if k not in ("seq", "ts", "session", "event"))
+    return f"{stamp} [{event.get('session')}] {event.get('event'):<18} {fields}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit a signal decision journal")
+    parser.add_argument("path", help="journal file (JOURNAL_PATH)")
+    parser.add_argument("--session", help="only this session")
+    parser.add_argument("--event", action="append", choices=EVENTS, help="only these events (repeatable)")
+    parser.add_argument("--summary", action="store_true", help="per-session totals instead of the timeline")
+    args = parser.parse_args()
+
+    events = [event for event in read_journal(args.path, args.session)
+              if not args.event or event.get("event") in args.event]
+    if args.summary:
+        print(json.dumps(summarize(events), indent=2))
+    else:
+        for event in events:
+            print(describe(event))
+
+
+if __name__ == "__main__":
+    main()
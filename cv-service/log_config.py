@@ -0,0 +1,127 @@
+"""
+Leveled, rate-limited logging for the frame loop
+
+Modules log through get_logger(__name__) with %-style arguments instead of
+print(): records below LOG_LEVEL are dropped before any formatting, repeats
+of the same message template within LOG_RATE_LIMIT_SECONDS are counted
+instead of emitted, and the console write happens on a listener thread, so
+the loop only pays for a dict lookup and a queue put.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Tuple
+
+ROOT = "cv"
+
+_lock = threading.Lock()
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes one record per message every `interval` seconds; the next one that
+    passes carries the number suppressed in between. Messages are told apart
+    by logger, template and string arguments (direction, session), so numeric
+    arguments such as a confidence do not defeat the limit.
+    Errors are never suppressed.
+    """
+
+    MAX_KEYS = 1024  # templates are normally fixed strings; bound the table anyway
+
+    def __init__(self, interval: float, clock=time.monotonic):
+        super().__init__()
+        self.interval = interval
+        self.clock = clock
+        self._seen: Dict[Tuple, list] = {}  # key -> [last emitted, suppressed since]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0 or record.levelno >= logging.ERROR:
+            return True
+        args = record.args if isinstance(record.args, tuple) else ()
+        key = (record.name, str(record.msg), tuple(arg for arg in args if isinstance(arg, str)))
+        now = self.clock()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            if entry is None and len(self._seen) >= self.MAX_KEYS:
+                self._seen.clear()
+            record.suppressed = entry[1] if entry else 0
+            self._seen[key] = [now, 0]
+        return True
+
+
+class _Formatter(logging.Formatter):
+    """The message as printed before (emoji first), plus the suppressed count"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" (+{suppressed} similar suppressed)"
+        return message
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the console falls behind, records are dropped"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure():
+    """Set up the "cv" loggers once per process (idempotent)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        level = os.getenv("LOG_LEVEL", "INFO").upper()
+        interval = float(os.getenv("LOG_RATE_LIMIT_SECONDS", 5))
+
+        console = logging.StreamHandler(sys.stdout)
+        handler = _DroppingQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", 10000))))
+        handler.setFormatter(_Formatter("%(message)s"))
+        handler.addFilter(RateLimitFilter(interval))
+
+        logger = logging.getLogger(ROOT)
+        logger.setLevel(level)
+        logger.addHandler(handler)
+        logger.propagate = False  # uvicorn/gunicorn configure the root logger themselves
+
+        _listener = logging.handlers.QueueListener(handler.queue, console)
+        _listener.start()
+        atexit.register(_stop)
+        if hasattr(os, "register_at_fork"):
+            # Pre-forked workers (PRELOAD_MODEL) inherit the handler but not the listener thread
+            os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def _stop():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_in_child():
+    global _listener
+    handler = next(h for h in logging.getLogger(ROOT).handlers if isinstance(h, _DroppingQueueHandler))
+    handler.queue = queue.Queue(handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(handler.queue, *_listener.handlers)
+    _listener.start()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """A logger under "cv" (e.g. cv.video_processor)"""
+    return logging.getLogger(f"{ROOT}.{name}")
@@ -1,15 +1,23 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
+import gc
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
-import shutil
-from typing import Dict
+from typing import Dict, Optional
 import asyncio
-from video_processor import VideoProcessor
+from upload_ingest import StreamingUpload
+from session_manager import SessionManager, SessionRejected
+import journal
+import log_config
+import metrics
 
 load_dotenv()
+log_config.configure()
+logger = log_config.get_logger("main")
 
 app = FastAPI(title="ClearPath AI Signals - CV Service")
 
@@ -22,15 +30,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global video processor
+# Global video processor (model, executor, backend client) shared by all sessions
 video_processor = None
+# Per-session signal/tracking state and admission control, created once the model is warm
+session_manager: Optional[SessionManager] = None
+# Model lifecycle reported by /ready: loading -> warming -> ready (or failed)
+model_status = {"state": "loading", "error": None, "ready_seconds": None}
+model_loading: Optional[asyncio.Task] = None
+
+
+def load_processor():
+    """Build the VideoProcessor: heavy imports (cv2, detector runtime) and weights"""
+    from video_processor import VideoProcessor
+    return VideoProcessor()
+
+
+if os.getenv("PRELOAD_MODEL", "false").lower() == "true":
+    # Pre-forked servers (gunicorn preload_app, see gunicorn.conf.py): load the weights once
+    # in the master so every worker shares them copy-on-write. No inference runs here;
+    # each worker warms up after the fork. GC stays off until the objects are frozen,
+    # so collections do not write to (and un-share) their pages
+    gc.disable()
+    video_processor = load_processor()
+
+
+async def prepare_model():
+    """Load (unless preloaded) and warm up the model off the event loop"""
+    global video_processor, session_manager
+    started = time.perf_counter()
+    try:
+        if video_processor is None:
+            video_processor = await asyncio.to_thread(load_processor)
+        model_status["state"] = "warming"
+        await asyncio.to_thread(video_processor.warmup)
+        await asyncio.to_thread(video_processor.executor.warmup)
+        session_manager = SessionManager(video_processor)
+        logger.info("🎛️ Admitting %d concurrent session(s) (measured %s inferred frames/s)",
+                    session_manager.max_concurrent,
+                    f"{video_processor.measured_fps:.1f}" if video_processor.measured_fps else "no")
+        model_status["ready_seconds"] = round(time.perf_counter() - started, 2)
+        model_status["state"] = "ready"
+        logger.info("✅ Model warmed up, ready in %ss", model_status["ready_seconds"])
+    except Exception as e:
+        model_status["state"] = "failed"
+        model_status["error"] = str(e)
+        logger.error("❌ Model failed to load: %s", e)
 
 @app.on_event("startup")
 async def startup_event():
-    global video_processor
-    video_processor = VideoProcessor()
-    print("🚀 CV Service started")
-    print("📦 Loading YOLOv8 model...")
+    global model_loading
+    # Serve /health right away; /ready turns true once the model is warm
+    model_loading = asyncio.create_task(prepare_model())
+    logger.info("🚀 CV Service started")
+    logger.info("📦 Loading YOLOv8 model in the background...")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if session_manager is not None:
+        await session_manager.shutdown()
+    if video_processor is not None:
+        await video_processor.backend.close()
+        video_processor.shutdown()
+    journal.close_journal()
 
 @app.get("/")
 def read_root():
@@ -42,58 +103,143 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "model_loaded": video_processor is not None}
+    """Liveness: the process is up and serving, whether or not the model is ready"""
+    return {
+        "status": "healthy",
+        "model_loaded": video_processor is not None,
+        "model_state": model_status["state"],
+        "sessions": session_manager.summary() if session_manager else None,
+        "backend_client": video_processor.backend.metrics() if video_processor else None,
+    }
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 only once the model is loaded and warmed up, 503 before that"""
+    ready = model_status["state"] == "ready"
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, **model_status})
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Per-stage latency histograms and frame/update/ambulance counters, by session and direction"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.post("/api/process-videos")
-async def process_videos(
-    north: UploadFile = File(...),
-    south: UploadFile = File(...),
-    east: UploadFile = File(...),
-    west: UploadFile = File(...),
-    session_id: str = Form(...)
-):
+async def process_videos(request: Request):
     """
-    Receive 4 videos and process them with YOLO detection
+    Receive 4 videos (multipart fields north/south/east/west + session_id)
+    and process them with YOLO detection.
+    The body is streamed to disk; processing starts as soon as the session_id
+    and the first complete video are in, without waiting for the other uploads
     """
+    if model_status["state"] != "ready" and model_loading is not None:
+        # Requests that beat the readiness probe wait for the warmup instead of failing
+        await asyncio.shield(model_loading)
+    if model_status["state"] != "ready":
+        return {
+            "success": False,
+            "error": f"Model not available: {model_status['error']}"
+        }
+    
+    # Turn away uploads we could neither run nor queue before reading their body
+    if not session_manager.has_capacity():
+        return JSONResponse(status_code=429, content={
+            "success": False,
+            "error": "CV service is at capacity, try again later",
+            **session_manager.summary()
+        })
+    
+    upload = StreamingUpload(Path("uploads"), session_id=request.query_params.get("session_id"))
+    receiving = asyncio.create_task(upload.receive(request))
+    session = None
     try:
-        print(f"📹 Processing videos for session: {session_id}")
-        
-        # Create uploads directory
-        upload_dir = Path("uploads") / session_id
-        upload_dir.mkdir(parents=True, exist_ok=True)
+        # Start processing as soon as we know which session this is
+        session_known = asyncio.create_task(upload.session_known.wait())
+        await asyncio.wait({receiving, session_known}, return_when=asyncio.FIRST_COMPLETED)
+        session_known.cancel()
+        if upload.session_id:
+            session = session_manager.submit(upload.session_id, upload.video_paths, upload.ready)
+            logger.info("📹 Processing videos for session: %s (%s)", upload.session_id, session.state)
         
-        # Save uploaded videos
-        video_paths = {}
-        for direction, file in [
-            ("north", north),
-            ("south", south),
-            ("east", east),
-            ("west", west)
-        ]:
-            file_path = upload_dir / f"{direction}.mp4"
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            video_paths[direction] = str(file_path)
-            print(f"✅ Saved {direction} video: {file_path}")
-        
-        # Start processing in background
-        asyncio.create_task(
-            video_processor.process_videos(session_id, video_paths)
-        )
+        await receiving
         
         return {
             "success": True,
-            "message": "Videos received and processing started",
-            "session_id": session_id
+            "message": "Videos received and processing started" if session and session.state != "queued"
+                       else "Videos received, session queued",
+            "session_id": upload.session_id,
+            "state": session.state if session else None
         }
-        
+    
+    except SessionRejected as e:
+        receiving.cancel()
+        logger.warning("⛔ Session %s rejected: %s", upload.session_id, e)
+        return JSONResponse(status_code=e.status_code, content={"success": False, "error": str(e)})
     except Exception as e:
-        print(f"❌ Error processing videos: {str(e)}")
+        logger.error("❌ Error processing videos: %s", e)
+        if session is not None:
+            session_manager.cancel(session.session_id)
         return {
             "success": False,
             "error": str(e)
         }
 
+@app.post("/api/process-streams")
+async def process_streams(request: Request):
+    """
+    Process live camera feeds instead of uploaded files
+    JSON body: {"session_id": "...", "sources": {"north": "rtsp://...", "south": "http://host/mjpeg", ...}}
+    Sources may be RTSP or HTTP-MJPEG URLs, or a local pipe (FIFO path); frames are
+    processed at the camera's pace and dropped oldest-first when inference falls behind
+    """
+    if model_status["state"] != "ready" and model_loading is not None:
+        await asyncio.shield(model_loading)
+    if model_status["state"] != "ready":
+        return {
+            "success": False,
+            "error": f"Model not available: {model_status['error']}"
+        }
+    
+    body = await request.json()
+    session_id = body.get("session_id")
+    sources = {direction: url for direction, url in (body.get("sources") or {}).items()
+               if direction in ("north", "south", "east", "west") and url}
+    if not session_id or not sources:
+        return JSONResponse(status_code=400, content={
+            "success": False,
+            "error": "session_id and at least one of sources.north/south/east/west are required"
+        })
+    
+    try:
+        session = session_manager.submit(session_id, sources, live=True)
+    except SessionRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"success": False, "error": str(e)})
+    logger.info("📡 Processing live streams for session: %s (%s)", session_id, session.state)
+    return {"success": True, "session_id": session_id, "state": session.state}
+
+@app.get("/api/sessions")
+def list_sessions():
+    """All running, queued and recently finished sessions"""
+    if session_manager is None:
+        return {"sessions": []}
+    return {"sessions": session_manager.list(), **session_manager.summary()}
+
+@app.get("/api/sessions/{session_id}")
+def session_status(session_id: str):
+    status = session_manager.status(session_id) if session_manager else None
+    if status is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"Unknown session {session_id}"})
+    return status
+
+@app.post("/api/sessions/{session_id}/cancel")
+def cancel_session(session_id: str):
+    """Stop a queued or running session and release its captures"""
+    if session_manager is None or not session_manager.cancel(session_id):
+        return JSONResponse(status_code=404, content={
+            "success": False,
+            "error": f"No queued or running session {session_id}"
+        })
+    return {"success": True, "session_id": session_id}
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8001))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,186 @@
+"""
+In-process metrics in the Prometheus text format (served on GET /metrics)
+
+Deliberately tiny instead of pulling in prometheus_client: an observation is a
+bisect into the bucket bounds and two additions under a per-series lock, so
+the frame loop can afford one per stage per frame. Hot paths bind their label
+values once (metric.labels(...)) and keep the returned series.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; spans a ROI lookup (~10 us) to a slow backend POST
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterSeries:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeSeries:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramSeries:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # per bucket, last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """The series for these label values (created on first use); keep it in hot paths"""
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def remove_matching(self, label: str, value: str):
+        """Drop every series whose `label` equals value (e.g. a finished session)"""
+        position = self.labelnames.index(label)
+        with self._lock:
+            for key in [key for key in self._series if key[position] == value]:
+                del self._series[key]
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _sample_lines(self, key: Tuple[str, ...], series) -> Iterable[str]:
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._series.items())
+        for key, series in sorted(items):
+            lines.extend(self._sample_lines(key, series))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def _sample_lines(self, key, series):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(series.value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def _sample_lines(self, key, series):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(series.value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def _sample_lines(self, key, series):
+        with series._lock:
+            counts = list(series.counts)
+            total = series.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+STAGE_SECONDS = Histogram(
+    "cv_stage_seconds",
+    "Time spent per frame in each pipeline stage (decode, inference, roi, annotate, encode, track, backend_post)",
+    ["session", "direction", "stage"],
+)
+FRAMES_INFERRED = Counter("cv_frames_inferred_total", "Frames run through the detector", ["session", "direction"])
+FRAMES_SKIPPED = Counter("cv_frames_skipped_total", "Frames read but not run through the detector",
+                         ["session", "direction"])
+UPDATES_DROPPED = Counter("cv_updates_dropped_total", "Backend updates replaced by a newer one before being sent",
+                          ["session"])
+DETECTION_CACHE_HITS = Counter("cv_detection_cache_hits_total",
+                               "Frames whose detections came from the detection cache instead of the detector",
+                               ["session", "direction"])
+AMBULANCE_TRIGGERS = Counter("cv_ambulance_triggers_total", "Ambulance detections that raised an alert",
+                             ["session", "direction"])
+
+FRAME_BUFFER_BYTES = Gauge("cv_frame_buffer_bytes", "Bytes held by a session's pooled frame buffers", ["session"])
+FRAME_BUFFER_PEAK_BYTES = Gauge("cv_frame_buffer_peak_bytes", "Most bytes a session's frame buffers have held at once",
+                                ["session"])
+
+REGISTRY = [STAGE_SECONDS, FRAMES_INFERRED, FRAMES_SKIPPED, DETECTION_CACHE_HITS, UPDATES_DROPPED, AMBULANCE_TRIGGERS,
+            FRAME_BUFFER_BYTES, FRAME_BUFFER_PEAK_BYTES]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+def remove_session(session_id: str):
+    """Forget a session's series so finished sessions do not accumulate"""
+    for metric in REGISTRY:
+        metric.remove_matching("session", session_id)
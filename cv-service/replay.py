@@ -0,0 +1,287 @@
+"""
+Replay recorded count traces through SignalLogic in simulated time, and sweep
+its thresholds in bulk
+
+A trace is a time series of per-direction vehicle/pedestrian counts and the
+ambulance direction, from any of:
+    .csv    columns t, north, south, east, west, [ped_north ...], [ambulance]
+    .jsonl  {"t": 12.5, "vehicles": {"north": 3, ...}, "pedestrians": {...}, "ambulance": null}
+    a batch_analyze.py output directory, with --junction naming the clip folder
+Counts are held between samples and SignalLogic is ticked every --tick seconds
+of simulated time, as fast as the CPU allows (a day of data takes seconds).
+
+Usage (from cv-service/):
+    python replay.py day.csv --set green_duration=25
+    python replay.py counts/ --junction junction1 --sweep green_duration=15,25,35 \\
+        --sweep empty_roi_threshold=2,3,5 --workers 4 --output sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from signal_logic import SignalLogic
+
+DIRECTIONS = ["north", "south", "east", "west"]
+
+
+@dataclass
+class Trace:
+    """
+    Recorded intersection state, one row per sample
+    times: (T,) float64 seconds, increasing
+    vehicles, pedestrians: (T, 4) int32 counts in DIRECTIONS order
+    ambulance: (T,) int8 index into DIRECTIONS, -1 for none
+    """
+    times: np.ndarray
+    vehicles: np.ndarray
+    pedestrians: np.ndarray
+    ambulance: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict]) -> "Trace":
+        """Build from dicts with t, vehicles, pedestrians and ambulance keys"""
+        rows = sorted(rows, key=lambda row: row["t"])
+        return cls(
+            np.array([row["t"] for row in rows], np.float64),
+            np.array([[row["vehicles"].get(d, 0) for d in DIRECTIONS] for row in rows], np.int32).reshape(-1, 4),
+            np.array([[row["pedestrians"].get(d, 0) for d in DIRECTIONS] for row in rows], np.int32).reshape(-1, 4),
+            np.array([DIRECTIONS.index(row["ambulance"]) if row.get("ambulance") in DIRECTIONS else -1
+                      for row in rows], np.int8),
+        )
+
+
+def load_csv(path: str) -> Trace:
+    rows = []
+    with open(path, newline="") as f:
+        for record in csv.DictReader(f):
+            rows.append({
+                "t": float(record["t"]),
+                "vehicles": {d: int(float(record.get(d) or 0)) for d in DIRECTIONS},
+                "pedestrians": {d: int(float(record.get(f"ped_{d}") or 0)) for d in DIRECTIONS},
+                "ambulance": (record.get("ambulance") or "").strip().lower() or None,
+            })
+    return Trace.from_rows(rows)
+
+
+def load_jsonl(path: str) -> Trace:
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                rows.append({
+                    "t": float(record["t"]),
+                    "vehicles": record.get("vehicles") or {},
+                    "pedestrians": record.get("pedestrians") or {},
+                    "ambulance": record.get("ambulance"),
+                })
+    return Trace.from_rows(rows)
+
+
+def load_batch_output(output_dir: str, junction: str) -> Trace:
+    """
+    Merge the per-direction frame tables batch_analyze.py wrote for one junction
+    (clips <junction>/north.mp4 ... become <junction>__north ...) into one trace
+    """
+    import pyarrow.parquet as pq
+
+    series = {}
+    for direction in DIRECTIONS:
+        path = os.path.join(output_dir, "frames", f"{junction}__{direction}.parquet")
+        if os.path.exists(path):
+            table = pq.read_table(path, columns=["timestamp", "vehicle_count", "pedestrian_count"])
+            series[direction] = {name: table.column(name).to_numpy() for name in table.column_names}
+    if not series:
+        raise FileNotFoundError(f"No frame tables for junction '{junction}' in {output_dir}/frames")
+
+    times = np.unique(np.concatenate([columns["timestamp"] for columns in series.values()]))
+    vehicles = np.zeros((len(times), 4), np.int32)
+    pedestrians = np.zeros((len(times), 4), np.int32)
+    for direction, columns in series.items():
+        # Hold each direction's last sample until its next one
+        idx = np.clip(np.searchsorted(columns["timestamp"], times, side="right") - 1, 0, None)
+        vehicles[:, DIRECTIONS.index(direction)] = columns["vehicle_count"][idx]
+        pedestrians[:, DIRECTIONS.index(direction)] = columns["pedestrian_count"][idx]
+    return Trace(times.astype(np.float64), vehicles, pedestrians, np.full(len(times), -1, np.int8))
+
+
+def load_trace(source: str, junction: str = None) -> Trace:
+    if os.path.isdir(source):
+        if not junction:
+            raise ValueError("--junction is required when replaying a batch_analyze.py output directory")
+        return load_batch_output(source, junction)
+    if source.endswith(".jsonl"):
+        return load_jsonl(source)
+    return load_csv(source)
+
+
+class SimulatedClock:
+    """Clock for SignalLogic that only moves when the replay advances it"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_signal_logic(clock: SimulatedClock, params: Dict[str, float] = None) -> SignalLogic:
+    logic = SignalLogic(clock=clock, verbose=False)
+    for name, value in (params or {}).items():
+        if not hasattr(logic, name):
+            raise ValueError(f"SignalLogic has no parameter '{name}'")
+        setattr(logic, name, value)
+    return logic
+
+
+def replay(trace: Trace, params: Dict[str, float] = None, tick_seconds: float = 0.1) -> Dict:
+    """
+    Run the trace through a fresh SignalLogic, one update per tick of simulated time
+    Returns the params plus the outcome:
+    - vehicle_wait_seconds: vehicle-seconds spent on a non-green approach (lower is better)
+    - max_wait_seconds: longest any approach with vehicles waiting went without green
+    - ambulance_wait_seconds: seconds an ambulance's approach was not green
+    - phases: green phases started; green_seconds / mode_seconds: time per direction / mode
+    """
+    if not len(trace):
+        raise ValueError("Empty trace")
+    clock = SimulatedClock(float(trace.times[0]))
+    logic = make_signal_logic(clock, params)
+
+    ticks = np.arange(trace.times[0], trace.times[-1] + tick_seconds, tick_seconds)
+    sample_index = np.clip(np.searchsorted(trace.times, ticks, side="right") - 1, 0, None)
+
+    green_seconds = dict.fromkeys(DIRECTIONS, 0.0)
+    mode_seconds: Dict[str, float] = {}
+    waiting_since: Dict[str, Optional[float]] = dict.fromkeys(DIRECTIONS)
+    vehicle_wait = 0.0
+    max_wait = 0.0
+    ambulance_wait = 0.0
+    phases = 0
+    last_green = None
+
+    started = time.perf_counter()
+    sample = -1
+    for t, i in zip(ticks.tolist(), sample_index.tolist()):
+        if i != sample:
+            # Only rebuild the count dicts when the trace moves to a new sample
+            sample = i
+            vehicles = dict(zip(DIRECTIONS, trace.vehicles[i].tolist()))
+            pedestrians = dict(zip(DIRECTIONS, trace.pedestrians[i].tolist()))
+            ambulance = DIRECTIONS[trace.ambulance[i]] if trace.ambulance[i] >= 0 else None
+        clock.now = t
+        state = logic.update(vehicles, pedestrians, ambulance)
+
+        green = state["activeDirection"] if not state["yellowPhase"] else None
+        if green is not None and green != last_green:
+            phases += 1
+        last_green = green
+        mode_seconds[state["mode"]] = mode_seconds.get(state["mode"], 0.0) + tick_seconds
+        if ambulance and green != ambulance:
+            ambulance_wait += tick_seconds
+        for direction in DIRECTIONS:
+            if direction == green:
+                green_seconds[direction] += tick_seconds
+                waiting_since[direction] = None
+            elif vehicles[direction] > 0:
+                vehicle_wait += vehicles[direction] * tick_seconds
+                if waiting_since[direction] is None:
+                    waiting_since[direction] = t
+                max_wait = max(max_wait, t - waiting_since[direction])
+    wall_seconds = time.perf_counter() - started
+
+    simulated = float(len(ticks) * tick_seconds)
+    return {
+        **(params or {}),
+        "vehicle_wait_seconds": round(vehicle_wait, 1),
+        "max_wait_seconds": round(max_wait, 1),
+        "ambulance_wait_seconds": round(ambulance_wait, 1),
+        "phases": phases,
+        "green_seconds": {d: round(s, 1) for d, s in green_seconds.items()},
+        "mode_seconds": {m: round(s, 1) for m, s in mode_seconds.items()},
+        "simulated_seconds": round(simulated, 1),
+        "wall_seconds": round(wall_seconds, 3),
+        "speedup": round(simulated / max(wall_seconds, 1e-9)),
+    }
+
+
+def parameter_grid(sweep: Dict[str, List[float]], fixed: Dict[str, float] = None) -> List[Dict[str, float]]:
+    """Every combination of the swept values, each merged over the fixed ones"""
+    names = list(sweep)
+    return [{**(fixed or {}), **dict(zip(names, values))} for values in itertools.product(*sweep.values())]
+
+
+def run_sweep(trace: Trace, grid: List[Dict[str, float]], tick_seconds: float = 0.1, workers: int = 1) -> List[Dict]:
+    """Replay the trace once per parameter set, spread over processes when workers > 1"""
+    if workers <= 1 or len(grid) <= 1:
+        return [replay(trace, params, tick_seconds) for params in grid]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(replay, itertools.repeat(trace), grid, itertools.repeat(tick_seconds),
+                             chunksize=max(1, len(grid) // (workers * 4))))
+
+
+def parse_value(text: str) -> float:
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace", help=".csv / .jsonl trace, or a batch_analyze.py output directory")
+    parser.add_argument("--junction", help="clip folder to replay from a batch_analyze.py output directory")
+    parser.add_argument("--tick", type=float, default=0.1, help="simulated seconds between SignalLogic updates")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="fixed SignalLogic parameter, e.g. yellow_duration=4")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="parameter values to sweep (all combinations are replayed)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="write every result to this .csv or .json file")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace, args.junction)
+    fixed = {name: parse_value(value) for name, value in (item.split("=", 1) for item in args.set)}
+    sweep = {name: [parse_value(v) for v in values.split(",")]
+             for name, values in (item.split("=", 1) for item in args.sweep)}
+    grid = parameter_grid(sweep, fixed)
+    print(f"🔁 Replaying {len(trace)} samples ({trace.times[-1] - trace.times[0]:.0f}s of video) "
+          f"with {len(grid)} parameter set(s)")
+
+    started = time.perf_counter()
+    results = run_sweep(trace, grid, args.tick, args.workers)
+    elapsed = time.perf_counter() - started
+    results.sort(key=lambda result: result["vehicle_wait_seconds"])
+
+    names = list(sweep) or list(fixed)
+    header = names + ["vehicle_wait_seconds", "max_wait_seconds", "ambulance_wait_seconds", "phases"]
+    print("  ".join(f"{name:>22}" for name in header))
+    for result in results:
+        print("  ".join(f"{result[name]:>22}" for name in header))
+    simulated = sum(result["simulated_seconds"] for result in results)
+    print(f"📊 {simulated:.0f}s simulated in {elapsed:.1f}s ({simulated / elapsed:.0f}x real time)")
+
+    if args.output:
+        if args.output.endswith(".json"):
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            flat = [{k: (json.dumps(v) if isinstance(v, dict) else v) for k, v in result.items()} for result in results]
+            with open(args.output, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(flat[0]))
+                writer.writeheader()
+                writer.writerows(flat)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def quadrant_polygon(frame_width: int, frame_height: int, direction: str) -> np.ndarray:
+    """
+    Default ROI polygon for each direction in a 4-way intersection video
+    Divides the frame into 4 quadrants: north (bottom), south (top), east (left), west (right)
+    """
+    mid_x = frame_width // 2
+    mid_y = frame_height // 2
+    margin = 50  # Margin from center for clearer separation
+
+    if direction == "north":
+        # Bottom half of frame (vehicles approaching from bottom)
+        roi = np.array([
+            [int(frame_width * 0.15), mid_y + margin],
+            [int(frame_width * 0.85), mid_y + margin],
+            [int(frame_width * 0.85), int(frame_height * 0.95)],
+            [int(frame_width * 0.15), int(frame_height * 0.95)],
+        ], np.int32)
+    elif direction == "south":
+        # Top half of frame (vehicles approaching from top)
+        roi = np.array([
+            [int(frame_width * 0.15), int(frame_height * 0.05)],
+            [int(frame_width * 0.85), int(frame_height * 0.05)],
+            [int(frame_width * 0.85), mid_y - margin],
+            [int(frame_width * 0.15), mid_y - margin],
+        ], np.int32)
+    elif direction == "east":
+        # Left half of frame (vehicles approaching from left)
+        roi = np.array([
+            [int(frame_width * 0.05), int(frame_height * 0.15)],
+            [mid_x - margin, int(frame_height * 0.15)],
+            [mid_x - margin, int(frame_height * 0.85)],
+            [int(frame_width * 0.05), int(frame_height * 0.85)],
+        ], np.int32)
+    else:  # west
+        # Right half of frame (vehicles approaching from right)
+        roi = np.array([
+            [mid_x + margin, int(frame_height * 0.15)],
+            [int(frame_width * 0.95), int(frame_height * 0.15)],
+            [int(frame_width * 0.95), int(frame_height * 0.85)],
+            [mid_x + margin, int(frame_height * 0.85)],
+        ], np.int32)
+
+    return roi
+
+
+class RoiRegistry:
+    """
+    ROI geometry per camera, precomputed once per (camera, resolution)
+    Cameras without a configured polygon use the default quadrant for their
+    direction. ROI_CONFIG_PATH may point to a JSON file mapping camera ids
+    (the direction names) to polygons in fractions of frame width/height:
+        {"north": [[0.1, 0.55], [0.9, 0.55], [0.9, 0.98], [0.1, 0.98]]}
+    Each ROI is also rasterised into a boolean mask so any number of points
+    is tested with one array lookup.
+    """
+
+    def __init__(self, config: Dict[str, List[List[float]]] = None):
+        self.config = config or {}
+        self._polygons: Dict[Tuple[str, int, int], np.ndarray] = {}
+        self._masks: Dict[Tuple[str, int, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RoiRegistry":
+        path = os.getenv("ROI_CONFIG_PATH")
+        if not path:
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def polygon(self, camera: str, width: int, height: int) -> np.ndarray:
+        """ROI polygon in pixels (int32, shape (K, 2))"""
+        key = (camera, width, height)
+        roi = self._polygons.get(key)
+        if roi is None:
+            fractions = self.config.get(camera)
+            if fractions is not None:
+                roi = np.array([[int(fx * width), int(fy * height)] for fx, fy in fractions], np.int32)
+            else:
+                roi = quadrant_polygon(width, height, camera)
+            roi.setflags(write=False)
+            with self._lock:
+                self._polygons[key] = roi
+        return roi
+
+    def mask(self, camera: str, width: int, height: int) -> np.ndarray:
+        """Boolean (height, width) raster of the ROI, edges included"""
+        key = (camera, width, height)
+        mask = self._masks.get(key)
+        if mask is None:
+            raster = np.zeros((height, width), np.uint8)
+            cv2.fillPoly(raster, [self.polygon(camera, width, height)], 1)
+            mask = raster.astype(bool)
+            mask.setflags(write=False)
+            with self._lock:
+                self._masks[key] = mask
+        return mask
+
+    def contains(self, camera: str, width: int, height: int, points: np.ndarray,
+                 mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorised inside-ROI test for (N, 2) pixel points; points off the frame are outside"""
+        if mask is None:
+            mask = self.mask(camera, width, height)
+        points = np.asarray(points).astype(np.int64).reshape(-1, 2)
+        xs, ys = points[:, 0], points[:, 1]
+        on_frame = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        inside = np.zeros(len(points), bool)
+        inside[on_frame] = mask[ys[on_frame], xs[on_frame]]
+        return inside
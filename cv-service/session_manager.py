@@ -0,0 +1,190 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+import log_config
+import metrics
+from journal import journal_sink
+from signal_logic import SignalLogic
+
+logger = log_config.get_logger("session_manager")
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class SessionRejected(Exception):
+    """Raised when a session cannot be admitted; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 429):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Session:
+    """One simulation run with its own signal state and processing task"""
+
+    def __init__(self, session_id: str, video_paths: Dict[str, str], ready: Dict[str, asyncio.Event] = None,
+                 live: bool = False):
+        self.session_id = session_id
+        self.video_paths = video_paths  # files, or stream URLs / pipes when live
+        self.ready = ready
+        self.live = live
+        self.signal_logic = SignalLogic(journal=journal_sink(session_id))
+        self.stats: Dict = {}  # filled in by VideoProcessor.process_videos
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def status(self, queue_position: int = None) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "state": self.state,
+            "error": self.error,
+            "queue_position": queue_position,
+            "directions": sorted(self.video_paths),
+            "live": self.live,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "current_green": self.signal_logic.current_green_direction,
+            "mode": self.signal_logic.current_mode,
+            **self.stats,
+        }
+
+
+class SessionManager:
+    """
+    Runs each upload as an isolated session and admits only as many at once as
+    the service can keep up with
+    - MAX_CONCURRENT_SESSIONS caps the running sessions; by default it is derived
+      from the inference throughput measured at warmup divided by the per-session
+      budget (INFERENCE_FPS_BUDGET), at least 1
+    - up to MAX_QUEUED_SESSIONS more wait in FIFO order; past that, uploads are
+      rejected with 429 before their body is read
+    - finished sessions stay listed (last SESSION_HISTORY of them) for status calls
+    """
+
+    def __init__(self, processor, max_concurrent: int = None, max_queued: int = None, history: int = None):
+        self.processor = processor
+        self.max_concurrent = max_concurrent or int(os.getenv("MAX_CONCURRENT_SESSIONS", 0)) or self.measured_capacity()
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv("MAX_QUEUED_SESSIONS", 4))
+        self.history = history or int(os.getenv("SESSION_HISTORY", 50))
+
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._queue: Deque[Session] = deque()
+        self._running = 0
+        self._slot_freed = asyncio.Condition()
+
+    def measured_capacity(self) -> int:
+        """Sessions the measured inference throughput can serve at their full budget"""
+        measured_fps = getattr(self.processor, "measured_fps", None)
+        if not measured_fps:
+            return 1
+        return max(1, int(measured_fps // self.processor.inference_budget_fps))
+
+    def has_capacity(self) -> bool:
+        """True if a new session would run now or fit in the queue"""
+        return self._running < self.max_concurrent or len(self._queue) < self.max_queued
+
+    def submit(self, session_id: str, video_paths: Dict[str, str], ready: Dict[str, asyncio.Event] = None,
+               live: bool = False) -> Session:
+        """Admit a session (running or queued), or raise SessionRejected"""
+        existing = self.sessions.get(session_id)
+        if existing is not None and existing.state in ACTIVE_STATES:
+            raise SessionRejected(f"Session {session_id} is already {existing.state}", 409)
+        if not self.has_capacity():
+            raise SessionRejected(
+                f"At capacity: {self._running} running, {len(self._queue)} queued "
+                f"(max {self.max_concurrent} + {self.max_queued})"
+            )
+
+        session = Session(session_id, video_paths, ready, live)
+        self.sessions.pop(session_id, None)
+        self.sessions[session_id] = session
+        self._queue.append(session)
+        session.task = asyncio.create_task(self._run(session))
+        self._trim_history()
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self.sessions.get(session_id)
+
+    def status(self, session_id: str) -> Optional[Dict]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        return session.status(self._queue_position(session))
+
+    def list(self) -> List[Dict]:
+        return [session.status(self._queue_position(session)) for session in self.sessions.values()]
+
+    def summary(self) -> Dict:
+        return {
+            "running": self._running,
+            "queued": len(self._queue),
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+        }
+
+    def cancel(self, session_id: str) -> bool:
+        """Cancel a queued or running session; False if it is unknown or already finished"""
+        session = self.sessions.get(session_id)
+        if session is None or session.state not in ACTIVE_STATES or session.task is None:
+            return False
+        session.task.cancel()
+        return True
+
+    async def shutdown(self):
+        """Cancel every active session and wait for them to release their resources"""
+        tasks = [session.task for session in self.sessions.values()
+                 if session.state in ACTIVE_STATES and session.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, session: Session):
+        admitted = False
+        try:
+            async with self._slot_freed:
+                await self._slot_freed.wait_for(
+                    lambda: self._running < self.max_concurrent and self._queue[0] is session
+                )
+                self._queue.popleft()
+                self._running += 1
+                admitted = True
+
+            session.state = "running"
+            session.started_at = time.time()
+            logger.info("▶️ Session %s started (%d/%d running)", session.session_id, self._running,
+                        self.max_concurrent)
+            await self.processor.process_videos(session.session_id, session.video_paths, session.ready,
+                                                session.signal_logic, session.stats, session.live)
+            session.state = "failed" if session.stats.get("error") else "completed"
+            session.error = session.stats.get("error")
+        except asyncio.CancelledError:
+            session.state = "cancelled"
+            logger.info("⏹️ Session %s cancelled", session.session_id)
+        finally:
+            session.finished_at = time.time()
+            if not admitted and session in self._queue:
+                self._queue.remove(session)
+            async with self._slot_freed:
+                if admitted:
+                    self._running -= 1
+                self._slot_freed.notify_all()
+
+    def _queue_position(self, session: Session) -> Optional[int]:
+        if session.state != "queued" or session not in self._queue:
+            return None
+        return self._queue.index(session) + 1
+
+    def _trim_history(self):
+        finished = [session_id for session_id, session in self.sessions.items() if session.state not in ACTIVE_STATES]
+        for session_id in finished[:max(0, len(finished) - self.history)]:
+            del self.sessions[session_id]
+            metrics.remove_session(session_id)
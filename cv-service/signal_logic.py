@@ -1,7 +1,12 @@
+import math
 import time
-from typing import Dict
+from typing import Callable, Dict
 from collections import deque
 
+import log_config
+
+logger = log_config.get_logger("signal_logic")
+
 class SignalLogic:
     """
     Implements adaptive traffic signal logic with priorities:
@@ -10,9 +15,20 @@ class SignalLogic:
     PRIORITY 3: Heavy Traffic Rotation (>20 each OR >80 total)
     PRIORITY 4: Default Fixed Rotation (North → East → South → West)
     NEW FEATURE: Early close rule (3 sec empty ROI)
+    Timers count down in float seconds read from `clock` (time.monotonic by
+    default); replay.py injects a simulated clock to run recorded traces
+    faster than real time. verbose=False silences the per-decision log lines.
+    Each decision is also passed to `journal` (see journal.py) as an event dict.
     """
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = None, verbose: bool = True,
+                 journal: Callable[[Dict], None] = None):
+        self.clock = clock or time.monotonic
+        self.verbose = verbose
+        self.journal = journal
+        if verbose:
+            log_config.configure()
+        
         # Timing configuration
         self.green_duration = 35  # 35 seconds default
         self.yellow_duration = 3  # 3 seconds yellow
@@ -30,7 +46,7 @@ class SignalLogic:
         self.current_green_direction = None
         self.previous_green_direction = None
         self.timer = 0
-        self.last_update = time.time()
+        self.last_update = self.clock()
         self.in_yellow_phase = False
         self.next_green_direction = None
         
@@ -50,7 +66,7 @@ class SignalLogic:
         Main logic update function
         Returns current signal state
         """
-        current_time = time.time()
+        current_time = self.clock()
         elapsed = current_time - self.last_update
         
         # ============================================================
@@ -61,11 +77,13 @@ class SignalLogic:
             # This ensures immediate response even if ambulance comes back
             if not self.ambulance_mode or ambulance_direction != self.ambulance_direction or self.ambulance_clearing:
                 # New ambulance detection OR ambulance changed direction OR was clearing - immediate green
-                print(f"🚨 AMBULANCE EMERGENCY in {ambulance_direction.upper()}! Switching signal to GREEN")
+                self.log("🚨 AMBULANCE EMERGENCY in %s! Switching signal to GREEN", ambulance_direction.upper())
+                self.record("ambulance_override", direction=ambulance_direction,
+                            previous=self.current_green_direction, vehicles=dict(vehicle_counts))
+                self.set_mode("ambulance")
                 self.current_green_direction = ambulance_direction
                 self.timer = 999  # Keep green indefinitely
                 self.in_yellow_phase = False
-                self.current_mode = "ambulance"
                 self.ambulance_mode = True
                 self.ambulance_direction = ambulance_direction
                 self.ambulance_clearing = False
@@ -91,12 +109,15 @@ class SignalLogic:
         # Ambulance clearing period (5 seconds after ambulance leaves)
         if self.ambulance_mode and not ambulance_direction:
             if not self.ambulance_clearing:
-                print(f"🚑 Ambulance no longer detected in {self.ambulance_direction.upper()}. Allowing clearance time...")
+                self.log("🚑 Ambulance no longer detected in %s. Allowing clearance time...",
+                         self.ambulance_direction.upper())
+                self.record("ambulance_clearing", direction=self.ambulance_direction,
+                            seconds=self.ambulance_clear_duration)
                 self.ambulance_clearing = True
                 self.ambulance_clear_timer = self.ambulance_clear_duration
             
             if self.ambulance_clear_timer > 0:
-                self.ambulance_clear_timer = max(0, self.ambulance_clear_timer - int(elapsed))
+                self.ambulance_clear_timer = max(0, self.ambulance_clear_timer - elapsed)
                 
                 # Keep signal green during clearing
                 signal_state = {}
@@ -104,7 +125,7 @@ class SignalLogic:
                     signal_state[direction] = "green" if direction == self.ambulance_direction else "red"
                 
                 signal_state["activeDirection"] = self.ambulance_direction
-                signal_state["timer"] = self.ambulance_clear_timer
+                signal_state["timer"] = self.display_timer(self.ambulance_clear_timer)
                 signal_state["mode"] = "ambulance"
                 signal_state["yellowPhase"] = False
                 
@@ -112,7 +133,9 @@ class SignalLogic:
                 return signal_state
             else:
                 # Clearing complete - resume normal rotation
-                print(f"✅ Ambulance fully cleared from {self.ambulance_direction.upper()}. Resuming normal traffic flow.")
+                self.log("✅ Ambulance fully cleared from %s. Resuming normal traffic flow.",
+                         self.ambulance_direction.upper())
+                self.record("ambulance_cleared", direction=self.ambulance_direction)
                 self.ambulance_mode = False
                 self.ambulance_direction = None
                 self.ambulance_clearing = False
@@ -130,7 +153,10 @@ class SignalLogic:
                 
                 # If empty for 3 seconds, close early
                 if self.empty_roi_timer >= self.empty_roi_threshold:
-                    print(f"⚡ EARLY CLOSE: {self.current_green_direction.upper()} ROI empty for 3 sec → switching to next")
+                    self.log("⚡ EARLY CLOSE: %s ROI empty for %s sec → switching to next",
+                             self.current_green_direction.upper(), self.empty_roi_threshold)
+                    self.record("early_close", direction=self.current_green_direction,
+                                empty_seconds=round(self.empty_roi_timer, 3))
                     self.timer = 0  # Force immediate switch
                     self.empty_roi_timer = 0
             else:
@@ -141,7 +167,7 @@ class SignalLogic:
         # Timer Management
         # ============================================================
         if self.timer > 0:
-            self.timer = max(0, self.timer - int(elapsed))
+            self.timer = max(0, self.timer - elapsed)
         
         self.last_update = current_time
         
@@ -153,7 +179,8 @@ class SignalLogic:
                 self.timer = self.green_duration
                 self.in_yellow_phase = False
                 self.empty_roi_timer = 0
-                print(f"🟢 {self.current_green_direction.upper()} → GREEN")
+                self.log("🟢 %s → GREEN", self.current_green_direction.upper())
+                self.record("green", direction=self.current_green_direction, seconds=self.green_duration)
             else:
                 # Green phase ended - decide next signal
                 self.decide_next_signal(vehicle_counts, pedestrian_counts)
@@ -171,12 +198,31 @@ class SignalLogic:
                 signal_state[direction] = "red"
         
         signal_state["activeDirection"] = self.current_green_direction
-        signal_state["timer"] = self.timer
+        signal_state["timer"] = self.display_timer(self.timer)
         signal_state["mode"] = self.current_mode
         signal_state["yellowPhase"] = self.in_yellow_phase
         
         return signal_state
     
+    @staticmethod
+    def display_timer(seconds: float) -> int:
+        """Whole seconds left, rounded up like a countdown display"""
+        return int(math.ceil(seconds - 1e-9))
+    
+    def log(self, message: str, *args):
+        if self.verbose:
+            logger.info(message, *args)
+    
+    def record(self, event: str, **fields):
+        """Journal a decision, stamped with the signal clock"""
+        if self.journal is not None:
+            self.journal({"event": event, "clock": round(self.clock(), 3), **fields})
+    
+    def set_mode(self, mode: str):
+        if mode != self.current_mode:
+            self.record("mode_change", previous=self.current_mode, mode=mode)
+            self.current_mode = mode
+    
     def decide_next_signal(self, vehicle_counts: Dict[str, int], pedestrian_counts: Dict[str, int]):
         """
         Decide next signal based on priority system
@@ -192,8 +238,9 @@ class SignalLogic:
             ped_direction = max(pedestrian_counts, key=pedestrian_counts.get)
             next_direction = ped_direction
             duration = self.pedestrian_crossing_time
-            self.current_mode = "pedestrian"
-            print(f"🚶 PEDESTRIAN PRIORITY: {ped_direction.upper()} ({pedestrian_counts[ped_direction]} pedestrians) → YELLOW")
+            self.set_mode("pedestrian")
+            self.log("🚶 PEDESTRIAN PRIORITY: %s (%s pedestrians) → YELLOW",
+                     ped_direction.upper(), pedestrian_counts[ped_direction])
         
         # ============================================================
         # PRIORITY 3: HEAVY TRAFFIC ROTATION MODE
@@ -204,8 +251,8 @@ class SignalLogic:
             next_direction = self.rotation_sequence[self.rotation_index]
             self.rotation_index = (self.rotation_index + 1) % len(self.rotation_sequence)
             duration = self.green_duration  # 35 seconds
-            self.current_mode = "heavy_traffic"
-            print(f"⚠️ HEAVY TRAFFIC MODE: Rotating to {next_direction.upper()} → YELLOW")
+            self.set_mode("heavy_traffic")
+            self.log("⚠️ HEAVY TRAFFIC MODE: Rotating to %s → YELLOW", next_direction.upper())
         
         # ============================================================
         # PRIORITY 4: DEFAULT FIXED ROTATION (NEW)
@@ -216,8 +263,9 @@ class SignalLogic:
             next_direction = self.rotation_sequence[self.rotation_index]
             self.rotation_index = (self.rotation_index + 1) % len(self.rotation_sequence)
             duration = self.green_duration  # 35 seconds
-            self.current_mode = "normal"
-            print(f"🔄 DEFAULT ROTATION: {next_direction.upper()} ({vehicle_counts[next_direction]} vehicles) → YELLOW")
+            self.set_mode("normal")
+            self.log("🔄 DEFAULT ROTATION: %s (%s vehicles) → YELLOW",
+                     next_direction.upper(), vehicle_counts[next_direction])
         
         # ============================================================
         # Transition to Yellow Phase
@@ -229,12 +277,14 @@ class SignalLogic:
         
         # Store duration for when yellow ends
         self._next_green_duration = duration
+        self.record("yellow", direction=self.current_green_direction, next=next_direction, mode=self.current_mode,
+                    vehicles=dict(vehicle_counts), pedestrians=dict(pedestrian_counts))
         
         if self.current_green_direction:
-            print(f"🟡 {self.current_green_direction.upper()} → YELLOW (transition)")
+            self.log("🟡 %s → YELLOW (transition)", self.current_green_direction.upper())
         else:
             # First signal initialization
-            print(f"🟡 Starting with {next_direction.upper()} → YELLOW (transition)")
+            self.log("🟡 Starting with %s → YELLOW (transition)", next_direction.upper())
     
     def reset(self):
         """Reset signal logic state"""
@@ -0,0 +1,95 @@
+"""
+Local test camera: serves video files as live HTTP-MJPEG streams, paced at
+each file's frame rate and looped, so the live ingestion path can be exercised
+without real cameras
+
+Usage (from cv-service/):
+    python stream_server.py --port 8090 north=uploads/<session>/north.mp4 south=...
+Then start a live session against it:
+    curl -X POST localhost:8001/api/process-streams -H 'Content-Type: application/json' \\
+        -d '{"session_id": "live-1", "sources": {"north": "http://localhost:8090/north", ...}}'
+"""
+import argparse
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+import cv2
+
+BOUNDARY = "frame"
+
+
+def make_handler(streams: Dict[str, str], quality: int):
+    class MjpegHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = streams.get(self.path.strip("/"))
+            if path is None:
+                self.send_error(404, f"Unknown stream {self.path} (have: {', '.join(streams)})")
+                return
+
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                cap.release()
+                self.send_error(500, f"Cannot open {path}")
+                return
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            started = time.monotonic()
+            frame_index = 0
+            read_since_rewind = True
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        if not read_since_rewind:
+                            # Nothing readable even from the start: end the stream instead of spinning
+                            print(f"⚠️ No readable frames in {path}, ending stream /{self.path.strip('/')}")
+                            break
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        read_since_rewind = False
+                        continue
+                    read_since_rewind = True
+                    # Like a camera: a frame every 1/fps seconds, whether or not the client keeps up
+                    delay = started + frame_index / fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                    self.wfile.write(
+                        f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                    )
+                    self.wfile.write(jpeg.tobytes())
+                    self.wfile.write(b"\r\n")
+                    frame_index += 1
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                cap.release()
+
+        def log_message(self, format, *args):
+            pass
+
+    return MjpegHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("streams", nargs="+", help="name=video_path, served at /name")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--quality", type=int, default=85, help="JPEG quality")
+    args = parser.parse_args()
+
+    streams = dict(stream.split("=", 1) for stream in args.streams)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(streams, args.quality))
+    server.daemon_threads = True
+    for name, path in streams.items():
+        print(f"📡 http://{args.host}:{args.port}/{name} <- {path}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
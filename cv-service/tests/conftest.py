@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the cv-service modules importable however pytest is started
+CV_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CV_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, CV_SERVICE_DIR)
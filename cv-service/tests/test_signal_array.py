@@ -0,0 +1,78 @@
+"""
+SignalArray must produce exactly the signal state of one SignalLogic per
+intersection, stepped through the same clock, on randomised traces that reach
+every mode (ambulances, pedestrian surges, heavy traffic, empty approaches,
+uneven tick spacing)
+"""
+import numpy as np
+import pytest
+
+from signal_array import DIRECTIONS, NO_DIRECTION, SignalArray
+from signal_logic import SignalLogic
+
+INTERSECTIONS = 300
+TICKS = 400
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def random_trace(n: int, ticks: int, seed: int):
+    """Per-tick vehicle and pedestrian counts, ambulance directions and clock steps for n intersections"""
+    rng = np.random.default_rng(seed)
+    level = rng.choice([0.0, 2.0, 8.0, 30.0], size=(n, 4))
+    vehicles = np.empty((ticks, n, 4), np.int32)
+    pedestrians = np.empty((ticks, n, 4), np.int32)
+    ambulance = np.full((ticks, n), NO_DIRECTION, np.int8)
+    amb_direction = np.full(n, NO_DIRECTION, np.int8)
+    for t in range(ticks):
+        change = rng.random((n, 4)) < 0.01
+        level[change] = rng.choice([0.0, 2.0, 8.0, 30.0], size=int(change.sum()))
+        vehicles[t] = rng.poisson(level)
+        pedestrians[t] = rng.poisson(0.8, size=(n, 4))
+        arrive = (amb_direction == NO_DIRECTION) & (rng.random(n) < 0.003)
+        amb_direction[arrive] = rng.integers(0, 4, size=int(arrive.sum()))
+        amb_direction[rng.random(n) < 0.02] = NO_DIRECTION
+        switch = (amb_direction != NO_DIRECTION) & (rng.random(n) < 0.005)
+        amb_direction[switch] = rng.integers(0, 4, size=int(switch.sum()))
+        ambulance[t] = amb_direction
+    # Uneven tick spacing, sometimes long enough to expire several timers at once
+    steps = rng.choice([0.05, 0.1, 0.3, 1.0, 4.0], size=ticks, p=[0.3, 0.4, 0.2, 0.08, 0.02])
+    return vehicles, pedestrians, ambulance, steps
+
+
+@pytest.mark.parametrize("swept", [False, True], ids=["default-parameters", "per-row-parameters"])
+def test_matches_signal_logic(swept):
+    n, seed = INTERSECTIONS, 7 if swept else 0
+    vehicles, pedestrians, ambulance, steps = random_trace(n, TICKS, seed)
+    clock = SimulatedClock()
+    scalars = [SignalLogic(clock=clock, verbose=False) for _ in range(n)]
+    array = SignalArray(n, clock=clock)
+    if swept:
+        rng = np.random.default_rng(seed + 1)
+        for name, choices in (("green_duration", [10, 20, 35]), ("empty_roi_threshold", [1, 3, 5]),
+                              ("heavy_traffic_threshold", [5, 20]), ("yellow_duration", [2, 3])):
+            values = rng.choice(choices, size=n).astype(np.float64)
+            setattr(array, name, values)
+            for logic, value in zip(scalars, values.tolist()):
+                setattr(logic, name, value)
+
+    modes = set()
+    for t in range(TICKS):
+        clock.now += steps[t]
+        array.update(vehicles[t], pedestrians[t], ambulance[t])
+        for i, logic in enumerate(scalars):
+            expected = logic.update(
+                dict(zip(DIRECTIONS, vehicles[t, i].tolist())),
+                dict(zip(DIRECTIONS, pedestrians[t, i].tolist())),
+                DIRECTIONS[ambulance[t, i]] if ambulance[t, i] != NO_DIRECTION else None,
+            )
+            modes.add(expected["mode"])
+            assert array.state(i) == expected, f"tick {t}, intersection {i}"
+            assert array.rotation_index[i] == logic.rotation_index, f"tick {t}, intersection {i}: rotation"
+    assert modes == {"normal", "pedestrian", "heavy_traffic", "ambulance"}
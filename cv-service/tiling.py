@@ -0,0 +1,187 @@
+"""
+ROI-cropped and tiled inference
+
+Only detections centred in a direction's ROI are counted, yet the detector
+normally sees the whole frame at DETECTOR_IMGSZ, so most of its input pixels
+go to regions we ignore and distant vehicles shrink below what it can find.
+INFERENCE_REGION=roi crops each frame to its ROI's bounding rectangle (plus
+INFERENCE_CROP_MARGIN, so vehicles straddling the ROI edge keep whole boxes)
+before the detector letterboxes it. INFERENCE_TILE_SIZE > 0 also splits crops
+longer than that many source pixels into tiles overlapping by
+INFERENCE_TILE_OVERLAP, each seen at the full input size; detections from
+neighbouring tiles are merged across the seams. Boxes always come back in
+full-frame pixels, so counting, tracking and annotation are unchanged.
+"""
+import math
+import os
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from detections import Detections
+from detector_backends import input_shape
+
+# A box mostly inside (intersection over the smaller box) a same-class box from another
+# tile is the same object seen twice, or cut by the seam
+TILE_MERGE_CONTAINMENT = 0.6
+
+Rect = Tuple[int, int, int, int]  # x0, y0, x1, y1 in frame pixels
+
+
+def roi_crop(roi: np.ndarray, width: int, height: int, margin: float) -> Rect:
+    """Bounding rectangle of the ROI grown by margin (a fraction of its size on each side), clipped to the frame"""
+    x, y, w, h = cv2.boundingRect(roi)
+    grow_x, grow_y = int(round(w * margin)), int(round(h * margin))
+    return max(0, x - grow_x), max(0, y - grow_y), min(width, x + w + grow_x), min(height, y + h + grow_y)
+
+
+def tile_grid(rect: Rect, tile_size: int, overlap: float) -> List[Rect]:
+    """
+    Tiles of at most tile_size pixels a side covering rect, evenly spread so that
+    neighbours overlap by at least overlap (a fraction of the tile)
+    """
+    x0, y0, x1, y1 = rect
+
+    def spans(start: int, end: int) -> List[Tuple[int, int]]:
+        length = end - start
+        if length <= tile_size:
+            return [(start, end)]
+        step = tile_size * (1 - overlap)
+        count = math.ceil((length - tile_size) / step) + 1
+        return [(int(round(offset)), int(round(offset)) + tile_size)
+                for offset in np.linspace(start, end - tile_size, count)]
+
+    return [(tx0, ty0, tx1, ty1) for ty0, ty1 in spans(y0, y1) for tx0, tx1 in spans(x0, x1)]
+
+
+def merge_tiles(parts: Sequence[Detections], containment: float = TILE_MERGE_CONTAINMENT) -> Detections:
+    """
+    One set of detections from overlapping tiles (boxes already in frame pixels)
+    Two boxes of the same class from different tiles are the same object when the
+    smaller lies mostly inside the larger; such boxes are grouped transitively (a
+    vehicle longer than the overlap is cut into a chain of pieces) and each group
+    becomes its most confident member's class and score with the union of the
+    boxes. A group takes at most one box per tile: boxes from the same tile were
+    already separated by the detector's NMS.
+    """
+    parts = [part for part in parts if len(part)]
+    if len(parts) <= 1:
+        return parts[0] if parts else Detections.empty()
+
+    tiles = np.repeat(np.arange(len(parts)), [len(part) for part in parts])
+    order = np.argsort(-np.concatenate([part.confidences for part in parts]), kind="stable")
+    boxes = np.concatenate([part.boxes for part in parts])[order]
+    classes = np.concatenate([part.classes for part in parts])[order]
+    confidences = np.concatenate([part.confidences for part in parts])[order]
+    tiles = tiles[order]
+
+    x1, y1, x2, y2 = boxes.T
+    areas = np.maximum((x2 - x1) * (y2 - y1), 1e-6)
+    inter_w = np.clip(np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1), 0, None)
+    inter_h = np.clip(np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1), 0, None)
+    mergeable = inter_w * inter_h / np.minimum(areas[:, None], areas) > containment
+    mergeable &= (classes[:, None] == classes) & (tiles[:, None] != tiles)
+    has_partner = mergeable.any(axis=1)
+
+    merged_boxes = boxes.copy()
+    taken = np.zeros(len(boxes), bool)
+    keep = []
+    for i in range(len(boxes)):
+        if taken[i]:
+            continue
+        keep.append(i)
+        taken[i] = True
+        if not has_partner[i]:
+            continue
+        group, group_tiles, frontier = [i], {tiles[i]}, [i]
+        while frontier:
+            candidates = np.flatnonzero(mergeable[frontier].any(axis=0) & ~taken)
+            frontier = []
+            for j in candidates:
+                if tiles[j] not in group_tiles:
+                    group.append(j)
+                    group_tiles.add(tiles[j])
+                    taken[j] = True
+                    frontier.append(j)
+        if len(group) > 1:
+            merged_boxes[i, :2] = boxes[group, :2].min(axis=0)
+            merged_boxes[i, 2:] = boxes[group, 2:].max(axis=0)
+    return Detections(merged_boxes[keep], classes[keep], confidences[keep])
+
+
+class InferenceRegions:
+    """
+    Which parts of each frame go through the detector (see the module docstring)
+    mode "frame" keeps the original whole-frame inference
+    """
+
+    def __init__(self, mode: str = "frame", margin: float = 0.1, tile_size: int = 0, overlap: float = 0.25):
+        if mode not in ("frame", "roi"):
+            raise ValueError(f"Unknown INFERENCE_REGION '{mode}' (expected frame or roi)")
+        self.mode = mode
+        self.margin = margin
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self._rects: Dict[Tuple[bytes, int, int], List[Rect]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "InferenceRegions":
+        return cls(
+            os.getenv("INFERENCE_REGION", "frame").lower(),
+            float(os.getenv("INFERENCE_CROP_MARGIN", 0.1)),
+            int(os.getenv("INFERENCE_TILE_SIZE", 0)),
+            float(os.getenv("INFERENCE_TILE_OVERLAP", 0.25)),
+        )
+
+    @property
+    def key(self) -> str:
+        """The settings that change detections, for cache keys ("frame" for whole-frame inference)"""
+        if self.mode == "frame":
+            return "frame"
+        return f"roi:{self.margin!r}:{self.tile_size}:{self.overlap!r}"
+
+    def rects(self, roi: np.ndarray, width: int, height: int) -> List[Rect]:
+        """The crop (or its tiles) to run for a frame with this ROI; cached per ROI and resolution"""
+        if self.mode == "frame":
+            return [(0, 0, width, height)]
+        cache_key = (roi.tobytes(), width, height)
+        rects = self._rects.get(cache_key)
+        if rects is None:
+            crop = roi_crop(roi, width, height, self.margin)
+            rects = tile_grid(crop, self.tile_size, self.overlap) if self.tile_size > 0 else [crop]
+            with self._lock:
+                self._rects[cache_key] = rects
+        return rects
+
+    def predict(self, detector, frames: Sequence[Tuple[np.ndarray, np.ndarray]], conf: float) -> List[Detections]:
+        """
+        Detections for each (frame, roi) pair, in full-frame pixels
+        Crops are views (no copies); they go to the detector grouped by network input
+        shape, so a wide crop is never padded up to a tall one in the same batch
+        """
+        if self.mode == "frame":
+            return detector.predict([frame for frame, _ in frames], conf)
+
+        pieces = []  # (frame number, x0, y0, crop)
+        for number, (frame, roi) in enumerate(frames):
+            height, width = frame.shape[:2]
+            for x0, y0, x1, y1 in self.rects(roi, width, height):
+                pieces.append((number, x0, y0, frame[y0:y1, x0:x1]))
+
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for i, piece in enumerate(pieces):
+            groups.setdefault(input_shape([piece[3]], detector.imgsz), []).append(i)
+        found: List[Detections] = [None] * len(pieces)
+        for indices in groups.values():
+            for i, detections in zip(indices, detector.predict([pieces[i][3] for i in indices], conf)):
+                found[i] = detections
+
+        per_frame: List[List[Detections]] = [[] for _ in frames]
+        for (number, x0, y0, _), detections in zip(pieces, found):
+            offset = np.array([x0, y0, x0, y0], np.float32)
+            per_frame[number].append(Detections(detections.boxes + offset, detections.classes,
+                                                detections.confidences))
+        return [merge_tiles(parts) for parts in per_frame]
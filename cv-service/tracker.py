@@ -0,0 +1,141 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from detections import Detections
+
+PERSON_CLASS = 0
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Track:
+    """One tracked object with a constant-velocity motion model"""
+
+    def __init__(self, track_id: int, box: np.ndarray, cls: int, frame_index: int):
+        self.track_id = track_id
+        self.box = box.astype(np.float32)
+        self.velocity = np.zeros(4, np.float32)  # box delta per frame
+        self.cls = cls
+        self.last_frame = frame_index
+        self.hits = 1
+        self.missed = 0  # inference passes since the last match
+        self.counted = False  # already counted as a unique vehicle in the ROI
+        self.ambulance_hits = 0
+
+    def predict(self, frame_index: int) -> np.ndarray:
+        return self.box + self.velocity * (frame_index - self.last_frame)
+
+    def update(self, box: np.ndarray, cls: int, frame_index: int):
+        frames = frame_index - self.last_frame
+        if frames > 0:
+            # Smooth the velocity so one jittery box does not throw the prediction off
+            self.velocity = 0.5 * self.velocity + 0.5 * (box - self.box) / frames
+        self.box = box.astype(np.float32)
+        self.cls = cls
+        self.last_frame = frame_index
+        self.hits += 1
+        self.missed = 0
+
+
+class VehicleTracker:
+    """
+    Cheap IoU + motion tracker for one approach
+    - update() on inferred frames matches detections to tracks (greedy by IoU)
+      and gives each object a stable ID
+    - predict() moves the live tracks to any later frame, so counts follow the
+      traffic between YOLO runs instead of repeating the last value
+    - each vehicle is counted once in unique_vehicles, the first time its
+      center is inside the ROI
+    - a track is an ambulance once it was flagged on ambulance_min_hits detections,
+      and stays one for its lifetime (no per-frame flicker)
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 2, ambulance_min_hits: int = 2):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.ambulance_min_hits = ambulance_min_hits
+
+        self.tracks: List[Track] = []
+        self.unique_vehicles = 0
+        self._next_id = 1
+
+    def update(self, frame_index: int, detections: Detections, ambulance_flags: np.ndarray = None):
+        """Match one inferred frame's detections to the tracks"""
+        if ambulance_flags is None:
+            ambulance_flags = np.zeros(len(detections), bool)
+
+        predicted = np.array([track.predict(frame_index) for track in self.tracks], np.float32).reshape(-1, 4)
+        iou = iou_matrix(predicted, detections.boxes)
+        if iou.size:
+            # Persons only match persons; vehicle classes may swap (car <-> truck)
+            track_is_person = np.array([track.cls == PERSON_CLASS for track in self.tracks])
+            det_is_person = detections.classes == PERSON_CLASS
+            iou[track_is_person[:, None] != det_is_person[None, :]] = 0
+
+        matched_tracks = set()
+        matched_dets = set()
+        for flat in np.argsort(-iou, axis=None):
+            t, d = np.unravel_index(flat, iou.shape)
+            if iou[t, d] < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_dets:
+                continue
+            matched_tracks.add(t)
+            matched_dets.add(d)
+            track = self.tracks[t]
+            track.update(detections.boxes[d], int(detections.classes[d]), frame_index)
+            if ambulance_flags[d]:
+                track.ambulance_hits += 1
+
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+
+        for d in range(len(detections)):
+            if d not in matched_dets:
+                track = Track(self._next_id, detections.boxes[d], int(detections.classes[d]), frame_index)
+                track.ambulance_hits = int(ambulance_flags[d])
+                survivors.append(track)
+                self._next_id += 1
+
+        self.tracks = survivors
+
+    def predict(self, frame_index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Boxes of the tracks seen at the last inference, moved to frame_index
+        Returns: (boxes (K, 4), classes (K,), track_ids (K,))
+        """
+        active = [track for track in self.tracks if track.missed == 0]
+        boxes = np.array([track.predict(frame_index) for track in active], np.float32).reshape(-1, 4)
+        classes = np.array([track.cls for track in active], np.int32)
+        track_ids = np.array([track.track_id for track in active], np.int64)
+        return boxes, classes, track_ids
+
+    def count_unique(self, track_ids: np.ndarray, in_roi: np.ndarray):
+        """Count vehicles whose center is in the ROI for the first time"""
+        inside = set(track_ids[in_roi].tolist())
+        for track in self.tracks:
+            if track.track_id in inside and not track.counted and track.cls != PERSON_CLASS:
+                track.counted = True
+                self.unique_vehicles += 1
+
+    def has_ambulance(self) -> bool:
+        """True while a confirmed ambulance track is alive"""
+        return any(track.ambulance_hits >= self.ambulance_min_hits for track in self.tracks)
@@ -0,0 +1,147 @@
+import asyncio
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+import log_config
+
+logger = log_config.get_logger("upload_ingest")
+
+DIRECTIONS = ["north", "south", "east", "west"]
+
+
+class StreamingUpload:
+    """
+    Streams the 4-video multipart upload straight to disk
+    - The request body is parsed chunk by chunk as it arrives; nothing is
+      spooled in memory and the event loop never blocks on file I/O
+    - Each direction has its own writer task, so a direction is still being
+      flushed to disk while the next one is already being received
+    - ready[direction] is set as soon as that direction's file is complete,
+      so processing can start before the whole upload has arrived
+    """
+
+    def __init__(self, upload_root: Path, session_id: str = None, queue_chunks: int = 64):
+        self.upload_root = upload_root
+        self.session_id = session_id
+        self.session_known = asyncio.Event()
+        if session_id:
+            self.session_known.set()
+
+        self.upload_dir: Optional[Path] = None
+        self.video_paths: Dict[str, str] = {}
+        self.ready: Dict[str, asyncio.Event] = {direction: asyncio.Event() for direction in DIRECTIONS}
+        self.bytes_received: Dict[str, int] = {direction: 0 for direction in DIRECTIONS}
+
+        self._queue_chunks = queue_chunks
+        self._writers: List[asyncio.Task] = []
+
+    async def receive(self, request):
+        """Consume the request body; raises ValueError on a malformed or incomplete upload"""
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise ValueError("Expected a multipart/form-data upload")
+
+        events = []
+        part = {}
+
+        def on_part_begin():
+            part.clear()
+            part["header_field"] = b""
+            part["header_value"] = b""
+            part["headers"] = {}
+
+        def on_header_field(data, start, end):
+            part["header_field"] += data[start:end]
+
+        def on_header_value(data, start, end):
+            part["header_value"] += data[start:end]
+
+        def on_header_end():
+            part["headers"][part["header_field"].lower()] = part["header_value"]
+            part["header_field"] = b""
+            part["header_value"] = b""
+
+        def on_headers_finished():
+            _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+            part["name"] = disposition.get(b"name", b"").decode()
+            part["is_file"] = b"filename" in disposition
+            events.append(("begin", part["name"], part["is_file"]))
+
+        def on_part_data(data, start, end):
+            events.append(("data", part["name"], data[start:end]))
+
+        def on_part_end():
+            events.append(("end", part["name"], None))
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        })
+
+        queues: Dict[str, asyncio.Queue] = {}
+        fields: Dict[str, bytes] = {}
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for kind, name, payload in events:
+                    if name in self.ready and (kind != "begin" or payload):
+                        await self._handle_file_event(kind, name, payload, queues)
+                    elif kind == "data":
+                        fields[name] = fields.get(name, b"") + payload
+                        if len(fields[name]) > 1024:
+                            raise ValueError(f"Form field '{name}' too large")
+                    elif kind == "end" and name == "session_id" and not self.session_id:
+                        self.session_id = fields[name].decode().strip()
+                        self.session_known.set()
+                events.clear()
+            parser.finalize()
+
+            missing = [direction for direction in DIRECTIONS if direction not in queues]
+            if missing:
+                raise ValueError(f"Missing video(s): {', '.join(missing)}")
+            if not self.session_id:
+                raise ValueError("Missing session_id")
+
+            await asyncio.gather(*self._writers)
+        except BaseException:
+            for writer in self._writers:
+                writer.cancel()
+            raise
+
+    async def _handle_file_event(self, kind: str, direction: str, payload, queues: Dict[str, asyncio.Queue]):
+        if kind == "begin":
+            if self.upload_dir is None:
+                # session_id may arrive after the files; fall back to a unique directory
+                name = self.session_id or f"incoming-{uuid.uuid4().hex}"
+                self.upload_dir = self.upload_root / name
+                await asyncio.to_thread(self.upload_dir.mkdir, parents=True, exist_ok=True)
+            file_path = self.upload_dir / f"{direction}.mp4"
+            self.video_paths[direction] = str(file_path)
+            queues[direction] = asyncio.Queue(maxsize=self._queue_chunks)
+            self._writers.append(asyncio.create_task(self._write_file(direction, file_path, queues[direction])))
+        elif kind == "data":
+            self.bytes_received[direction] += len(payload)
+            await queues[direction].put(payload)  # backpressure once the writer falls behind
+        else:
+            await queues[direction].put(None)
+
+    async def _write_file(self, direction: str, file_path: Path, queue: asyncio.Queue):
+        buffer = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                await asyncio.to_thread(buffer.write, chunk)
+        finally:
+            await asyncio.to_thread(buffer.close)
+        self.ready[direction].set()
+        logger.info("✅ Saved %s video: %s", direction, file_path)
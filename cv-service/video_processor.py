@@ -1,29 +1,36 @@
 import cv2
 import numpy as np
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import base64
+import time
 from signal_logic import SignalLogic
-import torch
-
-# Patch torch.load to allow YOLOv8 weights loading in PyTorch 2.6+
-_original_torch_load = torch.load
-def _patched_torch_load(f, map_location=None, pickle_module=None, *, weights_only=None, **kwargs):
-    # Set weights_only=False for YOLOv8 model files (trusted source)
-    if weights_only is None:
-        weights_only = False
-    return _original_torch_load(f, map_location=map_location, pickle_module=pickle_module, weights_only=weights_only, **kwargs)
-torch.load = _patched_torch_load
-
-from ultralytics import YOLO
+from detections import Detections
+from detector_backends import create_backend
+from detection_cache import CacheEntry, DetectionCache, model_identity
 import asyncio
-import requests
+from collections import defaultdict, deque
+from backend_client import BackendClient
+from executor import StageExecutor
+from frame_pool import MB, FramePool, MemoryBudget, MemoryLimitExceeded, process_peak_rss_mb
+from frame_reader import FrameItem, FrameReader
+from inference_scheduler import InferenceScheduler
+from journal import journal_sink
+from tracker import VehicleTracker
+from roi import RoiRegistry
+from tiling import InferenceRegions
+from emergency_lights import EmergencyLightDetector, detect_lights_full_frame
+import log_config
+import metrics
+
+logger = log_config.get_logger("video_processor")
 
 class VideoProcessor:
     def __init__(self):
-        # Load YOLOv8 model
-        model_path = os.getenv("MODEL_PATH", "yolov8n.pt")
-        self.model = YOLO(model_path)
+        log_config.configure()
+        
+        # Load YOLOv8 model on the configured backend (DETECTOR_BACKEND: torch, onnx or openvino)
+        self.detector = create_backend()
         
         # Detection classes with detailed vehicle types
         self.target_classes = {
@@ -35,6 +42,8 @@ class VideoProcessor:
             7: 'Truck',
         }
         
+        self.target_class_ids = np.array(list(self.target_classes), np.int32)
+        
         # Vehicle type categories
         self.vehicle_types = {
             'Car': [2],
@@ -43,64 +52,88 @@ class VideoProcessor:
             'Bike': [1, 3],  # Bicycle and Motorcycle
         }
         
+        # ROI geometry per camera (direction), cached per resolution
+        self.rois = RoiRegistry.from_env()
+        # What the detector sees: the whole frame, or (INFERENCE_REGION=roi) each ROI's
+        # bounding rectangle, optionally tiled, with boxes mapped back to the full frame
+        self.inference_regions = InferenceRegions.from_env()
+        
         self.confidence_threshold = float(os.getenv("CONFIDENCE_THRESHOLD", 0.4))  # Lowered for speed
         self.backend_url = os.getenv("BACKEND_URL", "http://localhost:5000")
+        # json: base64 frames inside the JSON update (original format)
+        # binary: length-prefixed body with raw JPEGs, unchanged frames skipped
+        self.transport_mode = os.getenv("TRANSPORT_MODE", "json").lower()
+        # Alerts and completions are retried for this long while the backend is down, then dropped
+        self.backend_delivery_timeout = float(os.getenv("BACKEND_DELIVERY_TIMEOUT", 60))
+        self.backend = BackendClient(self.backend_url, transport=self.transport_mode,
+                                     max_delivery_time=self.backend_delivery_timeout)
+        
+        # Inference budget in inferred frames per second of video, summed over all directions,
+        # shared out by InferenceScheduler. Defaults to the old fixed rule (every 3rd frame of
+        # four 30 fps feeds); readers only fully decode the frames that will be inferred
+        self.inference_interval = int(os.getenv("INFERENCE_INTERVAL", 3))
+        self.inference_budget_fps = float(os.getenv("INFERENCE_FPS_BUDGET", 4 * 30 / self.inference_interval))
+        self.inference_min_fps = float(os.getenv("INFERENCE_MIN_FPS", 2))
+        # Kept short so scheduling changes (e.g. a suspected ambulance) take effect quickly
+        self.reader_buffer_size = int(os.getenv("READER_BUFFER_SIZE", 4))
+        # Live sources (RTSP, HTTP-MJPEG, pipes): a short drop-oldest buffer keeps latency bounded,
+        # and a stalled camera only holds a tick up for LIVE_FRAME_TIMEOUT seconds
+        self.live_buffer_size = int(os.getenv("LIVE_BUFFER_SIZE", 2))
+        self.live_frame_timeout = float(os.getenv("LIVE_FRAME_TIMEOUT", 1.0))
+        # Play uploaded files at their own frame rate instead of as fast as possible
+        self.pace_to_source = os.getenv("PACE_TO_SOURCE", "false").lower() == "true"
+        # Frames per second of video sampled for the flashing-light check (independent of the
+        # inference rate, which can drop to INFERENCE_MIN_FPS and would alias a 1-4 Hz flash)
+        self.light_sample_fps = float(os.getenv("LIGHT_SAMPLE_FPS", 8))
+        # Hard ceiling on a session's decoded-frame buffers, split evenly over its directions
+        # (readers decode into pooled buffers and prefetch less when the share is tight; 0: no limit)
+        self.session_memory_limit_mb = float(os.getenv("SESSION_MEMORY_LIMIT_MB", 256))
+        
+        # Annotated frames are drawn and JPEG-encoded only as often as the backend asks
+        # (render_fps in its update responses, 0 when no dashboard is open), capped here.
+        # RENDER_MODE=always renders every inferred frame, as before
+        self.render_mode = os.getenv("RENDER_MODE", "auto").lower()
+        self.render_max_fps = float(os.getenv("RENDER_MAX_FPS", 15))
+        
+        # Detections of uploaded files are cached on disk by video content, model and settings,
+        # so a re-uploaded clip skips YOLO (DETECTION_CACHE_DIR, empty to disable)
+        self.detection_cache = DetectionCache.from_env()
+        self._model_id = None
+        
+        # Run the four directions of a tick through YOLO as one batch
+        self.batch_inference = os.getenv("BATCH_INFERENCE", "true").lower() == "true"
         
-        # Initialize signal logic
-        self.signal_logic = SignalLogic()
+        # Thread/process pool for the CPU-heavy stages, created on first use
+        # so that process-pool workers (which build their own VideoProcessor) never nest pools
+        self._executor = None
+        self.measured_fps = None  # Inferred frames/s, set by warmup()
         
         # Simulation mode for testing ambulance detection
         self.simulate_ambulance_every_n_frames = int(os.getenv("AMBULANCE_SIMULATION_FRAMES", 300))  # Every 300 frames (10 sec)
         self.ambulance_simulation_enabled = os.getenv("SIMULATE_AMBULANCE", "false").lower() == "true"
         
-        print("✅ YOLO model loaded successfully")
+        logger.info("✅ YOLO model loaded successfully (%s backend)", self.detector.name)
         if self.ambulance_simulation_enabled:
-            print(f"🚑 Ambulance simulation mode ENABLED (every {self.simulate_ambulance_every_n_frames} frames)")
+            logger.info("🚑 Ambulance simulation mode ENABLED (every %s frames)", self.simulate_ambulance_every_n_frames)
+    
+    @property
+    def executor(self) -> StageExecutor:
+        if self._executor is None:
+            self._executor = StageExecutor(self)
+        return self._executor
+    
+    def shutdown(self):
+        """Release the stage executor pools"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
     
     def get_roi_polygon(self, frame_width: int, frame_height: int, direction: str) -> np.ndarray:
         """
-        Define ROI polygon for each direction in a 4-way intersection video
-        Divides the frame into 4 quadrants: north (bottom), south (top), east (left), west (right)
-        Returns polygon coordinates
-        """
-        mid_x = frame_width // 2
-        mid_y = frame_height // 2
-        margin = 50  # Margin from center for clearer separation
-        
-        if direction == "north":
-            # Bottom half of frame (vehicles approaching from bottom)
-            roi = np.array([
-                [int(frame_width * 0.15), mid_y + margin],
-                [int(frame_width * 0.85), mid_y + margin],
-                [int(frame_width * 0.85), int(frame_height * 0.95)],
-                [int(frame_width * 0.15), int(frame_height * 0.95)],
-            ], np.int32)
-        elif direction == "south":
-            # Top half of frame (vehicles approaching from top)
-            roi = np.array([
-                [int(frame_width * 0.15), int(frame_height * 0.05)],
-                [int(frame_width * 0.85), int(frame_height * 0.05)],
-                [int(frame_width * 0.85), mid_y - margin],
-                [int(frame_width * 0.15), mid_y - margin],
-            ], np.int32)
-        elif direction == "east":
-            # Left half of frame (vehicles approaching from left)
-            roi = np.array([
-                [int(frame_width * 0.05), int(frame_height * 0.15)],
-                [mid_x - margin, int(frame_height * 0.15)],
-                [mid_x - margin, int(frame_height * 0.85)],
-                [int(frame_width * 0.05), int(frame_height * 0.85)],
-            ], np.int32)
-        else:  # west
-            # Right half of frame (vehicles approaching from right)
-            roi = np.array([
-                [mid_x + margin, int(frame_height * 0.15)],
-                [int(frame_width * 0.95), int(frame_height * 0.15)],
-                [int(frame_width * 0.95), int(frame_height * 0.85)],
-                [mid_x + margin, int(frame_height * 0.85)],
-            ], np.int32)
-        
-        return roi
+        ROI polygon of a direction's camera at this resolution
+        (configured via ROI_CONFIG_PATH, default quadrant otherwise; cached, read-only)
+        """
+        return self.rois.polygon(direction, frame_width, frame_height)
     
     def is_point_in_roi(self, point: Tuple[int, int], roi: np.ndarray) -> bool:
         """Check if point is inside ROI polygon"""
@@ -108,77 +141,117 @@ class VideoProcessor:
     
     def detect_ambulance_lights(self, frame: np.ndarray) -> bool:
         """
-        Detect red/blue flashing lights indicating ambulance
+        Detect red/blue lights indicating ambulance in a single frame
+        (bright red or blue over 2% of the frame; process_videos uses the
+        temporal EmergencyLightDetector instead)
         Returns True if ambulance lights detected
         """
-        # Convert to HSV for better color detection
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Red color range for emergency lights (high saturation and value)
-        lower_red1 = np.array([0, 120, 120])  # High saturation/value for bright lights
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([170, 120, 120])
-        upper_red2 = np.array([180, 255, 255])
-        
-        # Blue color range for emergency lights (high saturation and value)
-        lower_blue = np.array([100, 120, 120])  # High saturation/value for bright lights
-        upper_blue = np.array([130, 255, 255])
-        
-        # Create masks
-        mask_red1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask_red2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        mask_red = cv2.bitwise_or(mask_red1, mask_red2)
-        mask_blue = cv2.inRange(hsv, lower_blue, upper_blue)
-        
-        # Count red and blue pixels
-        red_pixels = cv2.countNonZero(mask_red)
-        blue_pixels = cv2.countNonZero(mask_blue)
+        return detect_lights_full_frame(frame)
+    
+    def detect(self, frames: List[Tuple[str, np.ndarray]]) -> List[Detections]:
+        """
+        Run YOLO over (direction, frame) pairs in one go, on the whole frames or on
+        the ROI crops/tiles INFERENCE_REGION selects
+        Returns detections in full-frame pixels, in input order
+        """
+        return self.inference_regions.predict(
+            self.detector,
+            [(frame, self.get_roi_polygon(frame.shape[1], frame.shape[0], direction)) for direction, frame in frames],
+            self.confidence_threshold,
+        )
+    
+    def infer(self, frame: np.ndarray, direction: str = None) -> Detections:
+        """Run YOLO once on a single frame (on its direction's ROI region, if given)"""
+        if direction is None:
+            return self.detector.predict([frame], self.confidence_threshold)[0]
+        return self.detect([(direction, frame)])[0]
+    
+    def infer_batch(self, frames: Dict[str, np.ndarray]) -> Dict[str, Detections]:
+        """
+        Run YOLO once over the frames of all directions for a tick
+        Returns the per-direction detections, keyed like the input
+        """
+        if not frames:
+            return {}
         
-        # Higher threshold to reduce false positives: 2% of frame
-        total_pixels = frame.shape[0] * frame.shape[1]
-        red_ratio = red_pixels / total_pixels
-        blue_ratio = blue_pixels / total_pixels
+        directions = list(frames.keys())
+        return dict(zip(directions, self.detect([(direction, frames[direction]) for direction in directions])))
+    
+    def warmup(self, passes: int = None):
+        """
+        Run the detector and encoder on blank frames so the first real tick does not
+        pay for lazy initialisation (predictor setup, kernel selection, memory arenas)
+        WARMUP_RESOLUTION (default 1280x720) should match the camera feeds
+        Records measured_fps, the inferred frames per second of the warm pass
+        WARMUP_PASSES=0 skips warmup (measured_fps stays None, so the session cap defaults)
+        """
+        if passes is None:
+            passes = int(os.getenv("WARMUP_PASSES", 2))
+        if passes <= 0:
+            return
+        width, height = (int(side) for side in os.getenv("WARMUP_RESOLUTION", "1280x720").lower().split("x"))
+        frame = np.full((height, width, 3), 114, np.uint8)
+        for _ in range(passes):
+            started = time.perf_counter()
+            if self.batch_inference:
+                self.infer_batch({direction: frame for direction in ("north", "south", "east", "west")})
+                frames = 4
+            else:
+                self.infer(frame, "north")
+                frames = 1
+        self.frame_to_jpeg(frame)
+        # Throughput of the last (warm) pass, used to size the session cap
+        self.measured_fps = frames / (time.perf_counter() - started)
+    
+    def detect_red_vehicles(self, frame: np.ndarray, detections: Detections) -> np.ndarray:
+        """
+        Look for predominantly red cars/buses/trucks (potential ambulance)
+        Returns the red ratio of each detection where it is above 25%, else 0
+        """
+        red_ratios = np.zeros(len(detections), np.float32)
+        lower_red = np.array([0, 100, 100])
+        upper_red = np.array([10, 255, 255])
         
-        # Only detect if significant bright red or blue lights present
-        if red_ratio > 0.02 or blue_ratio > 0.02:
-            return True
+        vehicle_indices = np.flatnonzero(np.isin(detections.classes, [2, 5, 7]))  # Car, Bus, Truck
+        for i in vehicle_indices:
+            x1, y1, x2, y2 = detections.boxes[i].astype(np.int32)
+            vehicle_crop = frame[max(y1, 0):y2, max(x1, 0):x2]
+            if vehicle_crop.size > 0:
+                # Check if vehicle is predominantly red
+                hsv_crop = cv2.cvtColor(vehicle_crop, cv2.COLOR_BGR2HSV)
+                mask = cv2.inRange(hsv_crop, lower_red, upper_red)
+                red_ratio = cv2.countNonZero(mask) / (vehicle_crop.shape[0] * vehicle_crop.shape[1])
+                if red_ratio > 0.25:  # 25% red - higher threshold
+                    red_ratios[i] = red_ratio
         
-        return False
+        return red_ratios
     
-    def detect_and_count(self, frame: np.ndarray, direction: str) -> Tuple[int, int, np.ndarray, Dict[str, int], bool]:
+    def count_in_roi(self, detections: Detections, direction: str, width: int, height: int) -> Tuple[int, int, Dict[str, int], np.ndarray]:
         """
-        Detect objects in frame and count those inside ROI
-        Returns: (vehicle_count, pedestrian_count, annotated_frame, vehicle_breakdown, ambulance_detected)
+        Count target-class detections whose box center lies inside the direction's ROI
+        All centers are tested at once against the cached ROI mask
+        Returns: (vehicle_count, pedestrian_count, vehicle_breakdown, in_roi_mask)
         """
-        height, width = frame.shape[:2]
-        roi = self.get_roi_polygon(width, height, direction)
+        # Only process target classes
+        in_roi = np.isin(detections.classes, self.target_class_ids)
+        in_roi &= self.rois.contains(direction, width, height, detections.centers())
         
-        # Check for ambulance lights first
-        ambulance_detected = self.detect_ambulance_lights(frame)
+        roi_classes = detections.classes[in_roi]
+        pedestrian_count = int(np.count_nonzero(roi_classes == 0))  # Person
+        vehicle_count = len(roi_classes) - pedestrian_count
         
-        # Also check if any bright red/white vehicles detected (potential ambulance)
-        # Look for vehicles with predominantly red color
-        ambulance_confidence = 0
-        for result in self.model(frame, conf=self.confidence_threshold, verbose=False):
-            for box in result.boxes:
-                cls = int(box.cls[0])
-                if cls in [2, 5, 7]:  # Car, Bus, Truck
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    vehicle_crop = frame[int(y1):int(y2), int(x1):int(x2)]
-                    if vehicle_crop.size > 0:
-                        # Check if vehicle is predominantly red
-                        hsv_crop = cv2.cvtColor(vehicle_crop, cv2.COLOR_BGR2HSV)
-                        lower_red = np.array([0, 100, 100])
-                        upper_red = np.array([10, 255, 255])
-                        mask = cv2.inRange(hsv_crop, lower_red, upper_red)
-                        red_ratio = cv2.countNonZero(mask) / (vehicle_crop.shape[0] * vehicle_crop.shape[1])
-                        if red_ratio > 0.25:  # 25% red - higher threshold
-                            ambulance_confidence = max(ambulance_confidence, red_ratio)
-                            ambulance_detected = True
-        
-        # Only print if high confidence detection
-        if ambulance_detected and ambulance_confidence > 0:
-            print(f"🚑 AMBULANCE detected (confidence: {ambulance_confidence:.1%})")
+        # Vehicle type breakdown
+        vehicle_breakdown = {
+            v_type: int(np.count_nonzero(np.isin(roi_classes, class_ids)))
+            for v_type, class_ids in self.vehicle_types.items()
+        }
+        
+        return vehicle_count, pedestrian_count, vehicle_breakdown, in_roi
+    
+    def annotate(self, frame: np.ndarray, roi: np.ndarray, detections: Detections, vehicle_count: int,
+                 pedestrian_count: int, ambulance_detected: bool) -> np.ndarray:
+        """Draw ROI, ambulance banner, counted boxes and count overlay onto frame (in place)"""
+        width = frame.shape[1]
         
         # Draw ROI on frame
         cv2.polylines(frame, [roi], True, (255, 0, 255), 2)
@@ -195,71 +268,19 @@ class VideoProcessor:
                        cv2.FONT_HERSHEY_SIMPLEX, 
                        1.2, (255, 255, 255), 3)
         
-        # Run YOLO detection with optimizations
-        results = self.model(frame, conf=self.confidence_threshold, verbose=False, 
-                            imgsz=480, half=False)  # Smaller image size for speed
-        
-        vehicle_count = 0
-        pedestrian_count = 0
-        # DON'T reset ambulance_detected here - it was already set by detect_ambulance_lights() and red vehicle check above!
-        # ambulance_detected is already initialized before YOLO loop
-        
-        # Vehicle type breakdown
-        vehicle_breakdown = {
-            'Car': 0,
-            'Bus': 0,
-            'Truck': 0,
-            'Bike': 0
-        }
-        
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                # Get class and confidence
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                
-                # Only process target classes
-                if cls not in self.target_classes:
-                    continue
-                                # FOR TESTING: Treat buses as ambulances (can be toggled via .env)
-                if cls == 5 and os.getenv("TREAT_BUS_AS_AMBULANCE", "true").lower() == "true":
-                    ambulance_detected = True
-                    print(f"🚑 BUS DETECTED - Treating as ambulance for testing!")
-                                # Get bounding box
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                
-                # Check if center is in ROI
-                if not self.is_point_in_roi((center_x, center_y), roi):
-                    continue
-                
-                # Count vehicles inside ROI
-                class_name = self.target_classes[cls]
-                
-                if cls == 0:  # Person
-                    pedestrian_count += 1
-                    color = (0, 255, 255)  # Yellow for pedestrians
-                else:
-                    vehicle_count += 1
-                    color = (0, 255, 0)  # Green for vehicles
-                    
-                    # Track vehicle type
-                    for v_type, class_ids in self.vehicle_types.items():
-                        if cls in class_ids:
-                            vehicle_breakdown[v_type] += 1
-                            break
-                
-                # Draw bounding box
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                
-                # Draw label
-                label = f"{class_name} {conf:.2f}"
-                cv2.putText(frame, label, 
-                          (int(x1), int(y1) - 10),
-                          cv2.FONT_HERSHEY_SIMPLEX, 
-                          0.5, color, 2)
+        for (x1, y1, x2, y2), cls, conf in zip(detections.boxes.astype(np.int32), detections.classes,
+                                                detections.confidences):
+            color = (0, 255, 255) if cls == 0 else (0, 255, 0)  # Yellow for pedestrians, green for vehicles
+            
+            # Draw bounding box
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+            
+            # Draw label
+            label = f"{self.target_classes[int(cls)]} {conf:.2f}"
+            cv2.putText(frame, label, 
+                      (int(x1), int(y1) - 10),
+                      cv2.FONT_HERSHEY_SIMPLEX, 
+                      0.5, color, 2)
         
         # Add count overlay
         cv2.putText(frame, f"Vehicles: {vehicle_count}", 
@@ -269,32 +290,325 @@ class VideoProcessor:
                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
                    0.8, (0, 255, 255), 2)
         
-        return vehicle_count, pedestrian_count, frame, vehicle_breakdown, ambulance_detected
+        return frame
+    
+    def analyze_frame(self, frame: np.ndarray, direction: str, detections: Detections = None,
+                      lights_detected: bool = None, render: bool = True) -> Dict:
+        """
+        Detect objects in frame and count those inside ROI
+        A single detection pass feeds the red-vehicle check, ROI counting,
+        the bus-as-ambulance rule and the overlay.
+        If detections are given (from infer_batch), YOLO is not run again;
+        if lights_detected is given (from an EmergencyLightDetector), the
+        single-frame light check is skipped; render=False skips the overlay
+        (annotated_frame is None, frame is left untouched)
+        Returns a dict with vehicle_count, pedestrian_count, vehicle_breakdown,
+        ambulance_detected, lights_detected, annotated_frame, plus the target-class
+        detections and their per-box ambulance_flags for the tracker, the counted
+        boxes as plain data under "overlay" (what annotate() would draw), and the
+        seconds spent per stage under "timings"
+        """
+        height, width = frame.shape[:2]
+        roi = self.get_roi_polygon(width, height, direction)
+        timings = {}
+        
+        if detections is None:
+            started = time.perf_counter()
+            detections = self.infer(frame, direction)
+            timings["inference"] = time.perf_counter() - started
+        detections = detections.select(np.isin(detections.classes, self.target_class_ids))
+        
+        # Check for ambulance lights first
+        if lights_detected is None:
+            lights_detected = self.detect_ambulance_lights(frame)
+        
+        # Also check if any bright red/white vehicles detected (potential ambulance)
+        red_ratios = self.detect_red_vehicles(frame, detections)
+        ambulance_flags = red_ratios > 0
+        if ambulance_flags.any():
+            logger.debug("🚑 AMBULANCE detected (confidence: %.1f%%)", red_ratios.max() * 100)
+        
+        # FOR TESTING: Treat buses as ambulances (can be toggled via .env)
+        buses = detections.classes == 5
+        if buses.any() and os.getenv("TREAT_BUS_AS_AMBULANCE", "true").lower() == "true":
+            ambulance_flags |= buses
+            logger.debug("🚑 BUS DETECTED - Treating as ambulance for testing!")
+        
+        ambulance_detected = lights_detected or bool(ambulance_flags.any())
+        
+        started = time.perf_counter()
+        vehicle_count, pedestrian_count, vehicle_breakdown, in_roi = self.count_in_roi(detections, direction, width, height)
+        timings["roi"] = time.perf_counter() - started
+        
+        counted = detections.select(in_roi)
+        annotated_frame = None
+        if render:
+            started = time.perf_counter()
+            annotated_frame = self.annotate(frame, roi, counted, vehicle_count, pedestrian_count, ambulance_detected)
+            timings["annotate"] = time.perf_counter() - started
+        
+        return {
+            "vehicle_count": vehicle_count,
+            "pedestrian_count": pedestrian_count,
+            "vehicle_breakdown": vehicle_breakdown,
+            "ambulance_detected": ambulance_detected,
+            "lights_detected": lights_detected,
+            "annotated_frame": annotated_frame,
+            "overlay": self.overlay_data(counted, roi, width, height, ambulance_detected),
+            "detections": detections,
+            "ambulance_flags": ambulance_flags,
+            "shape": (height, width),
+            "timings": timings,
+        }
+    
+    def overlay_data(self, detections: Detections, roi: np.ndarray, width: int, height: int,
+                     ambulance_detected: bool) -> Dict:
+        """Counted boxes, their class ids and the ROI in pixels, for clients that draw the overlay"""
+        return {
+            "width": width,
+            "height": height,
+            "roi": roi.tolist(),
+            "boxes": detections.boxes.astype(np.int32).tolist(),
+            "classes": detections.classes.tolist(),
+            "ambulance": ambulance_detected,
+        }
+    
+    def detect_and_count(self, frame: np.ndarray, direction: str, detections: Detections = None) -> Tuple[int, int, np.ndarray, Dict[str, int], bool]:
+        """
+        Detect objects in frame and count those inside ROI
+        Returns: (vehicle_count, pedestrian_count, annotated_frame, vehicle_breakdown, ambulance_detected)
+        """
+        analysis = self.analyze_frame(frame, direction, detections)
+        return (analysis["vehicle_count"], analysis["pedestrian_count"], analysis["annotated_frame"],
+                analysis["vehicle_breakdown"], analysis["ambulance_detected"])
+    
+    def count_tracked(self, tracker: VehicleTracker, frame_index: int, direction: str,
+                      frame_shape: Tuple[int, int]) -> Tuple[int, int, Dict[str, int]]:
+        """
+        Count the tracker's objects (moved to frame_index) inside the ROI and
+        update its unique-vehicle count
+        Returns: (vehicle_count, pedestrian_count, vehicle_breakdown)
+        """
+        boxes, classes, track_ids = tracker.predict(frame_index)
+        tracked = Detections(boxes, classes, np.ones(len(classes), np.float32))
+        vehicle_count, pedestrian_count, vehicle_breakdown, in_roi = self.count_in_roi(
+            tracked, direction, frame_shape[1], frame_shape[0]
+        )
+        tracker.count_unique(track_ids, in_roi)
+        return vehicle_count, pedestrian_count, vehicle_breakdown
+    
+    def frame_to_jpeg(self, frame: np.ndarray) -> bytes:
+        """Encode frame as JPEG bytes"""
+        _, buffer = cv2.imencode('.jpg', frame)
+        return buffer.tobytes()
     
     def frame_to_base64(self, frame: np.ndarray) -> str:
         """Convert frame to base64 string"""
-        _, buffer = cv2.imencode('.jpg', frame)
-        return base64.b64encode(buffer).decode('utf-8')
+        return base64.b64encode(self.frame_to_jpeg(frame)).decode('utf-8')
+    
+    def analyze_tick(self, frames: Dict[str, np.ndarray], lights: Dict[str, bool] = None,
+                     render: Set[str] = None, detections: Dict[str, Detections] = None) -> Dict[str, Dict]:
+        """
+        CPU stage of an inference tick: detect, count, annotate and encode every direction
+        Runs inside the StageExecutor pool, never on the event loop
+        Rendered frames are drawn on in place: pass buffers the caller is done with
+        lights holds the temporal light-detector state per direction, if already known
+        render names the directions to annotate and encode (default all)
+        detections holds directions already detected (detection cache hits); YOLO runs on the rest
+        Returns per direction the analyze_frame() dict, with the annotated frame
+        replaced by its JPEG bytes under "frame" (None when not rendered), and the
+        raw detector output under "inferred" where YOLO ran
+        (a batched inference's time is split evenly over the frames of the batch)
+        """
+        detections = dict(detections or {})
+        to_run = {direction: frame for direction, frame in frames.items() if direction not in detections}
+        inferred = {}
+        inference_seconds = {}
+        if to_run and self.batch_inference:
+            started = time.perf_counter()
+            inferred = self.infer_batch(to_run)
+            inference_seconds = dict.fromkeys(inferred, (time.perf_counter() - started) / len(to_run))
+        else:
+            for direction, frame in to_run.items():
+                started = time.perf_counter()
+                inferred[direction] = self.infer(frame, direction)
+                inference_seconds[direction] = time.perf_counter() - started
+        detections.update(inferred)
+        lights = lights or {}
+        render = set(frames) if render is None else render
+        
+        tick_results = {}
+        for direction, frame in frames.items():
+            analysis = self.analyze_frame(frame, direction, detections[direction], lights.get(direction),
+                                          direction in render)
+            annotated = analysis.pop("annotated_frame")
+            analysis["frame"] = None
+            if annotated is not None:
+                started = time.perf_counter()
+                analysis["frame"] = self.frame_to_jpeg(annotated)
+                analysis["timings"]["encode"] = time.perf_counter() - started
+            if direction in inferred:
+                analysis["inferred"] = inferred[direction]
+                analysis["timings"]["inference"] = inference_seconds[direction]
+            tick_results[direction] = analysis
+        return tick_results
+    
+    @property
+    def model_id(self) -> str:
+        """Identity of the loaded model for cache keys (backend and weights hash)"""
+        if self._model_id is None:
+            self._model_id = model_identity(self.detector)
+        return self._model_id
+    
+    async def flush_cache_entry(self, entry: CacheEntry):
+        """Write an entry's pending detections in the stage executor (disk I/O stays off the event loop)"""
+        try:
+            await self.executor.run(entry.flush)
+        except (OSError, RuntimeError) as e:
+            logger.warning("⚠️ Could not write detection cache: %s", e)
+    
+    def open_cache_entry(self, video_path: str) -> CacheEntry:
+        """The detection cache entry of an uploaded file for the current model settings (hashes the file)"""
+        return self.detection_cache.open(video_path, self.model_id, self.detector.imgsz, self.confidence_threshold,
+                                         self.inference_regions.key)
+    
+    def render_fps(self, session_id: str) -> Optional[float]:
+        """
+        Annotated frames per second (per direction) to render for a session:
+        None renders every inferred frame (RENDER_MODE=always, or the backend has
+        not asked for a rate), 0 renders none (no viewers)
+        """
+        if self.render_mode == "always":
+            return None
+        requested = self.backend.render_fps.get(session_id)
+        return None if requested is None else min(requested, self.render_max_fps)
+    
+    def sample_lights(self, detectors: Dict[str, EmergencyLightDetector], frames: Dict[str, np.ndarray],
+                      timestamps: Dict[str, float]) -> Dict[str, bool]:
+        """
+        Feed this tick's decoded frames to each direction's flashing-light detector
+        (created on a direction's first frame, for its ROI at that resolution)
+        Returns per direction whether flashing lights are confirmed
+        """
+        lights = {}
+        for direction, frame in frames.items():
+            detector = detectors.get(direction)
+            if detector is None:
+                height, width = frame.shape[:2]
+                detector = EmergencyLightDetector(self.get_roi_polygon(width, height, direction))
+                detectors[direction] = detector
+            lights[direction] = detector.update(frame, timestamps[direction])
+        return lights
     
-    async def process_videos(self, session_id: str, video_paths: Dict[str, str]):
+    def read_tick(self, readers: Dict[str, FrameReader], timeout: float = None) -> Dict[str, FrameItem]:
+        """
+        Take the next FrameItem from every direction's reader
+        frame is None where the reader skipped decoding; ended directions (and, with a
+        timeout, directions with no frame in time) are left out
+        """
+        items = {}
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for direction, reader in readers.items():
+            wait = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            item = reader.get(wait)
+            if item is not None:
+                items[direction] = item
+        return items
+    
+    async def open_ready_readers(self, video_paths: Dict[str, str], pending: Dict[str, Optional[asyncio.Event]],
+                                 readers: Dict[str, FrameReader], scheduler: InferenceScheduler,
+                                 live: bool = False, session_id: str = "",
+                                 caches: Dict[str, CacheEntry] = None, budget: MemoryBudget = None) -> bool:
+        """
+        Open and start readers for pending directions whose video is complete on disk
+        (event is None or set). Waits for the first one if nothing is open yet.
+        live: the paths are stream URLs (RTSP, HTTP-MJPEG) or pipes, not files
+        caches, if given, receives each file's detection cache entry
+        budget, if given, bounds the readers' frame buffers (an even share per direction)
+        Returns False if a video cannot be opened
+        Raises MemoryLimitExceeded if a direction's frames cannot fit its share of the budget
+        """
+        if not readers:
+            waiters = [asyncio.create_task(event.wait()) for event in pending.values() if event is not None]
+            if waiters and len(waiters) == len(pending):
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+        
+        for direction, event in list(pending.items()):
+            if event is not None and not event.is_set():
+                continue
+            cap = await self.executor.run(cv2.VideoCapture, video_paths[direction])
+            if not cap.isOpened():
+                logger.error("❌ Failed to open %s video", direction)
+                return False
+            if live:
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Honoured by some backends; the reader drops the rest
+            buffer_size = self.live_buffer_size if live else self.reader_buffer_size
+            # Queued frames, one being decoded and one in the current tick. The share is of every
+            # direction of the session (opened or still uploading), not of the paths known so far
+            share = budget.share(len(pending) + len(readers)) if budget else 0
+            pool = FramePool(buffer_size + 2, budget, share)
+            reader = FrameReader(cap, direction, scheduler.policy(direction), buffer_size=buffer_size,
+                                 live=live, pace=self.pace_to_source, source=video_paths[direction],
+                                 decode_metric=metrics.STAGE_SECONDS.labels(session_id, direction, "decode"), pool=pool)
+            if reader.frame_shape is not None:
+                try:
+                    pool.prepare(reader.frame_shape)
+                except MemoryLimitExceeded:
+                    cap.release()
+                    raise
+                if pool.capacity < pool.requested_capacity:
+                    logger.warning("⚠️ %s frames only fit %d buffers under SESSION_MEMORY_LIMIT_MB (prefetch reduced)",
+                                   direction, pool.capacity)
+            if caches is not None and self.detection_cache is not None and not live:
+                caches[direction] = await self.executor.run(self.open_cache_entry, video_paths[direction])
+            scheduler.add_direction(direction, reader.source_fps)
+            readers[direction] = reader.start()
+            del pending[direction]
+            logger.info("✅ Opened %s %s", direction, "stream" if live else "video")
+        return True
+    
+    async def process_videos(self, session_id: str, video_paths: Dict[str, str], ready: Dict[str, asyncio.Event] = None,
+                             signal_logic: SignalLogic = None, stats: Dict = None, live: bool = False):
         """
         Main processing loop for all 4 videos
+        ready (streaming upload) holds one event per direction, set once that file is
+        complete; each direction joins the loop as soon as its event fires
+        live: video_paths are camera streams (RTSP, HTTP-MJPEG, pipes) paced by the source;
+        frames the pipeline cannot keep up with are dropped, oldest first
+        signal_logic is this session's own signal state (a fresh one if not given);
+        stats, if given, is kept up to date with the session's progress, including the
+        capture-to-decision latency of inferred frames
+        Captures and reader threads are released however the loop ends (including cancellation)
+        Decoded frames live in pooled buffers bounded by SESSION_MEMORY_LIMIT_MB; stats["memory"]
+        reports their current and peak size
         """
+        signal_logic = signal_logic or SignalLogic(journal=journal_sink(session_id))
+        stats = stats if stats is not None else {}
+        stats.update(ticks=0, frames_inferred=0, frames_rendered=0, detection_cache_hits=0, unique_vehicles=0,
+                     frames_dropped=0, error=None, capture_to_decision_ms=None, memory=None)
+        latencies = deque(maxlen=300)  # Seconds from capture to signal decision, recent inferred frames
+        readers = {}
+        caches = {}  # Detection cache entry per direction (uploaded files only)
+        budget = MemoryBudget(int(self.session_memory_limit_mb * MB),
+                              metrics.FRAME_BUFFER_BYTES.labels(session_id),
+                              metrics.FRAME_BUFFER_PEAK_BYTES.labels(session_id))
         try:
-            print(f"🎬 Starting video processing for session: {session_id}")
+            logger.info("🎬 Starting video processing for session: %s", session_id)
             
-            # Open all video captures
-            captures = {}
-            for direction, path in video_paths.items():
-                cap = cv2.VideoCapture(path)
-                if not cap.isOpened():
-                    print(f"❌ Failed to open {direction} video")
-                    return
-                captures[direction] = cap
-                print(f"✅ Opened {direction} video")
+            # Open video readers (directions still uploading are opened later)
+            scheduler = InferenceScheduler(self.inference_budget_fps, self.inference_min_fps,
+                                           light_sample_fps=self.light_sample_fps)
+            pending = dict(ready) if ready else {direction: None for direction in video_paths}
+            if not await self.open_ready_readers(video_paths, pending, readers, scheduler, live, session_id, caches,
+                                                 budget):
+                stats["error"] = "Failed to open video"
+                return
             
             frame_count = 0
-            last_frames = {}  # Store last processed frames
+            last_frames = {}  # Store last processed frames as (seq, jpeg_bytes)
+            frame_seq = 0  # Bumped whenever a direction gets a new frame
             last_counts = {"north": 0, "south": 0, "east": 0, "west": 0}
             last_ped_counts = {"north": 0, "south": 0, "east": 0, "west": 0}
             last_breakdown = {
@@ -304,166 +618,266 @@ class VideoProcessor:
                 "west": {"Car": 0, "Bus": 0, "Truck": 0, "Bike": 0}
             }
             ambulance_directions = set()  # Track which directions have ambulances
-            last_ambulance_detected = {"north": False, "south": False, "east": False, "west": False}
+            last_lights_detected = {"north": False, "south": False, "east": False, "west": False}
+            light_detectors = {}  # Flashing-light state per direction
+            
+            # Tracks carry boxes, IDs and ambulance state across the frames YOLO skips
+            trackers = defaultdict(VehicleTracker)
+            frame_shapes = {}
+            unique_counts = {"north": 0, "south": 0, "east": 0, "west": 0}  # Distinct vehicles seen per approach
+            overlays = {}  # Counted boxes and ROI of the last inferred frame, sent whether rendered or not
+            next_render_at = defaultdict(float)  # Per direction, when a frame may be rendered again
+            
+            # Prometheus series of this session, bound once per direction (and stage)
+            stage_metrics = {}
+            inferred_metrics = {}
+            skipped_metrics = {}
+            cache_hit_metrics = {}
+            
+            def stage_metric(direction: str, stage: str):
+                series = stage_metrics.get((direction, stage))
+                if series is None:
+                    series = stage_metrics[(direction, stage)] = metrics.STAGE_SECONDS.labels(session_id, direction, stage)
+                return series
             
             while True:
                 frames = {}
-                counts = last_counts.copy()
-                pedestrian_counts = last_ped_counts.copy()
-                vehicle_breakdown = last_breakdown.copy()
                 
-                # Process all directions
-                all_finished = True
-                for direction, cap in captures.items():
-                    ret, frame = cap.read()
-                    
-                    if not ret:
-                        # Video ended, restart from beginning
-                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        ret, frame = cap.read()
-                        if not ret:
-                            print(f"[ERROR] Failed to read {direction} video even after restart")
-                            continue
+                # Pick up directions whose upload has finished since the last tick
+                if pending and not await self.open_ready_readers(video_paths, pending, readers, scheduler, live,
+                                                                 session_id, caches, budget):
+                    stats["error"] = "Failed to open video"
+                    break
+                
+                # Take this tick's frame from every direction (decoded ahead by the readers);
+                # a stalled camera is skipped for this tick instead of holding up the others
+                tick_frames = await self.executor.run(self.read_tick, readers,
+                                                      self.live_frame_timeout if live else None)
+                all_finished = not tick_frames and not pending and all(reader.ended for reader in readers.values())
+                
+                # Every decoded frame feeds the light detectors; those claimed for inference
+                # also go through YOLO (InferenceScheduler decides the cadence of each)
+                decoded = {direction: item.frame for direction, item in tick_frames.items() if item.frame is not None}
+                if decoded:
+                    timestamps = {direction: tick_frames[direction].timestamp for direction in decoded}
+                    last_lights_detected.update(
+                        await self.executor.run(self.sample_lights, light_detectors, decoded, timestamps)
+                    )
+                to_infer = {direction: frame for direction, frame in decoded.items()
+                            if scheduler.is_inference_frame(direction, tick_frames[direction].index)}
+                tick_results = {}
+                if to_infer:
+                    # Only draw and encode what a dashboard will see
+                    render_fps = self.render_fps(session_id)
+                    if render_fps == 0:
+                        render = set()
+                        last_frames.clear()  # Do not keep resending a stale frame
+                    elif render_fps is None:
+                        render = set(to_infer)
+                    else:
+                        now = time.monotonic()
+                        render = {direction for direction in to_infer if now >= next_render_at[direction]}
+                        for direction in render:
+                            next_render_at[direction] = now + 1 / render_fps
                     
-                    all_finished = False
+                    # Frames detected in an earlier session of the same clip skip YOLO
+                    cached = {}
+                    for direction in to_infer:
+                        if direction in caches:
+                            hit = caches[direction].get(tick_frames[direction].position)
+                            if hit is not None:
+                                cached[direction] = hit
                     
-                    # Run YOLO every 3rd frame to balance speed and accuracy
-                    if frame_count % 3 == 0:
-                        # Detect and count
-                        vehicle_count, pedestrian_count, annotated_frame, breakdown, ambulance_detected = self.detect_and_count(
-                            frame.copy(), direction
-                        )
-                        
-                        # Store ambulance detection status
-                        last_ambulance_detected[direction] = ambulance_detected
-                        
-                        # Handle ambulance detection
-                        if ambulance_detected:
-                            if direction not in ambulance_directions:
-                                ambulance_directions.add(direction)
-                                print(f"🚑 AMBULANCE DETECTED in {direction.upper()} direction!")
-                                # Send ambulance alert
-                                await self.send_alert(
-                                    session_id,
-                                    "ambulance",
-                                    f"AMBULANCE DETECTED! {direction.upper()} direction - Giving immediate priority",
-                                    direction
-                                )
-                        else:
-                            # Remove from set if no longer detected
-                            if direction in ambulance_directions:
-                                ambulance_directions.discard(direction)
-                                print(f"✅ Ambulance cleared from {direction.upper()}")
-                        
-                        counts[direction] = vehicle_count
-                        pedestrian_counts[direction] = pedestrian_count
-                        vehicle_breakdown[direction] = breakdown
-                        
-                        # Store for next frames
-                        last_counts[direction] = vehicle_count
-                        last_ped_counts[direction] = pedestrian_count
-                        last_breakdown[direction] = breakdown
-                        
-                        # Convert frame to base64
-                        frames[direction] = self.frame_to_base64(annotated_frame)
-                        last_frames[direction] = frames[direction]
+                    # Detect, count, annotate and encode off the event loop
+                    tick_results = await self.executor.analyze_tick(
+                        to_infer, {direction: last_lights_detected[direction] for direction in to_infer}, render, cached
+                    )
+                    stats["frames_inferred"] += len(to_infer) - len(cached)
+                    stats["detection_cache_hits"] += len(cached)
+                    stats["frames_rendered"] += len(render)
+                    for direction, analysis in tick_results.items():
+                        if "inferred" in analysis and direction in caches:
+                            entry = caches[direction]
+                            if entry.put(tick_frames[direction].position, analysis.pop("inferred")):
+                                await self.flush_cache_entry(entry)
+                    for direction, analysis in tick_results.items():
+                        for stage, seconds in analysis["timings"].items():
+                            stage_metric(direction, stage).observe(seconds)
+                
+                # Nothing reads this tick's frames any more: their buffers go back to the readers
+                for direction, item in tick_frames.items():
+                    readers[direction].release(item)
+                
+                # Process all directions
+                for direction, item in tick_frames.items():
+                    frame_index = item.index
+                    tracker = trackers[direction]
+                    analysis = tick_results.get(direction)
+                    if direction not in inferred_metrics:
+                        inferred_metrics[direction] = metrics.FRAMES_INFERRED.labels(session_id, direction)
+                        skipped_metrics[direction] = metrics.FRAMES_SKIPPED.labels(session_id, direction)
+                        cache_hit_metrics[direction] = metrics.DETECTION_CACHE_HITS.labels(session_id, direction)
+                    if analysis is None:
+                        skipped_metrics[direction].inc()
+                    elif "inference" in analysis["timings"]:
+                        inferred_metrics[direction].inc()
                     else:
-                        # Reuse last frame for smooth display
-                        if direction in last_frames:
-                            frames[direction] = last_frames[direction]
+                        cache_hit_metrics[direction].inc()
+                    started = time.perf_counter()
+                    if analysis is not None:
+                        tracker.update(frame_index, analysis["detections"], analysis["ambulance_flags"])
+                        frame_shapes[direction] = analysis["shape"]
+                        overlays[direction] = analysis["overlay"]
                         
-                        # Maintain ambulance detection between YOLO runs
-                        if last_ambulance_detected.get(direction, False):
+                        if analysis["frame"] is not None:
+                            frame_seq += 1
+                            last_frames[direction] = (frame_seq, analysis["frame"])
+                    
+                    # Reuse last frame for smooth display
+                    if direction in last_frames:
+                        frames[direction] = last_frames[direction]
+                    if direction not in frame_shapes:
+                        continue
+                    
+                    # Counts follow the tracks between YOLO runs
+                    vehicle_count, pedestrian_count, breakdown = self.count_tracked(
+                        tracker, frame_index, direction, frame_shapes[direction]
+                    )
+                    stage_metric(direction, "track").observe(time.perf_counter() - started)
+                    unique_counts[direction] = tracker.unique_vehicles
+                    
+                    # Directions without a frame this tick keep their last counts
+                    last_counts[direction] = vehicle_count
+                    last_ped_counts[direction] = pedestrian_count
+                    last_breakdown[direction] = breakdown
+                    
+                    # Ambulance: confirmed flashing lights, or a confirmed ambulance track
+                    ambulance_detected = last_lights_detected[direction] or tracker.has_ambulance()
+                    
+                    # Handle ambulance detection
+                    if ambulance_detected:
+                        if direction not in ambulance_directions:
                             ambulance_directions.add(direction)
+                            metrics.AMBULANCE_TRIGGERS.labels(session_id, direction).inc()
+                            logger.warning("🚑 AMBULANCE DETECTED in %s direction!", direction.upper())
+                            # Send ambulance alert
+                            await self.send_alert(
+                                session_id,
+                                "ambulance",
+                                f"AMBULANCE DETECTED! {direction.upper()} direction - Giving immediate priority",
+                                direction
+                            )
+                    else:
+                        # Remove from set if no longer detected
+                        if direction in ambulance_directions:
+                            ambulance_directions.discard(direction)
+                            logger.info("✅ Ambulance cleared from %s", direction.upper())
                 
                 if all_finished:
-                    print("✅ All videos processed")
+                    logger.info("✅ All videos processed")
                     break
                 
                 # Get signal state from logic
                 # Pass ambulance direction if detected
                 ambulance_dir = list(ambulance_directions)[0] if ambulance_directions else None
                 
-                # Debug: Show ambulance status
-                if ambulance_directions:
-                    print(f"🚨 ambulance_directions set = {ambulance_directions}, ambulance_dir='{ambulance_dir}'")
                 if ambulance_dir:
-                    print(f"🚨 Passing ambulance_dir='{ambulance_dir}' to signal logic")
+                    logger.debug("🚨 ambulance_directions = %s, passing ambulance_dir='%s' to signal logic",
+                                 sorted(ambulance_directions), ambulance_dir)
+                
+                signal_state = signal_logic.update(last_counts, last_ped_counts, ambulance_dir)
                 
-                signal_state = self.signal_logic.update(counts, pedestrian_counts, ambulance_dir)
+                # Capture-to-decision latency of the frames that went through inference this tick
+                if to_infer:
+                    decided_at = time.monotonic()
+                    latencies.extend(decided_at - tick_frames[direction].captured_at for direction in to_infer)
+                    recent = np.array(latencies) * 1000
+                    stats["capture_to_decision_ms"] = {
+                        "last": round(float(recent[-1]), 1),
+                        "p50": round(float(np.percentile(recent, 50)), 1),
+                        "p95": round(float(np.percentile(recent, 95)), 1),
+                        "max": round(float(recent.max()), 1),
+                    }
+                stats["frames_dropped"] = sum(reader.frames_dropped for reader in readers.values())
+                stats["memory"] = budget.report()
+                
+                # Re-prioritise inference for the next frames
+                scheduler.update(signal_logic, ambulance_directions)
                 
                 # Send update to backend (send more frequently for smooth updates)
-                if frame_count % 2 == 0 and frames:  # Every 2 frames if we have frames
-                    await self.send_update(session_id, counts, signal_state, frames, vehicle_breakdown)
+                if frame_count % 2 == 0 and overlays:  # Every 2 frames once a direction has been analysed
+                    # The loop keeps updating its dicts; the queued update gets its own copies
+                    await self.send_update(session_id, dict(last_counts), signal_state, frames, dict(last_breakdown),
+                                           dict(unique_counts), overlays)
                 
                 frame_count += 1
+                stats["ticks"] = frame_count
+                stats["unique_vehicles"] = sum(unique_counts.values())
                 
-                # Small delay to prevent CPU overload but keep video fast (0.001s = 1000 FPS max)
+                # Yield to the event loop; pacing comes from the readers (live sources and
+                # PACE_TO_SOURCE files arrive at their frame rate, other files as fast as we go)
                 await asyncio.sleep(0.001)
             
-            # Clean up
-            for cap in captures.values():
-                cap.release()
-            
             # Mark simulation as complete
             await self.send_complete(session_id)
             
-            print(f"✅ Session {session_id} completed")
+            logger.info("✅ Session %s completed", session_id)
             
+        except asyncio.CancelledError:
+            # Cancelled by the session manager: let the dashboard know the run is over
+            await self.send_complete(session_id)
+            raise
         except Exception as e:
-            print(f"❌ Error processing videos: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            stats["error"] = str(e)
+            logger.exception("❌ Error processing videos: %s", e)
+        finally:
+            # Clean up: stop the decoder threads and release the captures
+            for reader in readers.values():
+                reader.stop()
+            readers.clear()
+            stats["memory"] = dict(budget.report(), process_peak_rss_mb=process_peak_rss_mb())
+            # Keep this session's new detections for the next run of the same clips
+            for entry in caches.values():
+                await self.flush_cache_entry(entry)
+            if caches:
+                try:
+                    await self.executor.run(self.detection_cache.evict)
+                except (OSError, RuntimeError) as e:
+                    logger.warning("⚠️ Could not trim detection cache: %s", e)
     
-    async def send_update(self, session_id: str, counts: Dict, signal_state: Dict, frames: Dict, vehicle_breakdown: Dict = None):
-        """Send update to backend"""
-        try:
-            payload = {
-                "session_id": session_id,
-                "counts": counts,
-                "signal_state": signal_state,
-                "frames": frames,
-            }
-            
-            if vehicle_breakdown:
-                payload["vehicle_breakdown"] = vehicle_breakdown
-            
-            response = requests.post(
-                f"{self.backend_url}/api/simulation/update",
-                json=payload,
-                timeout=5
-            )
-            
-            if response.status_code != 200:
-                print(f"⚠️ Backend update failed: {response.status_code}")
-        except Exception as e:
-            print(f"⚠️ Failed to send update: {str(e)}")
+    async def send_update(self, session_id: str, counts: Dict, signal_state: Dict, frames: Dict, vehicle_breakdown: Dict = None,
+                          unique_counts: Dict = None, detections: Dict = None):
+        """
+        Queue an update for the backend (coalesced per session, never blocks the loop)
+        frames maps direction -> (seq, jpeg_bytes); encoding for the wire happens in the sender
+        detections maps direction -> overlay_data() of its last inferred frame
+        """
+        payload = {
+            "session_id": session_id,
+            "counts": counts,
+            "signal_state": signal_state,
+        }
+        
+        if vehicle_breakdown:
+            payload["vehicle_breakdown"] = vehicle_breakdown
+        
+        if unique_counts:
+            payload["unique_counts"] = unique_counts
+        
+        if detections:
+            payload["detections"] = dict(detections)
+        
+        self.backend.publish_update(session_id, payload, frames)
     
     async def send_alert(self, session_id: str, alert_type: str, message: str, direction: str = None):
-        """Send alert to backend"""
-        try:
-            response = requests.post(
-                f"{self.backend_url}/api/simulation/alert",
-                json={
-                    "session_id": session_id,
-                    "alert_type": alert_type,
-                    "message": message,
-                    "direction": direction,
-                },
-                timeout=5
-            )
-        except Exception as e:
-            print(f"⚠️ Failed to send alert: {str(e)}")
+        """Queue an alert for the backend (ordered, retried until delivered)"""
+        self.backend.publish_alert({
+            "session_id": session_id,
+            "alert_type": alert_type,
+            "message": message,
+            "direction": direction,
+        })
     
     async def send_complete(self, session_id: str):
-        """Mark simulation as complete"""
-        try:
-            response = requests.post(
-                f"{self.backend_url}/api/simulation/complete",
-                json={"session_id": session_id},
-                timeout=5
-            )
-            if response.status_code == 200:
-                print(f"✅ Simulation {session_id} marked as complete")
-        except Exception as e:
-            print(f"⚠️ Failed to mark simulation complete: {str(e)}")
+        """Queue marking the simulation as complete, after its last update"""
+        self.backend.publish_complete(session_id)